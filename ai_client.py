@@ -1,51 +1,692 @@
+import asyncio
+import functools
+import json
+import random
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from cache import ResponseCache
 from config import config
-from typing import Optional, Dict, Any
+import metrics
+from metrics import LatencyHistogram
+from tokens import (
+    MIN_COMPLETION_TOKENS,
+    SAFETY_MARGIN,
+    UsageTracker,
+    estimate_tokens,
+    message_tokens,
+    minify_code,
+    truncate_to_tokens,
+)
+from typing import Optional, Dict, Any, Iterator, List
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0
+# Weight kept by older samples each time a model's latency is recorded
+LATENCY_DECAY = 0.9
+
+# Connection setup time of the request in flight on this thread
+_timing = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _timing.connect = getattr(_timing, "connect", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _timing.connect = getattr(_timing, "connect", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections record their TCP/TLS setup time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class AIClientError(Exception):
+    """Raised when a request does not fit the model or a streamed completion cannot be completed."""
+
+
+class _RaceCancel:
+    """Cancel flag for a race that also aborts the losers' in-flight streams.
+
+    Setting a plain flag is only noticed when the next chunk arrives, so a
+    stalled stream would hold its pool thread until read_timeout. Shutting
+    the socket down wakes the reader immediately.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._responses = set()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def register(self, response: requests.Response):
+        with self._lock:
+            self._responses.add(response)
+            if self._event.is_set():
+                self._abort(response)
+
+    def unregister(self, response: requests.Response):
+        with self._lock:
+            self._responses.discard(response)
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            for response in self._responses:
+                self._abort(response)
+
+    @staticmethod
+    def _abort(response: requests.Response):
+        connection = getattr(response.raw, "_connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
 
 class AIClient:
     BASE_URL = "https://openrouter.ai/api/v1"
-    
-    def __init__(self):
+    _shared: Optional["AIClient"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, base_url: Optional[str] = None):
         if not config.api_key:
             raise ValueError("OpenRouter API key not configured. Set OPENROUTER_API_KEY in .env")
-        
+
+        self.base_url = base_url or self.BASE_URL
         self.headers = {
             "Authorization": f"Bearer {config.api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "https://github.com/devos-ai",
             "X-Title": "DevOS AI"
         }
-    
-    def send_prompt(
+
+        # One keep-alive session per client so turns reuse the TCP+TLS connection
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = _TimedAdapter(
+            pool_connections=config.pool_size,
+            pool_maxsize=config.pool_size,
+            max_retries=0
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Latency breakdown (seconds) of the most recent request
+        self.last_timing: Dict[str, float] = {}
+        self.usage = UsageTracker()
+        # model -> recent time to first token, used to order race candidates
+        self.model_latency: Dict[str, LatencyHistogram] = {}
+        self._race_pool: Optional[ThreadPoolExecutor] = None
+
+        self.cache = None
+        if config.cache_enabled:
+            self.cache = ResponseCache(
+                config.config_path / "cache.db",
+                max_bytes=int(config.cache_max_mb * 1024 * 1024),
+                ttl=config.cache_ttl
+            )
+
+    @classmethod
+    def shared(cls) -> "AIClient":
+        """Process-wide client, so a long-lived process reuses one warm connection pool."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def close(self):
+        """Close pooled connections and the response cache."""
+        if self._race_pool:
+            # Abandoned race streams notice the cancel flag and close themselves
+            self._race_pool.shutdown(wait=False)
+        self.session.close()
+        if self.cache:
+            self.cache.close()
+
+    def _cache_key(self, payload: Dict[str, Any], cache: Optional[bool]) -> Optional[str]:
+        """Cache key for a payload, or None when the response should not be cached.
+
+        By default only deterministic (temperature 0) requests are cached;
+        pass cache=True to force caching or cache=False to bypass it.
+        """
+        if self.cache is None or cache is False:
+            return None
+        if cache is None and payload["temperature"] != 0 and not config.cache_nondeterministic:
+            return None
+        return ResponseCache.make_key(
+            payload["model"], payload["messages"], payload["temperature"], payload["max_tokens"]
+        )
+
+    def _cache_hit(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        start = time.perf_counter()
+        response = self.cache.get(key)
+        if response is not None:
+            self.last_timing = {
+                "connect": 0.0,
+                "ttfb": 0.0,
+                "total": time.perf_counter() - start,
+                "attempts": 0,
+                "cached": True,
+            }
+        return response
+
+    @staticmethod
+    def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+        """Jittered exponential backoff, never shorter than a server's Retry-After."""
+        delay = min(MAX_BACKOFF, config.backoff_factor * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        if retry_after:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    wait = 0.0
+            delay = max(delay, min(wait, MAX_BACKOFF))
+        return delay
+
+    def _post(self, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """POST a payload, retrying connection failures and 429/5xx responses."""
+        body = self._encode(payload)
+        start = time.perf_counter()
+        for attempt in range(config.max_retries + 1):
+            _timing.connect = 0.0
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/chat/completions",
+                    data=body,
+                    timeout=(config.connect_timeout, config.read_timeout),
+                    stream=stream
+                )
+            except requests.exceptions.ConnectionError:
+                # Read timeouts are not retried: the server may already be generating
+                if attempt == config.max_retries:
+                    raise
+                time.sleep(self._backoff_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < config.max_retries:
+                delay = self._backoff_delay(attempt, response.headers.get("Retry-After"))
+                response.close()
+                time.sleep(delay)
+                continue
+
+            # ttfb spans request send to parsed headers; total includes retries
+            response.timing = self.last_timing = {
+                "connect": _timing.connect,
+                "ttfb": response.elapsed.total_seconds(),
+                "total": time.perf_counter() - start,
+                "attempts": attempt + 1,
+                "cached": False,
+                "bytes_sent": len(body),
+            }
+            metrics.record("ai.connect", _timing.connect)
+            metrics.record("ai.ttfb", response.timing["ttfb"])
+            return response
+
+    def _build_payload(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
         model: Optional[str] = None,
         **kwargs
     ) -> Dict[str, Any]:
-        """Send prompt to AI model with optional system prompt and parameters."""
+        """Build the chat completion payload.
+
+        Messages run from most to least stable so that consecutive requests
+        share the longest possible prefix for provider-side prompt caching:
+        system prompt, attachments= (path -> text, sorted by path), history=,
+        per-turn context=, then the prompt itself.
+        """
         messages = []
-        
+
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
-        
+        if kwargs.get("attachments"):
+            messages.append({"role": "system", "content": self.format_attachments(kwargs["attachments"])})
+        stable = len(messages)
+
+        messages.extend(dict(message) for message in kwargs.get("history") or ())
+        history_end = len(messages)
+        if kwargs.get("context"):
+            messages.append({"role": "system", "content": kwargs["context"]})
         messages.append({"role": "user", "content": prompt})
-        
+
+        model = model or config.model
+        max_tokens, temperature = config.for_model(model)
         payload = {
-            "model": model or config.model,
+            "model": model,
             "messages": messages,
-            "max_tokens": kwargs.get("max_tokens", config.max_tokens),
-            "temperature": kwargs.get("temperature", config.temperature),
+            "max_tokens": kwargs.get("max_tokens", max_tokens),
+            "temperature": kwargs.get("temperature", temperature),
         }
-        
-        try:
-            response = requests.post(
-                f"{self.BASE_URL}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
+        history_end = self._fit_to_window(payload, stable, history_end)
+        # Where cache_control hints go, if the model takes them: end of the stable
+        # prefix and end of the history. Providers ignore prefixes below a minimum size.
+        breakpoints = [
+            end - 1 for end in sorted({stable, history_end})
+            if end and message_tokens(messages[:end]) >= config.prompt_cache_min_tokens
+        ]
+        if breakpoints:
+            payload["_cache_breakpoints"] = breakpoints
+        return payload
+
+    @staticmethod
+    def format_attachments(attachments: Dict[str, str]) -> str:
+        """Attached files as one deterministic block, whitespace-minified where safe."""
+        parts = ["Attached files:"]
+        for path in sorted(attachments):
+            text = attachments[path]
+            if config.minify_attachments:
+                text = minify_code(text, path)
+            parts.append(f"### {path}\n```\n{text.rstrip()}\n```")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _encode(payload: Dict[str, Any]) -> bytes:
+        """Compact UTF-8 JSON body, with cache_control hints for models that accept them."""
+        body = {key: value for key, value in payload.items() if not key.startswith("_")}
+        breakpoints = payload.get("_cache_breakpoints")
+        if breakpoints and body["model"].startswith(tuple(config.prompt_cache_models)):
+            messages = list(body["messages"])
+            for index in breakpoints:
+                message = dict(messages[index])
+                message["content"] = [
+                    {"type": "text", "text": message["content"], "cache_control": {"type": "ephemeral"}}
+                ]
+                messages[index] = message
+            body["messages"] = messages
+        # requests' json= escapes non-ASCII and pads separators; this sends fewer bytes
+        return json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def _fit_to_window(payload: Dict[str, Any], history_start: int, history_end: int) -> int:
+        """Make the request fit the model's context window and cap max_tokens to what is left.
+
+        Over the limit, the per-turn context is trimmed first, then the oldest
+        history turns are dropped; the system prompt, attachments and prompt are
+        never cut. Raises AIClientError if they alone do not fit. Returns where
+        the history now ends.
+        """
+        messages = payload["messages"]
+        window = config.context_window(payload["model"])
+        reserve = min(payload["max_tokens"], MIN_COMPLETION_TOKENS)
+        prompt_tokens = message_tokens(messages)
+        overflow = prompt_tokens + reserve + SAFETY_MARGIN - window
+        # The context message, if any, sits between the history and the prompt
+        if overflow > 0 and len(messages) - 1 > history_end:
+            context = messages[history_end]
+            keep = estimate_tokens(context["content"]) - overflow
+            if keep > 0:
+                context["content"] = truncate_to_tokens(context["content"], keep)
+            else:
+                del messages[history_end]
+            prompt_tokens = message_tokens(messages)
+            overflow = prompt_tokens + reserve + SAFETY_MARGIN - window
+        while overflow > 0 and history_end > history_start:
+            del messages[history_start]
+            history_end -= 1
+            prompt_tokens = message_tokens(messages)
+            overflow = prompt_tokens + reserve + SAFETY_MARGIN - window
+        if overflow > 0:
+            raise AIClientError(
+                f"Prompt and attached files need about {prompt_tokens} tokens, too many for "
+                f"{payload['model']} ({window}-token context window); attach fewer or smaller files"
+            )
+        payload["max_tokens"] = max(1, min(payload["max_tokens"], window - prompt_tokens - SAFETY_MARGIN))
+        return history_end
+
+    def _record_usage(self, payload: Dict[str, Any], usage: Optional[Dict[str, Any]], completion: str,
+                      timing: Optional[Dict[str, Any]] = None):
+        """Add a finished request to the session totals, estimating if the API sent no usage."""
+        bytes_sent = (timing or {}).get("bytes_sent", 0)
+        if usage and usage.get("prompt_tokens") is not None:
+            details = usage.get("prompt_tokens_details") or {}
+            self.usage.record(
+                payload["model"],
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+                cost=usage.get("cost"),
+                cached_tokens=details.get("cached_tokens") or 0,
+                bytes_sent=bytes_sent
             )
+        else:
+            self.usage.record(
+                payload["model"],
+                message_tokens(payload["messages"]),
+                estimate_tokens(completion),
+                estimated=True,
+                bytes_sent=bytes_sent
+            )
+
+    @metrics.timed("ai.send_prompt")
+    def send_prompt(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        cache: Optional[bool] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Send prompt to AI model with optional system prompt and parameters."""
+        try:
+            payload = self._build_payload(prompt, system_prompt, model, **kwargs)
+        except AIClientError as e:
+            return {"error": str(e)}
+        key = self._cache_key(payload, cache)
+        cached = self._cache_hit(key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self._post(payload)
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+            if result.get("choices") and "error" not in result:
+                content = result["choices"][0].get("message", {}).get("content") or ""
+                self._record_usage(payload, result.get("usage"), content, response.timing)
+                if key:
+                    self.cache.put(key, result)
+            return result
+        except requests.exceptions.RequestException as e:
+            return {"error": str(e)}
+
+    @staticmethod
+    def _iter_events(response: requests.Response) -> Iterator[Dict[str, Any]]:
+        """Parsed server-sent events of a streamed completion, up to [DONE]."""
+        # chunk_size=None hands over each chunk as soon as it arrives
+        for line in response.iter_lines(chunk_size=None):
+            # Blank lines separate events, ':' lines are keep-alive comments
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                return
+            chunk = json.loads(data)
+            if "error" in chunk:
+                error = chunk["error"]
+                raise AIClientError(error.get("message", str(error)) if isinstance(error, dict) else str(error))
+            yield chunk
+
+    def stream_prompt(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        cache: Optional[bool] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """Stream the completion as text deltas using server-sent events."""
+        payload = self._build_payload(prompt, system_prompt, model, **kwargs)
+        key = self._cache_key(payload, cache)
+        cached = self._cache_hit(key)
+        if cached is not None:
+            content = cached.get("choices", [{}])[0].get("message", {}).get("content", "")
+            if content:
+                yield content
+            return
+
+        payload["stream"] = True
+        parts = []
+        usage = None
+        timing = None
+        start = time.perf_counter()
+        try:
+            with self._post(payload, stream=True) as response:
+                response.raise_for_status()
+                timing = response.timing
+                for chunk in self._iter_events(response):
+                    # The final event carries token usage
+                    usage = chunk.get("usage") or usage
+                    delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+                    if delta:
+                        if not parts:
+                            metrics.record("ai.stream.first_token", time.perf_counter() - start)
+                        parts.append(delta)
+                        yield delta
+                self.last_timing["total"] = time.perf_counter() - start
+                metrics.record("ai.stream.total", self.last_timing["total"])
+            if parts:
+                self._record_usage(payload, usage, "".join(parts), timing)
+            if key and parts:
+                self.cache.put(key, {
+                    "model": payload["model"],
+                    "choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]
+                })
         except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
\ No newline at end of file
+            raise AIClientError(str(e)) from e
+        except ValueError as e:
+            raise AIClientError(f"Malformed stream event: {str(e)}") from e
+
+    def latency(self, model: str) -> LatencyHistogram:
+        histogram = self.model_latency.get(model)
+        if histogram is None:
+            histogram = self.model_latency.setdefault(model, LatencyHistogram(decay=LATENCY_DECAY))
+        return histogram
+
+    def rank_models(self, models: List[str]) -> List[str]:
+        """Order models fastest first by recent time to first token.
+
+        Models without measurements go first so that they get measured.
+        """
+        def key(model: str):
+            histogram = self.model_latency.get(model)
+            if histogram is None or not histogram.count:
+                return (0, 0.0)
+            return (1, histogram.quantile(0.5))
+        return sorted(models, key=key)
+
+    def _complete_streamed(self, payload: Dict[str, Any], cancel: "_RaceCancel") -> Dict[str, Any]:
+        """Stream one model's completion into a send_prompt-shaped result.
+
+        Stops reading and closes the connection as soon as cancel is set, which
+        tells the provider to stop generating.
+        """
+        model = payload["model"]
+        payload = dict(payload, stream=True)
+        start = time.perf_counter()
+        parts, usage, first_token, timing = [], None, None, None
+        finished = False
+        try:
+            with self._post(payload, stream=True) as response:
+                cancel.register(response)
+                try:
+                    response.raise_for_status()
+                    timing = response.timing
+                    for chunk in self._iter_events(response):
+                        if cancel.is_set():
+                            break
+                        usage = chunk.get("usage") or usage
+                        delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+                        if delta:
+                            if first_token is None:
+                                first_token = time.perf_counter() - start
+                                self.latency(model).record(first_token)
+                            parts.append(delta)
+                    else:
+                        finished = not cancel.is_set()
+                finally:
+                    cancel.unregister(response)
+        except (requests.exceptions.RequestException, AIClientError, ValueError) as e:
+            # An aborted socket surfaces as a read error; it is still just a cancellation
+            if not cancel.is_set():
+                return {"model": model, "error": str(e)}
+
+        elapsed = time.perf_counter() - start
+        content = "".join(parts)
+        if parts:
+            # Cancelled streams are billed for what was generated so far
+            self._record_usage(payload, usage if finished else None, content, timing)
+        if not finished:
+            if first_token is None:
+                # Lost before its first token: the elapsed time is a lower bound on its latency
+                self.latency(model).record(elapsed)
+            return {"model": model, "error": "cancelled", "cancelled": True}
+        if not content:
+            return {"model": model, "error": "empty response"}
+        return {
+            "model": model,
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+            "latency": elapsed,
+            "ttft": first_token,
+            "timing": dict(timing, total=elapsed),
+        }
+
+    def _run_models(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        models: List[str],
+        first: bool,
+        **kwargs
+    ) -> List[Dict[str, Any]]:
+        """Run the prompt on each model concurrently.
+
+        With first=True, returns as soon as one model succeeds and cancels the
+        others; otherwise waits for every model. Results are in model order.
+        """
+        if self._race_pool is None:
+            self._race_pool = ThreadPoolExecutor(
+                max_workers=config.pool_size, thread_name_prefix="devos-ai-race"
+            )
+        cancel = _RaceCancel()
+        futures = {}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(models)
+        for index, model in enumerate(models):
+            try:
+                payload = self._build_payload(prompt, system_prompt, model, **kwargs)
+            except AIClientError as e:
+                # Context windows differ, so the request may still fit the other models
+                results[index] = {"model": model, "error": str(e)}
+                continue
+            futures[self._race_pool.submit(self._complete_streamed, payload, cancel)] = index
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[futures[future]] = result
+                if first and "error" not in result:
+                    cancel.set()
+                    return [result]
+        return results
+
+    def race_prompt(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        models: Optional[List[str]] = None,
+        cache: Optional[bool] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Send the prompt to several models at once and return the first complete answer.
+
+        The race_width fastest models start together; the next group is only
+        tried if all of them fail. The winner's name is under "model".
+        """
+        models = self.rank_models(models or config.race_models or [config.model])
+        for model in models:
+            try:
+                payload = self._build_payload(prompt, system_prompt, model, **kwargs)
+            except AIClientError:
+                continue
+            cached = self._cache_hit(self._cache_key(payload, cache))
+            if cached is not None:
+                return dict(cached, model=model)
+
+        width = config.race_width or len(models)
+        errors = []
+        for i in range(0, len(models), width):
+            results = self._run_models(prompt, system_prompt, models[i:i + width], True, **kwargs)
+            winner = next((r for r in results if "error" not in r), None)
+            if winner:
+                self.last_timing = winner["timing"]
+                payload = self._build_payload(prompt, system_prompt, winner["model"], **kwargs)
+                key = self._cache_key(payload, cache)
+                if key:
+                    self.cache.put(key, {"model": winner["model"], "choices": winner["choices"]})
+                return winner
+            errors.extend(f"{r['model']}: {r['error']}" for r in results)
+        return {"error": "; ".join(errors) or "no models configured"}
+
+    def compare_prompt(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        models: Optional[List[str]] = None,
+        **kwargs
+    ) -> List[Dict[str, Any]]:
+        """Send the prompt to every model concurrently and collect all answers, fastest model first."""
+        models = self.rank_models(models or config.race_models or [config.model])
+        return self._run_models(prompt, system_prompt, models, False, **kwargs)
+
+
+class AsyncAIClient:
+    """asyncio front end for AIClient.
+
+    Requests run on a bounded thread pool over the client's pooled
+    keep-alive session, so many prompts can be awaited concurrently.
+    """
+
+    def __init__(self, client: Optional[AIClient] = None, max_workers: Optional[int] = None):
+        self.client = client or AIClient()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.pool_size,
+            thread_name_prefix="devos-ai"
+        )
+
+    async def send_prompt(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Send prompt without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(self.client.send_prompt, prompt, system_prompt, model, **kwargs)
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.client.close()
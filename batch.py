@@ -0,0 +1,203 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterable, Iterator, Set, TextIO
+
+from ai_client import AsyncAIClient
+from config import config
+from tokens import estimate_tokens
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        # Requests bigger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def settle(self, estimated: float, actual: float):
+        """Correct an earlier acquire once the real cost is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + estimated - actual)
+
+
+def read_prompts(source: TextIO) -> Iterator[Dict[str, Any]]:
+    """Yield batch items from JSONL; plain-text lines are taken as bare prompts."""
+    for line_no, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = line
+        if not isinstance(item, dict):
+            item = {"prompt": str(item)}
+        item.setdefault("id", str(line_no))
+        item["id"] = str(item["id"])
+        yield item
+
+
+def load_checkpoint(path: Optional[Path]) -> Set[str]:
+    """Ids of items already finished by an earlier run."""
+    if not path or not path.exists():
+        return set()
+    with open(path, 'r') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def load_completed(path: Optional[Path]) -> Set[str]:
+    """Ids with a successful result already in an output file.
+
+    Covers a crash after a result was written but before its id reached
+    the checkpoint. A line cut short by the crash is ignored.
+    """
+    if not path or not path.exists():
+        return set()
+    completed = set()
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(result, dict) and "id" in result and "error" not in result:
+                completed.add(str(result["id"]))
+    return completed
+
+
+def estimate_cost(item: Dict[str, Any], attachments: Optional[Dict[str, str]] = None) -> int:
+    """Token cost of an item for rate limiting: estimated prompt plus the completion budget."""
+    prompt = estimate_tokens(item["prompt"]) + estimate_tokens(item.get("system") or "")
+    prompt += sum(estimate_tokens(text) for text in (attachments or {}).values())
+    return prompt + int(item.get("max_tokens", config.for_model(item.get("model") or config.model)[0]))
+
+
+def load_attachments(paths: Iterable[str], files: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """Contents of an item's "files", each read once per run through the shared files dict."""
+    from utils import get_file_content
+
+    attachments = {}
+    for path in paths:
+        if path not in files:
+            files[path] = get_file_content(path)
+        if files[path] is None:
+            raise ValueError(f"Not a readable text file: {path}")
+        attachments[path] = files[path]
+    return attachments
+
+
+async def run_batch(
+    items: Iterable[Dict[str, Any]],
+    client: AsyncAIClient,
+    output: TextIO,
+    checkpoint: Optional[Path] = None,
+    concurrency: int = 8,
+    requests_per_minute: float = 0,
+    tokens_per_minute: float = 0,
+    system_prompt: Optional[str] = None,
+    resume_from: Optional[Path] = None,
+) -> Dict[str, int]:
+    """Run prompts concurrently, writing results to output as they complete.
+
+    Items in the checkpoint, or already answered in resume_from (the
+    output file of an earlier run), are skipped.
+    """
+    done = load_checkpoint(checkpoint) | load_completed(resume_from)
+    request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+    token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+    pending = iter(items)
+    checkpoint_file = open(checkpoint, 'a') if checkpoint else None
+    # Items naming the same files send an identical prefix, which providers cache
+    files: Dict[str, Optional[str]] = {}
+
+    def emit(result: Dict[str, Any]):
+        # Output first, then checkpoint: a crash in between is caught by load_completed
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        # Only successes are checkpointed so failures are retried on resume
+        if checkpoint_file and "error" not in result:
+            checkpoint_file.write(result["id"] + "\n")
+            checkpoint_file.flush()
+
+    async def answer(item: Dict[str, Any]) -> Dict[str, Any]:
+        if "prompt" not in item:
+            raise ValueError("Missing prompt")
+        if not isinstance(item["prompt"], str):
+            raise ValueError("prompt must be a string")
+        attachments = load_attachments(item.get("files") or (), files)
+        # Same limit as !attach: the files must leave room for the prompt and answer
+        budget = config.context_window(item.get("model") or config.model) // 2
+        if sum(estimate_tokens(text) for text in attachments.values()) > budget:
+            raise ValueError(f"Files exceed {budget} tokens, half the context window")
+
+        estimated = estimate_cost(item, attachments)
+        if request_bucket:
+            await request_bucket.acquire()
+        if token_bucket:
+            await token_bucket.acquire(estimated)
+
+        kwargs = {k: item[k] for k in ("max_tokens", "temperature") if k in item}
+        start = time.perf_counter()
+        response = await client.send_prompt(
+            item["prompt"],
+            system_prompt=item.get("system", system_prompt),
+            model=item.get("model"),
+            attachments=attachments,
+            **kwargs
+        )
+        latency = time.perf_counter() - start
+
+        usage = response.get("usage") or {}
+        if token_bucket and usage.get("total_tokens"):
+            token_bucket.settle(estimated, usage["total_tokens"])
+
+        result = {"id": item["id"], "latency": round(latency, 3)}
+        if "error" in response:
+            result["error"] = response["error"]
+        else:
+            result["response"] = response.get("choices", [{}])[0].get("message", {}).get("content", "")
+            result["model"] = response.get("model")
+            result["usage"] = usage
+        return result
+
+    async def worker():
+        # Workers pull lazily, so input is read no faster than it is processed
+        for item in pending:
+            if item["id"] in done:
+                counts["skipped"] += 1
+                continue
+            try:
+                result = await answer(item)
+            except Exception as e:
+                # One bad row (a non-string prompt, an odd max_tokens) must not end the run
+                result = {"id": item["id"], "error": str(e) or type(e).__name__}
+            counts["failed" if "error" in result else "completed"] += 1
+            emit(result)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        if checkpoint_file:
+            checkpoint_file.close()
+    return counts
@@ -0,0 +1,132 @@
+"""Measure CodeIndex query latency on a large synthetic index and recall on planted code.
+
+    python benchmarks/bench_code_index.py --chunks 100000 --queries 200
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from code_index import CHUNK_LINES, CodeIndex, build_postings, term_counts  # noqa: E402
+
+WORDS = ("load save parse render fetch build index cache token chunk stream config "
+         "client server request response session window file path query score").split()
+NOUNS = ("invoice ledger payment customer order shipment widget gadget sensor report "
+         "account profile upload thumbnail schedule".split())
+
+
+def synthetic_index(root: Path, chunks: int, terms_per_chunk: int, vocab: int, seed: int) -> CodeIndex:
+    """Index arrays with Zipf-distributed words, written straight to disk without tokenizing."""
+    rng = np.random.default_rng(seed)
+    # Word r of the vocabulary is "w<r>", hashed exactly as the tokenizer would
+    word_terms = np.array([next(iter(term_counts(f"w{r}"))) for r in range(vocab)], dtype=np.int64)
+    docs = np.repeat(np.arange(chunks, dtype=np.int64), rng.poisson(terms_per_chunk, chunks).clip(1))
+    ranks = (rng.zipf(1.3, len(docs)) - 1) % vocab
+    # One (chunk, word) pair per distinct word, as term_counts produces
+    pairs = np.unique(docs * vocab + ranks)
+    docs, ranks = pairs // vocab, pairs % vocab
+    fwd_ptr = np.zeros(chunks + 1, dtype=np.int64)
+    np.cumsum(np.bincount(docs, minlength=chunks), out=fwd_ptr[1:])
+    fwd_term = word_terms[ranks].astype(np.int32)
+    fwd_tf = rng.integers(1, 6, len(pairs)).astype(np.float32)
+
+    chunks_per_file = 5
+    files = [
+        {"path": f"src/file{i}.py", "hash": "", "mtime": 0, "size": 0,
+         "first_chunk": i * chunks_per_file, "chunks": chunks_per_file}
+        for i in range(chunks // chunks_per_file)
+    ]
+    arrays = {
+        "fwd_ptr": fwd_ptr,
+        "fwd_term": fwd_term,
+        "fwd_tf": fwd_tf,
+        "chunk_file": (np.arange(chunks) // chunks_per_file).astype(np.int32),
+        "chunk_start": ((np.arange(chunks) % chunks_per_file) * CHUNK_LINES + 1).astype(np.int32),
+        "chunk_end": ((np.arange(chunks) % chunks_per_file + 1) * CHUNK_LINES).astype(np.int32),
+    }
+    arrays.update(build_postings(fwd_ptr, fwd_term, fwd_tf))
+    index = CodeIndex(str(root), index_dir=root / "index")
+    index._save(files, arrays)
+    return index
+
+
+def planted_tree(root: Path, files: int, seed: int):
+    """Source files of filler code, each with one uniquely named function; returns (query, path)."""
+    rnd = random.Random(seed)
+    targets = []
+    for i in range(files):
+        name = f"{rnd.choice(WORDS)}_{rnd.choice(NOUNS)}_{rnd.choice(NOUNS)}_{i}"
+        lines = []
+        for j in range(rnd.randint(60, 160)):
+            a, b = rnd.sample(WORDS, 2)
+            lines.append(f"    {a}_{b}_{j % 7} = {rnd.choice(WORDS)}({b}, {a})")
+        at = rnd.randrange(len(lines))
+        lines[at:at] = [f"def {name}(data):", f"    return compute_{name}(data)"]
+        path = root / "src" / f"module{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(lines) + "\n")
+        # Ask the way a person would: the words of the name, without its unique suffix
+        targets.append((" ".join(name.split("_")[:-1]), f"src/module{i}.py"))
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--terms-per-chunk", type=int, default=80)
+    parser.add_argument("--vocab", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--files", type=int, default=300, help="Files in the recall tree")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        start = time.perf_counter()
+        index = synthetic_index(tmp / "synthetic", args.chunks, args.terms_per_chunk, args.vocab, args.seed)
+        print(f"synthetic index: {index.chunks} chunks, built in {time.perf_counter() - start:.2f}s")
+        start = time.perf_counter()
+        index = CodeIndex.open(str(tmp / "synthetic"), index_dir=tmp / "synthetic" / "index")
+        print(f"open (mmap):       {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+        rnd = random.Random(args.seed)
+        timings = []
+        for _ in range(args.queries):
+            # Mix common and rare words; common ones have posting lists spanning most chunks
+            query = " ".join(f"w{int(rnd.paretovariate(0.5)) % args.vocab}" for _ in range(6))
+            start = time.perf_counter()
+            index.search(query, args.k)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        p50 = timings[len(timings) // 2] * 1000
+        p95 = timings[int(len(timings) * 0.95)] * 1000
+        print(f"query latency:     p50 {p50:.2f} ms  p95 {p95:.2f} ms  max {timings[-1] * 1000:.2f} ms")
+
+        root = tmp / "repo"
+        targets = planted_tree(root, args.files, args.seed)
+        index = CodeIndex(str(root), index_dir=tmp / "repo-index")
+        start = time.perf_counter()
+        stats = index.build()
+        print(f"real tree:         {stats['files']} files, {stats['chunks']} chunks, "
+              f"built in {time.perf_counter() - start:.2f}s")
+        start = time.perf_counter()
+        stats = index.build()
+        print(f"no-op rebuild:     {(time.perf_counter() - start) * 1000:8.1f} ms  ({stats['reused']} reused)")
+
+        hits = sum(
+            any(hit["path"] == path for hit in index.search(query, args.k))
+            for query, path in targets
+        )
+        print(f"recall@{args.k}:         {hits / len(targets):.3f}  ({hits}/{len(targets)})")
+
+
+if __name__ == "__main__":
+    main()
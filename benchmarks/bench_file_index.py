@@ -0,0 +1,73 @@
+"""Compare FileIndex cold/warm lookups against a plain Path.rglob walk.
+
+    python benchmarks/bench_file_index.py --dirs 2000 --files-per-dir 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from os_ops.file_index import FileIndex  # noqa: E402
+
+
+def build_tree(root: Path, dirs: int, files_per_dir: int):
+    """Synthetic repo with a gitignored node_modules the size of the source tree."""
+    root.mkdir(parents=True, exist_ok=True)
+    (root / ".gitignore").write_text("build/\n*.log\n")
+    for top in ("src", "node_modules", "build"):
+        for i in range(dirs // 3 + 1):
+            d = root / top / f"pkg{i % 50}" / f"mod{i}"
+            d.mkdir(parents=True, exist_ok=True)
+            for j in range(files_per_dir):
+                (d / f"file{j}.{'py' if j % 2 else 'js'}").touch()
+            (d / "debug.log").touch()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=1500)
+    parser.add_argument("--files-per-dir", type=int, default=40)
+    parser.add_argument("--pattern", default="*.py")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "repo"
+        cache = Path(tmp) / "index"
+        build_tree(root, args.dirs, args.files_per_dir)
+        total = sum(len(files) for _, _, files in os.walk(root))
+        print(f"tree: {total} files under {root}")
+
+        t, found = timed(lambda: list(root.rglob(args.pattern)))
+        print(f"rglob (no ignore rules):  {t * 1000:9.1f} ms  {len(found)} matches")
+
+        t, index = timed(lambda: FileIndex(str(root), cache_dir=cache))
+        t_build, _ = timed(index.refresh)
+        t_query, found = timed(lambda: list(index.search(args.pattern)))
+        print(f"index cold build + query: {(t + t_build + t_query) * 1000:9.1f} ms  {len(found)} matches")
+
+        t_load, index = timed(lambda: FileIndex(str(root), cache_dir=cache))
+        t_refresh, _ = timed(index.refresh)
+        t_query, found = timed(lambda: list(index.search(args.pattern)))
+        print(f"index warm (load+refresh): {(t_load + t_refresh) * 1000:8.1f} ms  query {t_query * 1000:.1f} ms")
+
+        t_refresh, _ = timed(index.refresh)
+        t_query, found = timed(lambda: list(index.search(args.pattern, limit=20)))
+        print(f"in-process refresh:       {t_refresh * 1000:9.1f} ms  first 20: {t_query * 1000:.2f} ms")
+
+        (root / "src" / "pkg0" / "mod0" / "new_file.py").touch()
+        t_refresh, changed = timed(index.refresh)
+        print(f"refresh after 1 new file: {t_refresh * 1000:9.1f} ms  changed={changed}")
+
+
+if __name__ == "__main__":
+    main()
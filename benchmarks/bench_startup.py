@@ -0,0 +1,91 @@
+"""Import-time budget check for each devos-ai subcommand.
+
+Runs every subcommand in a fresh interpreter under `python -X importtime`
+and compares the total import time against its budget.
+
+    python benchmarks/bench_startup.py [--runs 5]
+
+Exits non-zero when any subcommand's median exceeds its budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Import budget (ms) per subcommand invocation
+BUDGETS_MS = {
+    "--version": 60,
+    "--help": 60,
+    "find-files": 175,
+    "git-status": 200,
+    "open-app --help": 60,
+    "batch": 450,
+}
+
+
+def top_level_imports(argv, env, cwd):
+    """(module, cumulative us) for each top-level import of one invocation."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + argv,
+        capture_output=True, text=True, env=env, cwd=cwd, input=""
+    )
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level imports have a single leading space; nested ones are indented
+        if not name.startswith("  "):
+            yield name.strip(), int(cumulative)
+
+
+def import_time_ms(args, env, cwd, baseline) -> float:
+    """Import time of a subcommand, excluding what the bare interpreter loads (site etc.)."""
+    total_us = sum(
+        cumulative for name, cumulative in top_level_imports([str(ROOT / "main.py")] + args, env, cwd)
+        if name not in baseline
+    )
+    return total_us / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="devos-ai startup import budgets")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, HOME=tmp, OPENROUTER_API_KEY="bench")
+        subprocess.run(["git", "init", "-q", tmp], check=True)
+        commands = {
+            "--version": ["--version"],
+            "--help": ["--help"],
+            "find-files": ["find-files", "*.py", tmp],
+            "git-status": ["git-status", tmp],
+            "open-app --help": ["open-app", "--help"],
+            "batch": ["batch", "-"],
+        }
+        baseline = {name for name, _ in top_level_imports(["-c", "pass"], env, tmp)}
+        failed = False
+        print(f"{'subcommand':<18}{'median ms':>10}{'budget':>8}  wall ms")
+        for label, argv in commands.items():
+            samples, walls = [], []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                samples.append(import_time_ms(argv, env, tmp, baseline))
+                walls.append((time.perf_counter() - start) * 1000)
+            median = statistics.median(samples)
+            budget = BUDGETS_MS[label]
+            over = median > budget
+            failed |= over
+            print(f"{label:<18}{median:>10.1f}{budget:>8}  {statistics.median(walls):7.1f}"
+                  + ("  OVER BUDGET" if over else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
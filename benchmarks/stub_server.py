@@ -0,0 +1,124 @@
+"""Local stand-in for the OpenRouter chat completions endpoint.
+
+Answers POST /chat/completions after a configurable delay, either as one
+JSON body or as a server-sent event stream, so AIClient can be measured
+without network noise or API costs. The tests also use it to script
+failures: error statuses before the real answer and error events mid-stream.
+
+    python benchmarks/stub_server.py --latency 0.05 --port 8765
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        server.requests += 1
+        # One client port per TCP connection, so the set's size counts connections
+        server.peers.add(self.client_address)
+        if server.failures:
+            status, retry_after = server.failures.pop(0)
+            payload = json.dumps({"error": {"code": status, "message": "scripted failure"}}).encode()
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header("Retry-After", retry_after)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        time.sleep(server.latency)
+        words = [f"word{i} " for i in range(server.tokens)]
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            token_delay = server.model_token_delay.get(body["model"], server.token_delay)
+            for index, word in enumerate(words):
+                if index == server.error_after:
+                    self._chunk({"error": {"code": 502, "message": "upstream overloaded"}})
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                if token_delay:
+                    self.wfile.flush()
+                    time.sleep(token_delay)
+                self._chunk({"choices": [{"delta": {"content": word}}]})
+            self._chunk({"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": len(words)}})
+            self._send_event(b"[DONE]")
+            self.wfile.flush()
+            # Clients must stop at [DONE], not wait for the end of the body
+            time.sleep(server.hold_after_done)
+            self.wfile.write(b"0\r\n\r\n")
+            return
+
+        payload = json.dumps({
+            "model": body["model"],
+            "choices": [{"message": {"role": "assistant", "content": "".join(words)}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": len(words)},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _chunk(self, event):
+        self._send_event(json.dumps(event).encode())
+
+    def _send_event(self, data: bytes):
+        frame = b"data: " + data + b"\n\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(frame), frame))
+
+    def log_message(self, *args):
+        pass
+
+
+def start(latency: float = 0.0, tokens: int = 50, token_delay: float = 0.0,
+          port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a daemon thread; returns (server, base URL). Stop with server.shutdown()."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.tokens = tokens
+    server.token_delay = token_delay
+    # Scripted behaviour, changed by tests between requests
+    server.failures = []  # (status, Retry-After or None) answered before the real response
+    server.error_after = None  # stream an error event instead of this token
+    server.hold_after_done = 0.0  # seconds the stream stays open after [DONE]
+    server.model_token_delay = {}  # model -> token_delay, e.g. to stall one side of a race
+    server.requests = 0
+    server.peers = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the response starts")
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server, url = start(args.latency, args.tokens, args.token_delay, args.port)
+    print(f"stub OpenRouter at {url} (set AIClient base_url to this)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
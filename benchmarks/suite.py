@@ -0,0 +1,323 @@
+"""Benchmark suite for the main command paths, with JSON baselines.
+
+Runs every case against synthetic inputs and a local stub OpenRouter
+server, in a throwaway HOME so nothing touches ~/.config/devos-ai.
+
+    python benchmarks/suite.py run -o benchmarks/baseline.json
+    python benchmarks/suite.py compare benchmarks/baseline.json      # re-run and compare
+    python benchmarks/suite.py compare old.json new.json --threshold 0.2
+    python benchmarks/suite.py list
+
+compare exits non-zero when any case's median regressed past the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+# name -> setup(workdir, args) returning the callable to time
+CASES: Dict[str, Callable[[Path, argparse.Namespace], Callable[[], Any]]] = {}
+
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+@case("files.find_glob")
+def find_glob(workdir: Path, args) -> Callable[[], Any]:
+    from bench_file_index import build_tree
+    from os_ops.file_handling import FileHandler
+
+    root = workdir / "tree"
+    if not root.exists():
+        build_tree(root, args.dirs, args.files_per_dir)
+    return lambda: FileHandler.find_files("*.py", str(root))
+
+
+@case("files.find_fuzzy")
+def find_fuzzy(workdir: Path, args) -> Callable[[], Any]:
+    from os_ops.file_handling import FileHandler
+
+    find_glob(workdir, args)
+    return lambda: FileHandler.find_files("pkg3mod1file7", str(workdir / "tree"), mode="fuzzy", limit=20)
+
+
+@case("files.index_cold")
+def index_cold(workdir: Path, args) -> Callable[[], Any]:
+    from os_ops.file_index import FileIndex
+
+    find_glob(workdir, args)
+    runs = iter(range(1_000_000))
+    return lambda: FileIndex(str(workdir / "tree"), cache_dir=workdir / f"index{next(runs)}").refresh()
+
+
+def make_repo(root: Path, files: int):
+    """Committed repo with some modified, staged, renamed and untracked files."""
+    def git(*argv):
+        subprocess.run(["git", "-C", str(root)] + list(argv), check=True, capture_output=True)
+
+    root.mkdir(parents=True)
+    git("init", "-q")
+    git("config", "user.email", "bench@example.com")
+    git("config", "user.name", "bench")
+    for i in range(files):
+        path = root / f"src/pkg{i % 40}/module{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"VALUE = {i}\n" * 20)
+    git("add", "-A")
+    git("commit", "-q", "-m", "initial")
+    for i in range(0, files, 40):
+        (root / f"src/pkg{i % 40}/module{i}.py").write_text("changed\n")
+    git("mv", "src/pkg1/module1.py", "src/pkg1/renamed.py")
+    for i in range(20):
+        (root / f"untracked{i}.txt").write_text("new\n")
+
+
+@case("git.status")
+def git_status(workdir: Path, args) -> Callable[[], Any]:
+    from os_ops.git_utils import GitManager
+
+    repo = workdir / "repo"
+    if not repo.exists():
+        make_repo(repo, args.repo_files)
+    return lambda: GitManager.get_status(str(repo), use_cache=False)
+
+
+@case("git.status_cached")
+def git_status_cached(workdir: Path, args) -> Callable[[], Any]:
+    from os_ops.git_utils import GitManager
+
+    git_status(workdir, args)
+    return lambda: GitManager.get_status(str(workdir / "repo"))
+
+
+def large_markdown(sections: int) -> str:
+    parts = []
+    for i in range(sections):
+        parts.append(
+            f"## Section {i}\n\nSome **bold** text, `inline code` and a [link](https://example.com/{i}).\n\n"
+            f"- item one\n- item two\n\n```python\ndef handler_{i}(event):\n"
+            + "".join(f"    value_{j} = compute(event, {j})\n" for j in range(15))
+            + "    return value_0\n```\n"
+        )
+    return "\n".join(parts)
+
+
+def clear_render_caches():
+    import ui
+    import utils
+
+    for func in (getattr(ui, "_highlight", None), getattr(ui, "_markdown", None),
+                 getattr(utils, "parse_fences", None)):
+        if func is not None:
+            func.cache_clear()
+
+
+def render_case(language: Optional[str]):
+    def setup(workdir: Path, args) -> Callable[[], Any]:
+        import ui
+
+        text = large_markdown(args.sections)
+        ui.console.width = 100
+
+        def render():
+            # Time a first render, not a redraw served from the highlight caches
+            clear_render_caches()
+            with ui.console.capture():
+                ui.display_response(text, language)
+        return render
+    return setup
+
+
+case("ui.render_markdown")(render_case(None))
+case("ui.render_code")(render_case("python"))
+
+
+@case("utils.extract_code_blocks")
+def extract_blocks(workdir: Path, args) -> Callable[[], Any]:
+    from utils import extract_code_blocks
+
+    text = large_markdown(args.sections * 20)
+
+    def extract():
+        clear_render_caches()
+        return extract_code_blocks(text)
+    return extract
+
+
+def stub_client(args, cache: bool = False):
+    import stub_server
+    from ai_client import AIClient
+    from config import config
+
+    config.cache_enabled = cache
+    _, url = stub_server.start(latency=args.latency, tokens=args.tokens)
+    return AIClient(base_url=url)
+
+
+@case("ai.send_prompt")
+def send_prompt(workdir: Path, args) -> Callable[[], Any]:
+    client = stub_client(args)
+    return lambda: client.send_prompt("Explain this benchmark", temperature=0.7)
+
+
+@case("ai.stream_prompt")
+def stream_prompt(workdir: Path, args) -> Callable[[], Any]:
+    client = stub_client(args)
+    return lambda: "".join(client.stream_prompt("Explain this benchmark", temperature=0.7))
+
+
+@case("ai.cache_hit")
+def cache_hit(workdir: Path, args) -> Callable[[], Any]:
+    client = stub_client(args, cache=True)
+    client.send_prompt("Cached question", temperature=0)
+    return lambda: client.send_prompt("Cached question", temperature=0)
+
+
+def measure(func: Callable[[], Any], runs: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "median": statistics.median(samples),
+        "min": samples[0],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "mean": statistics.fmean(samples),
+        "runs": runs,
+    }
+
+
+def git_revision() -> Optional[str]:
+    result = subprocess.run(["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+                            capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def run_suite(args) -> Dict[str, Any]:
+    names = [name for name in CASES if not args.only or any(part in name for part in args.only)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        # Config, caches and indexes all live under ~/.config/devos-ai
+        os.environ["HOME"] = str(workdir / "home")
+        os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+        for name in names:
+            func = CASES[name](workdir, args)
+            results[name] = measure(func, args.runs, args.warmup)
+            print(f"{name:28} median {results[name]['median'] * 1000:9.3f} ms  "
+                  f"p95 {results[name]['p95'] * 1000:9.3f} ms", file=sys.stderr)
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "params": {key: value for key, value in vars(args).items()
+                       if key in ("runs", "warmup", "dirs", "files_per_dir", "repo_files",
+                                  "sections", "latency", "tokens")},
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float, min_delta: float) -> List[str]:
+    """Print a comparison table; returns the names of regressed cases."""
+    regressions = []
+    print(f"{'case':28} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:28} {'-':>12} {now['median'] * 1000:12.3f}      new")
+            continue
+        delta = now["median"] - before["median"]
+        ratio = delta / before["median"] if before["median"] else 0.0
+        flag = ""
+        if ratio > threshold and delta > min_delta:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < -threshold and -delta > min_delta:
+            flag = "  faster"
+        print(f"{name:28} {before['median'] * 1000:12.3f} {now['median'] * 1000:12.3f} {ratio:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(p):
+        p.add_argument("--only", nargs="*", help="Run only cases whose name contains one of these")
+        p.add_argument("--runs", type=int, default=15)
+        p.add_argument("--warmup", type=int, default=2)
+        p.add_argument("--dirs", type=int, default=300, help="Directories in the synthetic file tree")
+        p.add_argument("--files-per-dir", type=int, default=30)
+        p.add_argument("--repo-files", type=int, default=2000, help="Files in the generated git repo")
+        p.add_argument("--sections", type=int, default=100, help="Sections of generated Markdown")
+        p.add_argument("--latency", type=float, default=0.005, help="Stub server delay in seconds")
+        p.add_argument("--tokens", type=int, default=50, help="Tokens per stub completion")
+
+    run_parser = sub.add_parser("run", help="Run the suite and save results as JSON")
+    add_run_options(run_parser)
+    run_parser.add_argument("-o", "--output", help="Results file (default: print to stdout)")
+
+    compare_parser = sub.add_parser("compare", help="Compare results against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current", nargs="?", help="Results to compare (default: run the suite now)")
+    compare_parser.add_argument("--threshold", type=float, default=0.15, help="Relative slowdown that counts as a regression")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Ignore changes smaller than this")
+    add_run_options(compare_parser)
+
+    sub.add_parser("list", help="List benchmark cases")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        print("\n".join(CASES))
+        return
+
+    if args.command == "run":
+        results = run_suite(args)
+        text = json.dumps(results, indent=2)
+        if args.output:
+            Path(args.output).write_text(text + "\n")
+        else:
+            print(text)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        params = baseline.get("meta", {}).get("params", {})
+        # Re-run with the baseline's parameters so the numbers are comparable
+        for key, value in params.items():
+            setattr(args, key, value)
+        current = run_suite(args)
+    regressions = compare(baseline, current, args.threshold, args.min_delta_ms / 1000)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
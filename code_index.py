@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import re
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from config import config
+from ingest import sniff_file
+from os_ops.file_index import FileIndex
+from tokens import estimate_tokens
+
+# Terms are hashed into this many buckets (a power of two)
+HASH_BUCKETS = 1 << 20
+CHUNK_LINES = 40
+MAX_FILE_BYTES = 1024 * 1024
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+ARRAYS = ("fwd_ptr", "fwd_term", "fwd_tf", "chunk_file", "chunk_start", "chunk_end",
+          "inv_ptr", "inv_doc", "inv_weight")
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|[0-9]+")
+_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+@lru_cache(maxsize=65536)
+def _ident_terms(ident: str) -> Tuple[int, ...]:
+    """Hashed terms for an identifier: the whole name plus its snake/camel-case parts."""
+    words = {ident.lower()}
+    parts = _PART_RE.findall(ident)
+    if len(parts) > 1:
+        words.update(part.lower() for part in parts)
+    return tuple(zlib.crc32(word.encode()) & (HASH_BUCKETS - 1) for word in words if len(word) > 1)
+
+
+def term_counts(text: str) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for ident in _IDENT_RE.findall(text):
+        for term in _ident_terms(ident):
+            counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class CodeIndex:
+    """Hashed BM25 index over fixed-size chunks of a repository's text files.
+
+    Per-chunk term counts (the forward index) and the BM25 postings are
+    stored as NumPy arrays and memory-mapped on open. Rebuilds reuse the
+    forward rows of files whose content hash is unchanged, so only edited
+    files are re-tokenized.
+    """
+
+    def __init__(self, root: str, index_dir: Optional[Path] = None):
+        self.root = os.path.abspath(root)
+        digest = hashlib.sha1(self.root.encode("utf-8")).hexdigest()[:16]
+        self.dir = Path(index_dir) if index_dir else config.config_path / "code_index" / digest
+        self.meta: Dict[str, Any] = {"generation": 0, "files": []}
+        self.arrays: Dict[str, Any] = {}
+
+    @classmethod
+    def open(cls, root: str, index_dir: Optional[Path] = None) -> Optional["CodeIndex"]:
+        """Load an existing index, or None if the directory was never indexed."""
+        index = cls(root, index_dir)
+        return index if index._load() else None
+
+    def _array_path(self, name: str, generation: int) -> Path:
+        return self.dir / f"{name}.{generation}.npy"
+
+    def _load(self) -> bool:
+        import numpy as np
+
+        try:
+            with open(self.dir / "meta.json", "r") as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(self._array_path(name, meta["generation"]), mmap_mode="r")
+                for name in ARRAYS
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        # Only a complete index replaces what we have; a partial one would be reused as if whole
+        self.meta, self.arrays = meta, arrays
+        return True
+
+    @property
+    def chunks(self) -> int:
+        return len(self.arrays["chunk_file"]) if self.arrays else 0
+
+    def build(self) -> Dict[str, int]:
+        """Index or update the tree; returns file and chunk counts."""
+        import numpy as np
+
+        self._load()
+        old = self.arrays
+        # Without the arrays there is nothing to reuse rows from
+        old_files = {entry["path"]: entry for entry in self.meta.get("files", [])} if old else {}
+        stats = {"files": 0, "reused": 0, "indexed": 0, "chunks": 0}
+
+        files: List[Dict[str, Any]] = []
+        ptr_pieces, term_pieces, tf_pieces = [], [], []
+        starts, ends, owners = [], [], []
+        next_ptr = 0
+        next_chunk = 0
+
+        for rel, is_dir in FileIndex.for_root(self.root).paths():
+            if is_dir:
+                continue
+            path = os.path.join(self.root, rel)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_size == 0 or st.st_size > MAX_FILE_BYTES:
+                continue
+
+            old_entry = entry = old_files.get(rel)
+            reuse = entry is not None and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size
+            content = None
+            if not reuse:
+                is_binary, encoding = sniff_file(path)
+                if is_binary:
+                    continue
+                with open(path, "rb") as f:
+                    raw = f.read()
+                digest = hashlib.sha1(raw).hexdigest()
+                # Touched but identical content still reuses the old rows
+                reuse = entry is not None and entry["hash"] == digest
+                if not reuse:
+                    content = raw.decode(encoding, "replace")
+                entry = {"path": rel, "hash": digest, "mtime": st.st_mtime_ns, "size": st.st_size}
+            file_id = len(files)
+
+            if reuse:
+                first, count = old_entry["first_chunk"], old_entry["chunks"]
+                lo, hi = int(old["fwd_ptr"][first]), int(old["fwd_ptr"][first + count])
+                ptr_pieces.append(np.asarray(old["fwd_ptr"][first + 1:first + count + 1]) - lo + next_ptr)
+                term_pieces.append(np.asarray(old["fwd_term"][lo:hi]))
+                tf_pieces.append(np.asarray(old["fwd_tf"][lo:hi]))
+                starts.append(np.asarray(old["chunk_start"][first:first + count]))
+                ends.append(np.asarray(old["chunk_end"][first:first + count]))
+                next_ptr += hi - lo
+                stats["reused"] += 1
+            else:
+                lines = content.splitlines()
+                count = 0
+                chunk_ptrs, chunk_terms, chunk_tfs, chunk_starts, chunk_ends = [], [], [], [], []
+                for start in range(0, len(lines), CHUNK_LINES):
+                    counts = term_counts("\n".join(lines[start:start + CHUNK_LINES]))
+                    if not counts:
+                        continue
+                    chunk_terms.extend(counts.keys())
+                    chunk_tfs.extend(counts.values())
+                    next_ptr += len(counts)
+                    chunk_ptrs.append(next_ptr)
+                    chunk_starts.append(start + 1)
+                    chunk_ends.append(min(start + CHUNK_LINES, len(lines)))
+                    count += 1
+                ptr_pieces.append(np.array(chunk_ptrs, dtype=np.int64))
+                term_pieces.append(np.array(chunk_terms, dtype=np.int32))
+                tf_pieces.append(np.array(chunk_tfs, dtype=np.float32))
+                starts.append(np.array(chunk_starts, dtype=np.int32))
+                ends.append(np.array(chunk_ends, dtype=np.int32))
+                stats["indexed"] += 1
+
+            if count == 0:
+                for pieces in (ptr_pieces, term_pieces, tf_pieces, starts, ends):
+                    pieces.pop()
+                continue
+            entry = dict(entry, first_chunk=next_chunk, chunks=count)
+            next_chunk += count
+            owners.append(np.full(count, file_id, dtype=np.int32))
+            files.append(entry)
+
+        arrays = {
+            "fwd_ptr": np.concatenate([np.zeros(1, dtype=np.int64)] + ptr_pieces).astype(np.int64),
+            "fwd_term": np.concatenate(term_pieces or [np.zeros(0, np.int32)]).astype(np.int32),
+            "fwd_tf": np.concatenate(tf_pieces or [np.zeros(0, np.float32)]).astype(np.float32),
+            "chunk_file": np.concatenate(owners or [np.zeros(0, np.int32)]),
+            "chunk_start": np.concatenate(starts or [np.zeros(0, np.int32)]).astype(np.int32),
+            "chunk_end": np.concatenate(ends or [np.zeros(0, np.int32)]).astype(np.int32),
+        }
+        arrays.update(build_postings(arrays["fwd_ptr"], arrays["fwd_term"], arrays["fwd_tf"]))
+        self._save(files, arrays)
+
+        stats["files"] = len(files)
+        stats["chunks"] = self.chunks
+        return stats
+
+    def _save(self, files: List[Dict[str, Any]], arrays: Dict[str, Any]):
+        """Write a new generation of arrays, then switch meta.json over to it atomically."""
+        import numpy as np
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        previous = self.meta.get("generation", 0)
+        generation = previous + 1
+        for name, array in arrays.items():
+            np.save(self._array_path(name, generation), array)
+        tmp = self.dir / f"meta.json.tmp{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump({"root": self.root, "generation": generation, "files": files}, f)
+        os.replace(tmp, self.dir / "meta.json")
+        for name in ARRAYS:
+            try:
+                os.remove(self._array_path(name, previous))
+            except OSError:
+                pass
+        self._load()
+
+    @metrics.timed("index.search")
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Top-k chunks for a query as {path, start, end, score}, best first."""
+        import numpy as np
+
+        if not self.chunks or k <= 0:
+            return []
+        inv_ptr, inv_doc, inv_weight = self.arrays["inv_ptr"], self.arrays["inv_doc"], self.arrays["inv_weight"]
+        scores = np.zeros(self.chunks, dtype=np.float32)
+        for term in term_counts(query):
+            lo, hi = inv_ptr[term], inv_ptr[term + 1]
+            # Each posting list holds a chunk at most once, so plain fancy-index += is safe
+            scores[inv_doc[lo:hi]] += inv_weight[lo:hi]
+
+        k = min(k, self.chunks)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        files = self.meta["files"]
+        return [
+            {
+                "path": files[int(self.arrays["chunk_file"][i])]["path"],
+                "start": int(self.arrays["chunk_start"][i]),
+                "end": int(self.arrays["chunk_end"][i]),
+                "score": float(scores[i]),
+            }
+            for i in top if scores[i] > 0
+        ]
+
+    def chunk_text(self, hit: Dict[str, Any]) -> str:
+        path = os.path.join(self.root, hit["path"])
+        try:
+            with open(path, "r", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return ""
+        return "\n".join(lines[hit["start"] - 1:hit["end"]])
+
+    def context_for(self, query: str, k: int, max_tokens: int) -> Tuple[str, List[Dict[str, Any]]]:
+        """Prompt context built from the best-matching chunks, within a token budget."""
+        sections, used, hits = [], 0, []
+        for hit in self.search(query, k):
+            text = self.chunk_text(hit)
+            section = f"### {hit['path']}:{hit['start']}-{hit['end']}\n```\n{text}\n```"
+            tokens = estimate_tokens(section)
+            if used + tokens > max_tokens:
+                break
+            sections.append(section)
+            hits.append(hit)
+            used += tokens
+        if not sections:
+            return "", []
+        header = ("Relevant code from the current project, retrieved automatically. "
+                  "Use it if it helps answer the question.\n\n")
+        return header + "\n\n".join(sections), hits
+
+
+def build_postings(fwd_ptr, fwd_term, fwd_tf) -> Dict[str, Any]:
+    """Turn per-chunk term counts into BM25-weighted posting lists."""
+    import numpy as np
+
+    n = len(fwd_ptr) - 1
+    lengths = np.diff(fwd_ptr)
+    docs = np.repeat(np.arange(n, dtype=np.int32), lengths)
+    # Document length in term occurrences
+    doc_len = np.bincount(docs, weights=fwd_tf, minlength=n).astype(np.float32)
+    avg_len = float(doc_len.mean()) if n else 1.0
+    df = np.bincount(fwd_term, minlength=HASH_BUCKETS)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+    norm = K1 * (1 - B + B * doc_len[docs] / max(avg_len, 1e-9))
+    weight = idf[fwd_term] * fwd_tf * (K1 + 1) / (fwd_tf + norm)
+
+    order = np.argsort(fwd_term, kind="stable")
+    inv_ptr = np.zeros(HASH_BUCKETS + 1, dtype=np.int64)
+    np.cumsum(df, out=inv_ptr[1:])
+    return {
+        "inv_ptr": inv_ptr,
+        "inv_doc": docs[order],
+        "inv_weight": weight[order].astype(np.float32),
+    }
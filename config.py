@@ -1,53 +1,375 @@
+import json
 import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from dotenv import load_dotenv
-import yaml
+from typing import Any, Dict, Optional, Tuple
+
+# Context window sizes (tokens) for common OpenRouter models
+DEFAULT_CONTEXT_WINDOWS = {
+    "anthropic/claude-3-haiku": 200000,
+    "anthropic/claude-3-sonnet": 200000,
+    "anthropic/claude-3-opus": 200000,
+    "anthropic/claude-3.5-sonnet": 200000,
+    "openai/gpt-4o": 128000,
+    "openai/gpt-4o-mini": 128000,
+    "openai/gpt-4-turbo": 128000,
+    "openai/gpt-3.5-turbo": 16385,
+    "google/gemini-pro-1.5": 1000000,
+    "meta-llama/llama-3-70b-instruct": 8192,
+    "mistralai/mistral-7b-instruct": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# USD per million (prompt, completion) tokens
+DEFAULT_MODEL_PRICES = {
+    "anthropic/claude-3-haiku": [0.25, 1.25],
+    "anthropic/claude-3-sonnet": [3.0, 15.0],
+    "anthropic/claude-3-opus": [15.0, 75.0],
+    "anthropic/claude-3.5-sonnet": [3.0, 15.0],
+    "openai/gpt-4o": [2.5, 10.0],
+    "openai/gpt-4o-mini": [0.15, 0.6],
+    "openai/gpt-3.5-turbo": [0.5, 1.5],
+}
+
+# Settings and their defaults, in the order they are written to config.yaml
+DEFAULTS = {
+    "model": "anthropic/claude-3-haiku",
+    "theme": "monokai",
+    "max_tokens": 2000,
+    "temperature": 0.7,
+    "pool_size": 10,
+    "connect_timeout": 5.0,
+    "read_timeout": 60.0,
+    "max_retries": 3,
+    "backoff_factor": 0.5,
+    "cache_enabled": True,
+    "cache_max_mb": 100,
+    "cache_ttl": 604800,
+    "cache_nondeterministic": False,
+    "chunk_tokens": 8000,
+    "ingest_concurrency": 4,
+    "history_tokens": 4000,
+    "history_messages": 64,
+    "rag_enabled": True,
+    "rag_top_k": 4,
+    "rag_tokens": 2000,
+    # Models tried concurrently by !race and !compare; race_width of them start at once
+    "race_models": [],
+    "race_width": 2,
+    # Span timings shown by !stats; written to metrics_export (if set) when chat exits
+    "metrics_enabled": True,
+    "metrics_export": "",
+    "metrics_format": "jsonl",
+    # Longer responses show this many lines; the rest goes to a temp file and the pager
+    "render_max_lines": 400,
+    "render_pager": True,
+    # `review` sends this many files at once and skips files larger than review_max_bytes
+    "review_concurrency": 4,
+    "review_max_bytes": 262144,
+    # Workflow steps with no dependency between them run this many at a time
+    "workflow_concurrency": 4,
+    # Models (by prefix) that get cache_control hints on prompt prefixes of at least
+    # prompt_cache_min_tokens; other providers cache stable prefixes automatically
+    "prompt_cache_models": ["anthropic/", "google/gemini"],
+    "prompt_cache_min_tokens": 1024,
+    # CRLF -> LF in attached files; JSON and CSS also lose trailing blanks and blank-line runs
+    "minify_attachments": True,
+    # Named sets of model, max_tokens and temperature; `profile` picks one. A profile
+    # named after a model id sets max_tokens and temperature whenever that model is used.
+    "profile": "",
+    "profiles": {},
+    # Entries extend or override the built-in tables
+    "context_windows": {},
+    "model_prices": {},
+}
+# Tables that later layers extend key by key instead of replacing
+MERGED_KEYS = ("profiles", "context_windows", "model_prices")
+PROFILE_KEYS = ("model", "max_tokens", "temperature")
+
+# Per-project overrides, looked up from the working directory upwards
+PROJECT_FILE = ".devos.yaml"
+# All a project file may set: a cloned repo must not choose paths we write to
+# (metrics_export) or anything else that reaches outside the request
+PROJECT_KEYS = frozenset({
+    "model", "max_tokens", "temperature", "rag_enabled", "rag_top_k", "rag_tokens",
+    "render_max_lines", "render_pager", "profile", "profiles",
+})
+# DEVOS_AI_MAX_TOKENS=500 and so on override every file
+ENV_PREFIX = "DEVOS_AI_"
+
+
+def parse_value(key: str, raw: str) -> Any:
+    """Convert a string (env var, !config set) to the type of the setting's default."""
+    default = DEFAULTS[key]
+    if key in MERGED_KEYS:
+        raise ValueError(f"{key} can only be set in a config file")
+    if isinstance(default, bool):
+        return raw.lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(raw)
+    if isinstance(default, float):
+        return float(raw)
+    if isinstance(default, list):
+        return [item for item in raw.split(",") if item]
+    return raw
+
+
+def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
-load_dotenv()
 
 class Config:
     def __init__(self):
+        # Imported here so that merely importing config stays cheap
+        from dotenv import load_dotenv
+
+        load_dotenv()
         self.api_key = os.getenv("OPENROUTER_API_KEY")
-        self.model = os.getenv("MODEL", "anthropic/claude-3-haiku")
         self.config_path = Path.home() / ".config" / "devos-ai"
         self.config_file = self.config_path / "config.yaml"
-        
+        # Parsed YAML keyed by path and (mtime, size), so unchanged files skip PyYAML entirely
+        self.parse_cache_file = self.config_path / "config.cache.json"
+        self._parsed: Optional[Dict[str, Any]] = None
+        self._stamps = None
+
         # Create config directory if it doesn't exist
         self.config_path.mkdir(parents=True, exist_ok=True)
-        
+
         # Load or create config file
         if not self.config_file.exists():
             self._create_default_config()
         self._load_config()
-    
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on config.yaml across processes, held while it is rewritten."""
+        with open(self.config_path / "config.lock", "a") as f:
+            try:
+                import fcntl
+            except ImportError:
+                # No flock on Windows; writes are still atomic, just not serialized
+                yield
+                return
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
     def _create_default_config(self):
-        default_config = {
-            "model": self.model,
-            "theme": "monokai",
-            "max_tokens": 2000,
-            "temperature": 0.7
-        }
-        with open(self.config_file, 'w') as f:
-            yaml.safe_dump(default_config, f)
-    
+        with self._locked():
+            # Another process may have created it while we waited
+            if self.config_file.exists():
+                return
+            defaults = {key: value for key, value in DEFAULTS.items() if key not in MERGED_KEYS}
+            defaults["model"] = os.getenv("MODEL", DEFAULTS["model"])
+            self._write(self.config_file, defaults)
+
+    def _read(self, path: Path) -> Dict[str, Any]:
+        """Contents of a YAML config file, parsed only if it changed since last time."""
+        stamp = _stamp(path)
+        if stamp is None:
+            return {}
+        if self._parsed is None:
+            try:
+                with open(self.parse_cache_file, 'r') as f:
+                    self._parsed = json.load(f)
+            except (OSError, ValueError):
+                self._parsed = {}
+        cached = self._parsed.get(str(path))
+        if cached and tuple(cached[0]) == stamp:
+            return cached[1]
+
+        import yaml
+
+        try:
+            with open(path, 'r') as f:
+                data = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid config file {path}: {e}")
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid config file {path}: expected a mapping")
+        self._remember(path, stamp, data)
+        return data
+
+    def _remember(self, path: Path, stamp: Tuple[int, int], data: Dict[str, Any]):
+        from os_ops.file_handling import FileHandler
+
+        self._parsed[str(path)] = [list(stamp), data]
+        # Forget files that are gone, e.g. projects that were deleted
+        self._parsed = {name: entry for name, entry in self._parsed.items() if os.path.exists(name)}
+        try:
+            FileHandler.atomic_write(str(self.parse_cache_file), json.dumps(self._parsed).encode())
+        except (OSError, TypeError):
+            # Only a cache; YAML that JSON can't hold (dates) is simply parsed every time
+            pass
+
+    def _write(self, path: Path, data: Dict[str, Any]):
+        import yaml
+        from os_ops.file_handling import FileHandler
+
+        FileHandler.atomic_write(str(path), yaml.safe_dump(data, sort_keys=False).encode())
+        if self._parsed is None:
+            self._parsed = {}
+        self._remember(path, _stamp(path), data)
+
+    def project_file(self) -> Optional[Path]:
+        """Nearest .devos.yaml from the working directory up to home or the filesystem root."""
+        try:
+            directory = Path.cwd()
+        except OSError:
+            return None
+        home = Path.home()
+        for candidate in (directory, *directory.parents):
+            path = candidate / PROJECT_FILE
+            if path.is_file():
+                return path
+            if candidate == home:
+                break
+        return None
+
+    def _layer_stamps(self):
+        project = self.project_file()
+        env = tuple(sorted((k, v) for k, v in os.environ.items() if k.startswith(ENV_PREFIX)))
+        return _stamp(self.config_file), project, project and _stamp(project), env
+
     def _load_config(self):
-        with open(self.config_file, 'r') as f:
-            self.config = yaml.safe_load(f) or {}
-        
-        # Update instance attributes from config
-        self.model = self.config.get("model", self.model)
-        self.theme = self.config.get("theme", "monokai")
-        self.max_tokens = self.config.get("max_tokens", 2000)
-        self.temperature = self.config.get("temperature", 0.7)
-    
-    def save_config(self):
-        with open(self.config_file, 'w') as f:
-            yaml.safe_dump({
-                "model": self.model,
-                "theme": self.theme,
-                "max_tokens": self.max_tokens,
-                "temperature": self.temperature
-            }, f)
+        """Merge defaults < config.yaml < .devos.yaml < profiles < DEVOS_AI_* environment."""
+        self._stamps = self._layer_stamps()
+        project = self._stamps[1]
+        values = dict(DEFAULTS, model=os.getenv("MODEL", DEFAULTS["model"]))
+        # Which layer each setting that isn't a default came from, for !config
+        sources: Dict[str, str] = {}
+        layers = [("config.yaml", self.config_file, DEFAULTS.keys())]
+        if project:
+            layers.append((str(project), project, PROJECT_KEYS))
+        for name, path, allowed in layers:
+            layer = self._read(path)
+            for key, value in layer.items():
+                if key not in allowed:
+                    continue
+                if key in MERGED_KEYS:
+                    value = value or {}
+                    if not isinstance(value, dict):
+                        raise ValueError(f"Invalid config file {path}: {key} must be a mapping")
+                    if key == "profiles":
+                        for profile_name, profile in value.items():
+                            if not isinstance(profile, dict):
+                                raise ValueError(
+                                    f"Invalid config file {path}: profile {profile_name} must be a mapping"
+                                )
+                    value = {**values[key], **value}
+                values[key] = value
+                sources[key] = name
+
+        env = {}
+        for key in DEFAULTS:
+            raw = os.environ.get(ENV_PREFIX + key.upper())
+            if raw is not None and key not in MERGED_KEYS:
+                try:
+                    env[key] = parse_value(key, raw)
+                except ValueError as e:
+                    raise ValueError(f"{ENV_PREFIX}{key.upper()}: {e}")
+        profile_name = env.get("profile", values["profile"])
+        profile = (values["profiles"].get(profile_name) or {}) if profile_name else {}
+        for key in PROFILE_KEYS:
+            if key in profile:
+                values[key] = profile[key]
+                sources[key] = f"profile {profile_name}"
+        for key, value in env.items():
+            values[key] = value
+            sources[key] = "environment"
+        model_profile = values["profiles"].get(values["model"]) or {}
+        for key in ("max_tokens", "temperature"):
+            if key in model_profile and key not in env and key not in profile:
+                values[key] = model_profile[key]
+                sources[key] = f"profile {values['model']}"
+
+        # Plain attributes, so reads in the request path cost nothing extra
+        for key, value in values.items():
+            if key not in MERGED_KEYS:
+                setattr(self, key, value)
+        self.profiles = values["profiles"]
+        self.sources = sources
+        self.context_windows = {**DEFAULT_CONTEXT_WINDOWS, **values["context_windows"]}
+        self.model_prices = {**DEFAULT_MODEL_PRICES, **values["model_prices"]}
+
+    def refresh(self) -> bool:
+        """Reload if a config file, the project (working directory) or DEVOS_AI_* changed."""
+        if self._layer_stamps() == self._stamps:
+            return False
+        self._load_config()
+        return True
+
+    def context_window(self, model: str) -> int:
+        """Context window in tokens for a model, falling back to a conservative default."""
+        return self.context_windows.get(model, DEFAULT_CONTEXT_WINDOW)
+
+    def for_model(self, model: str) -> Tuple[int, float]:
+        """max_tokens and temperature for requests to model, honouring its profile."""
+        if model == self.model:
+            return self.max_tokens, self.temperature
+        profile = self.profiles.get(model) or {}
+        return profile.get("max_tokens", self.max_tokens), profile.get("temperature", self.temperature)
+
+    def save_config(self, *keys: str):
+        """Write settings (default: all that config.yaml decides) to config.yaml.
+
+        The file is re-read under a lock and only the given keys change, so
+        processes saving different settings at once don't undo each other.
+        """
+        keys = keys or tuple(
+            key for key in DEFAULTS
+            if key not in MERGED_KEYS and self.sources.get(key, "config.yaml") == "config.yaml"
+        )
+        with self._locked():
+            data = dict(self._read(self.config_file))
+            for key in keys:
+                data[key] = getattr(self, key)
+            self._write(self.config_file, data)
+        self._load_config()
+
+
+class LazyConfig(Config):
+    """Config that reads .env and config.yaml on first attribute access.
+
+    On first use the instance turns itself into a plain Config, so later
+    attribute reads cost nothing extra.
+    """
+
+    _load_lock = threading.RLock()
+    _loading = False
+
+    def __init__(self):
+        pass
+
+    def _load(self):
+        with LazyConfig._load_lock:
+            if type(self) is LazyConfig and not LazyConfig._loading:
+                LazyConfig._loading = True
+                try:
+                    Config.__init__(self)
+                finally:
+                    LazyConfig._loading = False
+                object.__setattr__(self, "__class__", Config)
+
+    def __getattr__(self, name):
+        # Only reached for attributes that don't exist yet, i.e. before loading
+        if name.startswith("__"):
+            raise AttributeError(name)
+        self._load()
+        return getattr(self, name)
+
+    def __setattr__(self, name, value):
+        # Load first so the file doesn't later overwrite an explicit setting
+        self._load()
+        object.__setattr__(self, name, value)
+
 
 # Instantiate the configuration
-config = Config()
+config = LazyConfig()
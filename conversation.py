@@ -0,0 +1,157 @@
+import json
+import secrets
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List
+
+from config import config
+from tokens import estimate_tokens, truncate_to_tokens
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a developer and an AI assistant. "
+    "Update the summary with the new turns. Keep decisions, file names, code identifiers, "
+    "errors and open questions; drop pleasantries. Reply with the summary only."
+)
+# Summary size kept when the model cannot be reached to summarize
+FALLBACK_SUMMARY_TOKENS = 500
+
+
+class Message:
+    __slots__ = ("seq", "role", "content", "tokens")
+
+    def __init__(self, seq: int, role: str, content: str):
+        self.seq = seq
+        self.role = role
+        self.content = content
+        self.tokens = estimate_tokens(content)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+class Conversation:
+    """Chat history: a token-bounded window of recent turns plus a rolling summary.
+
+    Every message and summary update is appended to a JSONL log under
+    ~/.config/devos-ai/sessions, so a session can be resumed by id without
+    ever rewriting the file.
+    """
+
+    def __init__(self, session_id: str, max_tokens: int, max_messages: int):
+        self.id = session_id
+        self.max_tokens = max_tokens
+        self.window: "deque[Message]" = deque(maxlen=max_messages)
+        self.summary = ""
+        self.seq = 0
+        self.path = config.config_path / "sessions" / f"{session_id}.jsonl"
+        self._log = None
+
+    @classmethod
+    def create(cls) -> "Conversation":
+        session_id = time.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(2)
+        return cls(session_id, config.history_tokens, config.history_messages)
+
+    @classmethod
+    def load(cls, session_id: str) -> Optional["Conversation"]:
+        """Replay a session log; returns None if no such session exists."""
+        conversation = cls(session_id, config.history_tokens, config.history_messages)
+        if not conversation.path.exists():
+            return None
+        with open(conversation.path, 'r') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash loses only that event
+                    continue
+                if "summary" in event:
+                    conversation.summary = event["summary"]
+                    while conversation.window and conversation.window[0].seq < event["covered"]:
+                        conversation.window.popleft()
+                else:
+                    conversation._append(Message(event["seq"], event["role"], event["content"]))
+                conversation.seq = max(conversation.seq, event.get("seq", event.get("covered", 0)))
+        return conversation
+
+    @staticmethod
+    def list_sessions() -> List[str]:
+        sessions = config.config_path / "sessions"
+        if not sessions.exists():
+            return []
+        return sorted(p.stem for p in sessions.glob("*.jsonl"))
+
+    def _write(self, event: Dict[str, Any]):
+        if self._log is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = open(self.path, 'a')
+        self._log.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._log.flush()
+
+    def _append(self, message: Message):
+        # Compaction normally keeps the ring buffer from filling; this is the backstop
+        if len(self.window) == self.window.maxlen:
+            self.window.popleft()
+        self.window.append(message)
+
+    def add(self, role: str, content: str):
+        self.seq += 1
+        message = Message(self.seq, role, content)
+        self._append(message)
+        self._write({"seq": message.seq, "role": role, "content": content})
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(m.tokens for m in self.window)
+
+    def history(self) -> List[Dict[str, str]]:
+        """Messages to send ahead of the next prompt."""
+        messages = []
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{self.summary}"
+            })
+        messages.extend(m.to_dict() for m in self.window)
+        return messages
+
+    def last_reply(self) -> Optional[str]:
+        """The most recent assistant message still in the window."""
+        for message in reversed(self.window):
+            if message.role == "assistant":
+                return message.content
+        return None
+
+    def needs_compaction(self) -> bool:
+        return self.tokens > self.max_tokens or len(self.window) >= self.window.maxlen
+
+    def compact(self, client) -> bool:
+        """Fold the oldest turns into the summary once the window exceeds its budget."""
+        if not self.needs_compaction():
+            return False
+
+        # Shrink to 3/4 of the budget so we don't summarize again on the very next turn
+        target_tokens = self.max_tokens * 3 // 4
+        target_messages = self.window.maxlen * 3 // 4
+        evicted: List[Message] = []
+        while len(self.window) > 2 and (self.tokens > target_tokens or len(self.window) > target_messages):
+            evicted.append(self.window.popleft())
+        if not evicted:
+            return False
+
+        turns = "\n\n".join(f"{m.role.upper()}: {m.content}" for m in evicted)
+        prompt = f"Current summary:\n{self.summary or '(none)'}\n\nNew turns:\n{turns}"
+        response = client.send_prompt(prompt, SUMMARY_SYSTEM_PROMPT, cache=False, temperature=0)
+        content = ""
+        if "error" not in response:
+            content = response.get("choices", [{}])[0].get("message", {}).get("content", "")
+        if not content:
+            content = truncate_to_tokens(f"{self.summary}\n{turns}".strip(), FALLBACK_SUMMARY_TOKENS)
+
+        self.summary = content
+        self._write({"summary": content, "covered": evicted[-1].seq + 1})
+        return True
+
+    def close(self):
+        if self._log:
+            self._log.close()
+            self._log = None
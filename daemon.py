@@ -0,0 +1,293 @@
+"""Background server that keeps devos-ai warm between CLI invocations.
+
+The daemon owns one interpreter with everything already imported: the
+pooled AI client, response cache, file indexes and git status cache. A
+CLI invocation connects to its Unix socket, sends its argv, working
+directory and terminal details, and relays the output it gets back.
+
+Wire format: one JSON request line from the client, then JSON lines from
+the daemon: {"out": text}, {"err": text} and finally {"exit": code}.
+
+This module is imported on every CLI start, so it only uses the standard
+library and keeps imports inside functions.
+"""
+import json
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Subcommands a running daemon executes on the CLI's behalf. Anything
+# interactive or reading stdin (chat, batch) always runs in-process.
+FORWARDED = {"ask", "find-files", "git-diff", "git-status", "grep", "index", "web-search"}
+CONNECT_TIMEOUT = 0.2
+
+# Set inside the daemon so its own command runs don't forward again
+serving = False
+
+
+def socket_path() -> Path:
+    """Same directory as config.yaml, without paying for loading the config."""
+    override = os.environ.get("DEVOS_AI_SOCKET")
+    if override:
+        return Path(override)
+    return Path.home() / ".config" / "devos-ai" / "daemon.sock"
+
+
+def _connect(timeout: float = CONNECT_TIMEOUT) -> Optional[socket.socket]:
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(socket_path()))
+    except OSError:
+        sock.close()
+        return None
+    # Replies may take as long as the command does
+    sock.settimeout(None)
+    return sock
+
+
+def _send(sock: socket.socket, message: Dict[str, Any]):
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def forward(argv: List[str]) -> Optional[int]:
+    """Run a CLI command in the daemon and relay its output.
+
+    Returns the exit code, or None when no daemon is listening and the
+    command should run in-process.
+    """
+    if serving or os.environ.get("DEVOS_AI_NO_DAEMON"):
+        return None
+    sock = _connect()
+    if sock is None:
+        return None
+    import shutil
+
+    try:
+        _send(sock, {
+            "argv": argv,
+            "cwd": os.getcwd(),
+            "tty": sys.stdout.isatty(),
+            "width": shutil.get_terminal_size().columns,
+            # Settings overrides (DEVOS_AI_MODEL=...) apply to this command only
+            "env": {k: v for k, v in os.environ.items() if k.startswith("DEVOS_AI_")},
+        })
+        with sock.makefile("rb") as replies:
+            for line in replies:
+                message = json.loads(line)
+                if "out" in message:
+                    sys.stdout.write(message["out"])
+                    sys.stdout.flush()
+                elif "err" in message:
+                    sys.stderr.write(message["err"])
+                    sys.stderr.flush()
+                elif "exit" in message:
+                    return message["exit"]
+    except BrokenPipeError:
+        # Our stdout was closed early (| head); the daemon stops relaying on its own
+        return 1
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Lost connection to devos-ai daemon: {e}\n")
+        return 1
+    finally:
+        sock.close()
+    return 1
+
+
+def request(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Send a control message (status, stop) and return the daemon's reply."""
+    sock = _connect()
+    if sock is None:
+        return None
+    try:
+        _send(sock, message)
+        with sock.makefile("rb") as replies:
+            line = replies.readline()
+        return json.loads(line) if line else None
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+
+class _Relay:
+    """Text stream that sends every write to the client as one JSON frame."""
+
+    def __init__(self, sock: socket.socket, key: str, tty: bool):
+        self.sock = sock
+        self.key = key
+        self.tty = tty
+        self.closed = False
+
+    def write(self, text: str) -> int:
+        if text and not self.closed:
+            try:
+                _send(self.sock, {self.key: text})
+            except OSError:
+                # Client went away (Ctrl-C); finish the command silently
+                self.closed = True
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return self.tty
+
+
+class Daemon:
+    def __init__(self, cli):
+        import threading
+
+        self.cli = cli
+        self.started = time.time()
+        self.served = 0
+        self.stopping = False
+        # Commands chdir and swap the UI console, so they run one at a time
+        self.lock = threading.Lock()
+
+    def serve(self):
+        global serving
+        import threading
+
+        import ui
+
+        serving = True
+        self.ui = ui
+        path = socket_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            if request({"control": "status"}) is not None:
+                raise RuntimeError(f"A daemon is already listening on {path}")
+            path.unlink()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)
+        try:
+            server.bind(str(path))
+        finally:
+            os.umask(umask)
+        server.listen(16)
+        print(f"devos-ai daemon {os.getpid()} listening on {path}", flush=True)
+        try:
+            while not self.stopping:
+                conn, _ = server.accept()
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _handle(self, conn: socket.socket):
+        with conn:
+            try:
+                with conn.makefile("rb") as lines:
+                    message = json.loads(lines.readline())
+            except (OSError, ValueError):
+                return
+            control = message.get("control")
+            if control == "status":
+                _send(conn, {"pid": os.getpid(), "uptime": time.time() - self.started, "served": self.served})
+            elif control == "stop":
+                self.stopping = True
+                _send(conn, {"stopping": True})
+                # Wake the accept() loop so it sees the flag
+                waker = _connect()
+                if waker:
+                    waker.close()
+            elif "argv" in message:
+                code = self._run(conn, message)
+                try:
+                    _send(conn, {"exit": code})
+                except OSError:
+                    pass
+
+    def _run(self, conn: socket.socket, message: Dict[str, Any]) -> int:
+        from contextlib import redirect_stderr, redirect_stdout
+
+        import click
+        from rich.console import Console
+
+        from config import config
+
+        out = _Relay(conn, "out", message.get("tty", False))
+        err = _Relay(conn, "err", message.get("tty", False))
+        console = Console(
+            file=out,
+            theme=self.ui.terminal_theme,
+            force_terminal=message.get("tty", False),
+            width=message.get("width") or 80,
+        )
+        with self.lock:
+            self.served += 1
+            previous_console, previous_cwd = self.ui.console, os.getcwd()
+            previous_env = {k: v for k, v in os.environ.items() if k.startswith("DEVOS_AI_")}
+            self.ui.console = console
+            try:
+                os.chdir(message["cwd"])
+                self._set_env(message.get("env") or {})
+                with redirect_stdout(out), redirect_stderr(err):
+                    try:
+                        # The client's directory may have its own .devos.yaml
+                        config.refresh()
+                        # Without standalone mode click returns ctx.exit() codes instead of raising
+                        code = self.cli.main(args=message["argv"], prog_name="devos-ai", standalone_mode=False)
+                        return code if isinstance(code, int) else 0
+                    except SystemExit as e:
+                        # Commands call sys.exit(1/2) on errors; report the code as running in-process would
+                        if e.code is None or isinstance(e.code, int):
+                            return e.code or 0
+                        err.write(f"{e.code}\n")
+                        return 1
+                    except click.exceptions.Exit as e:
+                        return e.exit_code
+                    except click.ClickException as e:
+                        e.show(file=err)
+                        return e.exit_code
+                    except click.Abort:
+                        err.write("Aborted!\n")
+                        return 1
+                    except Exception as e:
+                        err.write(f"Error: {e}\n")
+                        return 1
+            except OSError as e:
+                err.write(f"Error: {e}\n")
+                return 1
+            finally:
+                self.ui.console = previous_console
+                os.chdir(previous_cwd)
+                self._set_env(previous_env)
+
+    @staticmethod
+    def _set_env(env: Dict[str, str]):
+        """Replace the DEVOS_AI_* variables with env."""
+        for key in [k for k in os.environ if k.startswith("DEVOS_AI_")]:
+            del os.environ[key]
+        os.environ.update(env)
+
+
+def start(log_path: Path) -> bool:
+    """Launch a detached daemon and wait until it answers."""
+    import subprocess
+
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    main_script = Path(__file__).resolve().parent / "main.py"
+    with open(log_path, "a") as log:
+        subprocess.Popen(
+            [sys.executable, str(main_script), "daemon", "run"],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+            start_new_session=True,
+        )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        if request({"control": "status"}) is not None:
+            return True
+        time.sleep(0.05)
+    return False
@@ -0,0 +1,166 @@
+import codecs
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+
+# Rough size of a token in source text, used to turn token budgets into characters
+CHARS_PER_TOKEN = 4
+SNIFF_BYTES = 8192
+READ_BUFFER = 1 << 20
+
+# Bytes that show up in text files; anything else below 0x20 hints at binary
+_TEXT_CONTROL = {7, 8, 9, 10, 12, 13, 27}
+
+MAP_SYSTEM_PROMPT = (
+    "You are analyzing one part of a file that is too large to read at once. "
+    "Summarize what this part contains and point out bugs, errors, or notable details. "
+    "Be concise; your notes will be merged with notes on the other parts."
+)
+REDUCE_SYSTEM_PROMPT = (
+    "You are given notes on consecutive parts of one large file. "
+    "Merge them into a single coherent analysis of the whole file, "
+    "removing repetition and keeping concrete findings."
+)
+
+
+def sniff_file(file_path: str) -> Tuple[bool, Optional[str]]:
+    """Return (is_binary, encoding) judged from the first few KB only."""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+
+    if head.startswith(codecs.BOM_UTF8):
+        return False, "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return False, "utf-16"
+    if b"\0" in head:
+        return True, None
+    try:
+        # Incremental decode tolerates a multibyte character cut off at the sample edge
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return False, "utf-8"
+    except UnicodeDecodeError:
+        pass
+    control = sum(1 for b in head if b < 0x20 and b not in _TEXT_CONTROL)
+    if head and control / len(head) > 0.1:
+        return True, None
+    return False, "latin-1"
+
+
+def _is_boundary(line: str) -> bool:
+    """Blank lines and top-level statements are good places to split source and logs."""
+    return not line.strip() or not line[0].isspace()
+
+
+def iter_chunks(file_path: str, max_tokens: int, encoding: str = "utf-8") -> Iterator[str]:
+    """Yield pieces of a file of at most max_tokens, split on line boundaries.
+
+    Once a chunk is past 80% of its budget it is cut at the next blank or
+    top-level line, so functions and log records tend to stay whole. Only
+    the current chunk is held in memory.
+    """
+    budget = max(1, max_tokens) * CHARS_PER_TOKEN
+    soft_limit = int(budget * 0.8)
+    parts: List[str] = []
+    size = 0
+
+    with open(file_path, 'r', encoding=encoding, errors='replace', buffering=READ_BUFFER) as f:
+        while True:
+            # Bounded readline: a minified file or huge log record comes back in budget-sized pieces
+            line = f.readline(budget)
+            if not line:
+                break
+            if size + len(line) > budget or (size >= soft_limit and _is_boundary(line)):
+                if parts:
+                    yield "".join(parts)
+                parts, size = [], 0
+            parts.append(line)
+            size += len(line)
+    if parts:
+        yield "".join(parts)
+
+
+def _content(response: Dict[str, Any]) -> str:
+    return response.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+
+def _map_chunks(client, file_path: str, chunks: Iterator[str], estimated: int,
+                concurrency: int) -> List[str]:
+    """Summarize chunks concurrently, keeping at most `concurrency` chunks in flight."""
+    name = os.path.basename(file_path)
+    notes: List[str] = []
+    in_flight = deque()
+
+    def collect(future):
+        response = future.result()
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        notes.append(_content(response))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            for i, chunk in enumerate(chunks, 1):
+                prompt = f"Part {i} of ~{estimated} of {name}:\n```\n{chunk}\n```"
+                in_flight.append(pool.submit(client.send_prompt, prompt, MAP_SYSTEM_PROMPT))
+                if len(in_flight) >= concurrency:
+                    collect(in_flight.popleft())
+            while in_flight:
+                collect(in_flight.popleft())
+        finally:
+            for future in in_flight:
+                future.cancel()
+    return notes
+
+
+def _reduce_notes(client, file_path: str, notes: List[str], max_tokens: int,
+                  question: Optional[str]) -> Dict[str, Any]:
+    """Merge notes, folding them in budget-sized groups until one prompt fits."""
+    budget = max_tokens * CHARS_PER_TOKEN
+    name = os.path.basename(file_path)
+    while True:
+        groups, current, size = [], [], 0
+        for note in notes:
+            if current and size + len(note) > budget:
+                groups.append(current)
+                current, size = [], 0
+            current.append(note)
+            size += len(note)
+        groups.append(current)
+        if len(groups) == len(notes) > 1:
+            # Notes too long to pair up: merge everything in one go rather than loop
+            groups = [notes]
+
+        final = len(groups) == 1
+        merged = []
+        for group in groups:
+            body = "\n\n".join(f"--- Notes {i} ---\n{note}" for i, note in enumerate(group, 1))
+            ask = question if final and question else f"Analyze {name} based on these notes."
+            response = client.send_prompt(f"{ask}\n\n{body}", REDUCE_SYSTEM_PROMPT)
+            if "error" in response:
+                return response
+            merged.append(_content(response))
+        if final:
+            return {"content": merged[0]}
+        notes = merged
+
+
+def analyze_large_file(client, file_path: str, max_tokens: int, concurrency: int = 4,
+                       question: Optional[str] = None) -> Dict[str, Any]:
+    """Map-reduce analysis of a file too large for one prompt."""
+    is_binary, encoding = sniff_file(file_path)
+    if is_binary:
+        return {"error": f"{file_path} looks like a binary file"}
+
+    estimated = max(1, os.path.getsize(file_path) // (max_tokens * CHARS_PER_TOKEN) + 1)
+    try:
+        notes = _map_chunks(client, file_path, iter_chunks(file_path, max_tokens, encoding),
+                            estimated, concurrency)
+    except RuntimeError as e:
+        return {"error": str(e)}
+    if not notes:
+        return {"error": f"{file_path} is empty"}
+
+    result = _reduce_notes(client, file_path, notes, max_tokens, question)
+    if "error" not in result:
+        result["chunks"] = len(notes)
+    return result
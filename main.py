@@ -1,61 +1,204 @@
+import os
+import sys
+from typing import TYPE_CHECKING, Optional
 import click
-from rich.syntax import Syntax
-from ui import (
-    console,
-    display_welcome,
-    display_response,
-    display_error,
-    show_progress,
-)
-from ai_client import AIClient
-from utils import detect_language, get_file_content
-from config import config
-from os_ops.file_handling import FileHandler
-from os_ops.app_control import AppController
-from os_ops.git_utils import GitManager
-from os_ops.web_resources import WebResourceFinder
+
+# Subcommands import what they need when they run, so `--version`, `--help`
+# and light commands skip rich, requests, psutil and config loading.
+if TYPE_CHECKING:
+    from ai_client import AIClient
+
+
+# Cap on matches shown by !find and !grep in chat
+FIND_LIMIT = 200
+# Context lines around each !grep match handed to the AI
+GREP_CONTEXT = 3
+# Rows shown by !apps and !top
+APPS_LIMIT = 25
+# Characters of page text shown by !fetch and !search --fetch
+PAGE_PREVIEW_CHARS = 3000
+
+# System prompts for !git commit-msg / !git review and their git-diff equivalents
+DIFF_PROMPTS = {
+    "commit": (
+        "Write a git commit message for this diff: a summary line under 72 characters, "
+        "a blank line, then a short body saying what changed and why. Reply with the message only."
+    ),
+    "review": (
+        "Review this diff. Point out bugs, risky changes and missing tests, citing the file "
+        "and hunk. Be concise and say so plainly if it looks fine."
+    ),
+}
 
 
 @click.group()
 @click.version_option("0.1.0", prog_name="DevOS AI")
-def cli():
+@click.pass_context
+def cli(ctx):
     """DevOS AI - Your AI Development Assistant"""
-    pass
+    from daemon import FORWARDED, forward
+
+    # A running daemon answers with everything already warm; otherwise run here
+    if ctx.invoked_subcommand in FORWARDED:
+        code = forward(sys.argv[1:])
+        if code is not None:
+            ctx.exit(code)
 
 
 @cli.command()
-def chat():
+@click.option('--resume', 'session_id', help="Resume a saved chat session by id")
+def chat(session_id):
     """Start interactive chat session"""
+    import metrics
+    from ai_client import AIClient, AIClientError
+    from code_index import CodeIndex
+    from config import config
+    from conversation import Conversation
+    from ingest import CHARS_PER_TOKEN, analyze_large_file, sniff_file
+    from os_ops.app_control import AppController
+    from os_ops.content_search import ContentSearcher
+    from os_ops.file_handling import FileHandler
+    from os_ops.web_resources import WebResourceFinder
+    from ui import (
+        console,
+        display_error,
+        display_grep_match,
+        display_response,
+        display_stream,
+        display_welcome,
+        live_process_view,
+        process_table,
+        show_progress,
+    )
+    from utils import detect_language, get_file_content
+
+    metrics.set_enabled(config.metrics_enabled)
+
+    if session_id:
+        conversation = Conversation.load(session_id)
+        if conversation is None:
+            display_error(f"No saved session {session_id}. Sessions: {', '.join(Conversation.list_sessions()) or 'none'}")
+            return
+    else:
+        conversation = Conversation.create()
+
     display_welcome()
+    console.print(f"[info]Session {conversation.id} (resume with: devos-ai chat --resume {conversation.id})[/info]")
     ai_client = AIClient()
+    # Files pinned with @file or !attach; sent ahead of the history every turn so
+    # the provider can serve that prefix from its prompt cache
+    attachments = {}
+    # Retrieval only kicks in once `devos-ai index` has been run for this directory
+    code_index = CodeIndex.open(os.getcwd()) if config.rag_enabled else None
+    if code_index:
+        console.print(f"[info]Using code index for {code_index.root} ({code_index.chunks} chunks)[/info]")
 
     while True:
         try:
             prompt = click.prompt("\n[devos-ai]", prompt_suffix=" >>> ")
+            # Pick up edits to config.yaml or .devos.yaml made since the last prompt
+            try:
+                config.refresh()
+            except ValueError as e:
+                display_error(str(e))
 
             if prompt.lower() in ('exit', 'quit', '!exit', '!quit'):
                 click.echo("Exiting DevOS AI. Goodbye!")
                 break
             
             if prompt.startswith('!apps'):
-                apps = AppController.list_running_apps()
-                display_response("Running applications:\n" + "\n".join(apps))
+                name = prompt[5:].strip() or None
+                rows = AppController.snapshot().query(name=name, limit=APPS_LIMIT)
+                console.print(process_table(rows, f"Running applications (top {APPS_LIMIT} by memory)"))
+                continue
+
+            if prompt.startswith('!top'):
+                name = prompt[4:].strip() or None
+                # max_age=0 takes a fresh snapshot per frame; CPU% is the delta since the last one
+                live_process_view(
+                    lambda: AppController.snapshot(max_age=0).query(name=name, sort='cpu', limit=APPS_LIMIT),
+                    "Top processes by CPU"
+                )
+                continue
+
+            if prompt.startswith('!kill'):
+                app_name = prompt[5:].strip()
+                if not app_name:
+                    display_error("Usage: !kill <app>")
+                    continue
+                display_response(AppController.kill_app(app_name))
                 continue
 
             # Handle special commands
             if prompt.startswith('!config'):
-                handle_config_command(prompt)
+                handle_config_command(prompt, ai_client)
                 continue
 
-            elif prompt.startswith('!git'):
-                repo_path = prompt[4:].strip() or '.'
-                status = GitManager.get_status(repo_path)
-                if 'error' in status:
-                    display_error(status['error'])
+            elif prompt.startswith('!cache'):
+                handle_cache_command(prompt, ai_client)
+                continue
+
+            elif prompt.startswith('!usage'):
+                handle_usage_command(ai_client)
+                continue
+
+            elif prompt.startswith(('!attach', '!detach')):
+                handle_attach_command(prompt, attachments)
+                continue
+
+            elif prompt.startswith('!workflow'):
+                args = prompt.split()[1:]
+                names = [arg for arg in args if not arg.startswith("--")]
+                run_workflow_command(names[0] if names else None, "--dry-run" in args, "--force" in args)
+                continue
+
+            elif prompt.startswith('!stats'):
+                handle_stats_command(prompt)
+                continue
+
+            elif prompt.startswith('!apply'):
+                handle_apply_command(prompt, conversation)
+                continue
+
+            elif prompt.startswith('!race'):
+                race_prompt = prompt[5:].strip()
+                if not race_prompt:
+                    display_error("Usage: !race <prompt>")
+                    continue
+                with show_progress(f"Racing {', '.join(config.race_models or [config.model])}..."):
+                    result = ai_client.race_prompt(race_prompt, history=conversation.history())
+                if "error" in result:
+                    display_error(result["error"])
+                    continue
+                content = result["choices"][0]["message"]["content"]
+                display_response(content)
+                if "latency" in result:
+                    console.print(f"[info]Answered by {result['model']} in {result['latency']:.2f}s[/info]")
                 else:
-                    display_response(
-                        f"Git status for {repo_path}:\nBranch: {status['branch']}\n{status['status']}"
-                    )
+                    console.print(f"[info]Answered by {result['model']} (cached)[/info]")
+                conversation.add("user", race_prompt)
+                conversation.add("assistant", content)
+                continue
+
+            elif prompt.startswith('!compare'):
+                compare_prompt = prompt[8:].strip()
+                if not compare_prompt:
+                    display_error("Usage: !compare <prompt>")
+                    continue
+                with show_progress("Asking every model..."):
+                    results = ai_client.compare_prompt(compare_prompt, history=conversation.history())
+                for result in results:
+                    if "error" in result:
+                        display_error(f"{result['model']}: {result['error']}")
+                    else:
+                        display_response(
+                            f"## {result['model']} ({result['latency']:.2f}s)\n\n"
+                            + result["choices"][0]["message"]["content"]
+                        )
+                continue
+
+            elif prompt.startswith('!git'):
+                handle_git_command(prompt, ai_client, conversation)
                 continue
 
             elif prompt.startswith('!open'):
@@ -65,23 +208,116 @@ def chat():
                 continue
 
             elif prompt.startswith('!find'):
-                pattern = prompt[5:].strip()
-                files = FileHandler.find_files(pattern)
+                args = prompt[5:].split()
+                if not args:
+                    display_error("Usage: !find <pattern> [directory]")
+                    continue
+                directory = args[1] if len(args) > 1 else '.'
+                files = FileHandler.find_files(args[0], directory, limit=FIND_LIMIT)
                 display_response("Found files:\n" + "\n".join(files))
                 continue
 
+            elif prompt.startswith('!grep'):
+                import re
+                import shlex
+
+                query, _, question = prompt[5:].partition(' -- ')
+                try:
+                    args = shlex.split(query)
+                except ValueError as e:
+                    display_error(str(e))
+                    continue
+                if not args:
+                    display_error("Usage: !grep <regex> [directory] [-- question]")
+                    continue
+                question = question.strip()
+                matches = []
+                try:
+                    # Printed as found; with a question they become the AI's only context
+                    for match in ContentSearcher.search(
+                        args[0], args[1] if len(args) > 1 else '.',
+                        context=GREP_CONTEXT if question else 0, limit=FIND_LIMIT
+                    ):
+                        display_grep_match(match._replace(before=(), after=()))
+                        matches.append(match)
+                except re.error as e:
+                    display_error(f"Invalid pattern: {e}")
+                    continue
+                if not matches:
+                    display_error(f"No matches for {args[0]}")
+                    continue
+                console.print(f"[info]{len(matches)} matches[/info]")
+                if not question:
+                    continue
+                context = ContentSearcher.format_snippets(matches, config.rag_tokens)
+                try:
+                    ai_response = display_stream(ai_client.stream_prompt(
+                        question,
+                        attachments=attachments,
+                        history=conversation.history(),
+                        context=f"Matching lines from the project for `{args[0]}`:\n\n{context}",
+                    ))
+                except AIClientError as e:
+                    display_error(str(e))
+                    continue
+                if ai_response:
+                    conversation.add("user", question)
+                    conversation.add("assistant", ai_response)
+                continue
+
             elif prompt.startswith('!search'):
                 query = prompt[7:].strip()
+                if query.startswith('--fetch'):
+                    with show_progress("Searching and fetching pages..."):
+                        pages = WebResourceFinder.search_and_fetch(query[7:].strip())
+                    display_response("\n\n".join(format_page(page) for page in pages) or "No results")
+                    continue
                 results = WebResourceFinder.search_web(query)
                 display_response("Web results:\n" + "\n".join(results))
                 continue
 
+            elif prompt.startswith('!fetch'):
+                url = prompt[6:].strip()
+                if not url:
+                    display_error("Usage: !fetch <url>")
+                    continue
+                with show_progress(f"Fetching {url}..."):
+                    page = WebResourceFinder.fetch_page(url)
+                display_response(format_page(page))
+                continue
+
             # Handle file input
-            if prompt.startswith('@'):
+            from_file = prompt.startswith('@')
+            if from_file:
                 file_path = prompt[1:].strip()
+                if not os.path.isfile(file_path):
+                    display_error(f"File not found: {file_path}")
+                    continue
+                if sniff_file(file_path)[0]:
+                    display_error(f"Cannot analyze binary file: {file_path}")
+                    continue
+                # Too big for one prompt: summarize chunks concurrently, then merge
+                chunk_tokens = min(config.chunk_tokens, config.context_window(config.model) // 2)
+                if os.path.getsize(file_path) > chunk_tokens * CHARS_PER_TOKEN:
+                    with show_progress(f"Analyzing {file_path} in chunks..."):
+                        result = analyze_large_file(
+                            ai_client, file_path, chunk_tokens, config.ingest_concurrency
+                        )
+                    if "error" in result:
+                        display_error(result["error"])
+                    else:
+                        display_response(result["content"])
+                    continue
                 file_content = get_file_content(file_path)
                 if file_content:
-                    prompt = f"Analyze this file:\n```\n{file_content}\n```"
+                    error = attachment_budget_error(file_path, file_content, attachments)
+                    if error:
+                        display_error(error)
+                        continue
+                    # Pinned rather than pasted into the prompt: follow-up questions reuse the cached prefix
+                    attachments[file_path] = file_content
+                    console.print(f"[info]Attached {file_path} (!detach to drop it)[/info]")
+                    prompt = f"Analyze the attached file {file_path}."
                 else:
                     display_error(f"File not found: {file_path}")
                     continue
@@ -91,18 +327,41 @@ def chat():
             if not clean_prompt:
                 continue
 
-            # Get AI response
-            with show_progress("Processing..."):
-                response = ai_client.send_prompt(clean_prompt)
-
-            if "error" in response:
-                display_error(response["error"])
-            else:
-                ai_response = response.get("choices", [{}])[0].get("message", {}).get("content", "")
-                if ai_response:
-                    display_response(ai_response, language)
+            context = None
+            # The file itself is the context for @file prompts
+            if code_index and not from_file:
+                context, hits = code_index.context_for(clean_prompt, config.rag_top_k, config.rag_tokens)
+                if hits:
+                    sources = ", ".join(f"{h['path']}:{h['start']}-{h['end']}" for h in hits)
+                    console.print(f"[info]Context: {sources}[/info]")
                 else:
-                    display_error("Received empty response from AI")
+                    context = None
+
+            # Stream AI response as it is generated. Retrieved code changes every
+            # turn, so it goes after the history and leaves the cached prefix intact.
+            try:
+                ai_response = display_stream(
+                    ai_client.stream_prompt(
+                        clean_prompt,
+                        attachments=attachments,
+                        history=conversation.history(),
+                        context=context,
+                    ),
+                    language
+                )
+            except AIClientError as e:
+                display_error(str(e))
+                continue
+
+            if not ai_response:
+                display_error("Received empty response from AI")
+                continue
+
+            conversation.add("user", clean_prompt)
+            conversation.add("assistant", ai_response)
+            if conversation.needs_compaction():
+                with show_progress("Summarizing earlier conversation..."):
+                    conversation.compact(ai_client)
 
         except KeyboardInterrupt:
             click.echo("\nExiting DevOS AI. Goodbye!")
@@ -111,17 +370,54 @@ def chat():
             display_error(f"An error occurred: {str(e)}")
             continue
 
+    if config.metrics_enabled and config.metrics_export:
+        try:
+            metrics.export(os.path.expanduser(config.metrics_export), config.metrics_format)
+        except (OSError, ValueError) as e:
+            display_error(f"Could not export metrics: {str(e)}")
+
 
-def handle_config_command(prompt: str):
+def handle_config_command(prompt: str, ai_client: Optional["AIClient"] = None):
     """Handle configuration commands."""
+    from config import config
+    from ui import display_error
+
     args = prompt.split()[1:]
 
     if not args:
         click.echo("\nCurrent Configuration:")
+        if config.profile:
+            click.echo(f"Profile: {config.profile}")
         click.echo(f"Model: {config.model}")
         click.echo(f"Theme: {config.theme}")
         click.echo(f"Max Tokens: {config.max_tokens}")
         click.echo(f"Temperature: {config.temperature}")
+        click.echo(f"Timeouts: connect {config.connect_timeout}s, read {config.read_timeout}s")
+        click.echo(f"Retries: {config.max_retries} (backoff {config.backoff_factor}s)")
+        click.echo(f"Pool Size: {config.pool_size}")
+        click.echo(f"Context Window: {config.context_window(config.model)} tokens")
+        click.echo(f"Code Retrieval: {'on' if config.rag_enabled else 'off'} "
+                   f"(top {config.rag_top_k}, {config.rag_tokens} tokens)")
+        overridden = {key: source for key, source in config.sources.items() if source != "config.yaml"}
+        if overridden:
+            click.echo("Overrides: " + ", ".join(f"{key} ({source})" for key, source in sorted(overridden.items())))
+        if config.race_models:
+            click.echo(f"Race Models: {', '.join(config.race_models)} ({config.race_width} at once)")
+        if ai_client:
+            usage = ai_client.usage.summary()
+            click.echo(
+                f"Session Usage: {usage['requests']} requests, "
+                f"{usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens, "
+                f"${usage['cost']:.4f}"
+                + (f" ({usage['estimated']} estimated)" if usage['estimated'] else "")
+                + f", {usage['cached_tokens']} cached, {usage['bytes_sent'] / 1024:.1f} KB sent"
+            )
+            for model in ai_client.rank_models(list(ai_client.model_latency)):
+                latency = ai_client.model_latency[model]
+                click.echo(
+                    f"  {model}: first token p50 {latency.quantile(0.5):.2f}s, "
+                    f"p95 {latency.quantile(0.95):.2f}s ({latency.count} samples)"
+                )
         return
 
     if args[0] == "set":
@@ -130,43 +426,454 @@ def handle_config_command(prompt: str):
             return
 
         key, value = args[1], args[2]
+        from config import DEFAULTS, parse_value
+
+        if key not in DEFAULTS:
+            display_error(f"Invalid config key: {key}")
+            return
         try:
-            if key == "model":
-                config.model = value
-            elif key == "theme":
-                config.theme = value
-            elif key == "max_tokens":
-                config.max_tokens = int(value)
-            elif key == "temperature":
-                config.temperature = float(value)
-            else:
-                display_error(f"Invalid config key: {key}")
-                return
-
-            config.save_config()
+            parsed = parse_value(key, value)
+            if key == "metrics_format" and parsed not in ("jsonl", "prometheus"):
+                raise ValueError("metrics_format must be jsonl or prometheus")
+            if key == "profile" and parsed == "none":
+                parsed = ""
+            if key == "profile" and parsed and parsed not in config.profiles:
+                raise ValueError(f"no profile named {parsed} in profiles")
+            setattr(config, key, parsed)
+            config.save_config(key)
+            if key == "metrics_enabled":
+                import metrics
+                metrics.set_enabled(config.metrics_enabled)
             click.echo(f"Updated {key} to {value}")
+            # Saved to config.yaml, but a project file, profile or env var still wins
+            source = config.sources.get(key, "config.yaml")
+            if source != "config.yaml":
+                click.echo(f"Note: {key} is {getattr(config, key)} here, set by {source}")
         except ValueError as e:
             display_error(f"Invalid value: {str(e)}")
 
 
+def handle_git_command(prompt: str, ai_client: "AIClient", conversation):
+    """!git [status|branch] [repo], !git diff [--staged] [paths], !git commit-msg|review [--staged]."""
+    from ai_client import AIClientError
+    from os_ops.git_utils import GitManager
+    from ui import console, display_error, display_response, display_stream
+
+    args = prompt.split()[1:]
+    action = args.pop(0) if args and args[0] in ("status", "branch", "diff", "commit-msg", "review") else "status"
+    if action in ("status", "branch"):
+        repo_path = args[0] if args else '.'
+        status = GitManager.get_status(repo_path)
+        if 'error' in status:
+            display_error(status['error'])
+        elif action == "branch":
+            display_response(f"Branch: {format_branch(status)}")
+        else:
+            display_response(
+                f"Git status for {repo_path}:\nBranch: {format_branch(status)}\n{status['status']}"
+            )
+        return
+
+    # Commit messages describe what is staged; reviews default to the working tree
+    staged = "--staged" in args or "--cached" in args or action == "commit-msg"
+    paths = [arg for arg in args if not arg.startswith("--")]
+    diff = GitManager.get_diff('.', staged=staged, paths=paths or None)
+    if 'error' in diff:
+        display_error(diff['error'])
+        return
+    if not diff['files']:
+        display_error(f"No {'staged' if staged else 'unstaged'} changes")
+        return
+    console.print(f"[info]{diff['stat']}[/info]")
+    if action == "diff":
+        display_response(f"```diff\n{diff['diff']}```")
+        return
+
+    prompt_text, system_prompt = diff_request(diff, "commit" if action == "commit-msg" else "review")
+    try:
+        reply = display_stream(ai_client.stream_prompt(prompt_text, system_prompt))
+    except AIClientError as e:
+        display_error(str(e))
+        return
+    if reply:
+        conversation.add("user", f"!git {action}")
+        conversation.add("assistant", reply)
+
+
+def diff_request(diff: dict, task: str):
+    """(prompt, system prompt) asking the AI about a GitManager.get_diff result."""
+    from config import config
+    from tokens import truncate_to_tokens
+
+    # Leave half the context window for the answer and the system prompt
+    body = truncate_to_tokens(diff['diff'], config.context_window(config.model) // 2)
+    scope = "Staged changes" if diff['staged'] else "Unstaged changes"
+    return f"{scope}:\n{diff['stat']}\n\n```diff\n{body}\n```", DIFF_PROMPTS[task]
+
+
+def handle_apply_command(prompt: str, conversation):
+    """Write the code blocks of the last AI reply to disk, or undo the last batch."""
+    from os_ops.code_apply import CodeApplier
+    from ui import console, display_error, display_response, display_success
+
+    args = prompt.split()[1:]
+    if args and args[0] == "undo":
+        result = CodeApplier.undo(args[1] if len(args) > 1 else None)
+        if "error" in result:
+            display_error(result["error"])
+            return
+        display_success(f"Restored {result['restored']} files from batch {result['batch']}")
+        for path in result["conflicts"]:
+            display_error(f"Left {path} alone: it changed after the batch was applied")
+        return
+
+    dry_run = "--dry-run" in args
+    show_diff = dry_run or "--diff" in args
+    paths = [arg for arg in args if not arg.startswith("--")]
+    root = paths[0] if paths else "."
+
+    reply = conversation.last_reply()
+    if not reply:
+        display_error("No AI reply to apply yet")
+        return
+    changes, warnings = CodeApplier.plan(reply, root)
+    for warning in warnings:
+        console.print(f"[warning]{warning}[/warning]")
+    if not changes:
+        display_error("No code blocks with file paths found in the last reply")
+        return
+
+    styles = {"create": "green", "modify": "yellow", "unchanged": "dim"}
+    for change in changes:
+        console.print(f"[{styles[change.action]}]{change.action:9}[/{styles[change.action]}] {change.rel}")
+    pending = sum(1 for change in changes if change.action != "unchanged")
+    if show_diff and pending:
+        display_response(f"```diff\n{CodeApplier.diff(changes)}```")
+    if dry_run or not pending:
+        return
+    if not click.confirm(f"Write {pending} file(s)?", default=True):
+        return
+
+    result = CodeApplier.apply(changes)
+    if "error" in result:
+        display_error(result["error"])
+    else:
+        display_success(
+            f"Wrote {result['written']} file(s), {result['skipped']} unchanged "
+            f"(undo with: !apply undo {result['batch']})"
+        )
+
+
+def run_workflow_command(name: Optional[str], dry_run: bool = False, force: bool = False,
+                         concurrency: Optional[int] = None, variables: Optional[dict] = None) -> bool:
+    """Validate and (unless dry_run) run a workflow, printing each step as it finishes."""
+    import time
+    from config import config
+    from ui import console, display_error, display_response, workflow_table
+    from workflow import WorkflowError, find_workflow, list_workflows, load_workflow, run_workflow, validate
+
+    if not name:
+        names = list_workflows()
+        if names:
+            console.print("Workflows: " + ", ".join(names))
+        else:
+            display_error("No workflows in .devos/workflows or ~/.config/devos-ai/workflows")
+        return bool(names)
+
+    path = find_workflow(name)
+    if path is None:
+        display_error(f"Workflow not found: {name}")
+        return False
+    try:
+        workflow = load_workflow(path)
+    except (WorkflowError, OSError, ValueError) as e:
+        display_error(str(e))
+        return False
+
+    levels, errors = validate(workflow)
+    for error in errors:
+        display_error(error)
+    if errors:
+        return False
+    if dry_run:
+        console.print(f"[success]{workflow['name']}: {len(workflow['steps'])} steps, valid[/success]")
+        for number, level in enumerate(levels, 1):
+            console.print(f"  stage {number}: {', '.join(level)}")
+        return True
+
+    icons = {"ok": "[green]✓[/green]", "cached": "[cyan]=[/cyan]", "failed": "[red]✗[/red]", "skipped": "[dim]-[/dim]"}
+
+    def progress(result):
+        note = f": {result['error']}" if result.get("error") else ""
+        console.print(f"{icons[result['status']]} {result['id']} ({result['run']}) "
+                      f"{result['seconds']:.2f}s {result['status']}{note}")
+
+    started = time.perf_counter()
+    results = run_workflow(workflow, concurrency or config.workflow_concurrency, force, variables, progress)
+    console.print(workflow_table(results, f"{workflow['name']} ({time.perf_counter() - started:.2f}s)"))
+    last_output = next((r for r in reversed(results) if r.get("output")), None)
+    if last_output:
+        display_response(last_output["output"])
+    return all(result["status"] in ("ok", "cached") for result in results)
+
+
+def handle_usage_command(ai_client: "AIClient"):
+    """Tokens, prompt-cache hits and request bytes for the last request and the session."""
+    usage = ai_client.usage
+    last = usage.last
+    if last:
+        click.echo(
+            f"Last request ({last['model']}): {last['prompt_tokens']} prompt tokens "
+            f"({last['cached_tokens']} cached), {last['completion_tokens']} completion, "
+            f"{last['bytes_sent'] / 1024:.1f} KB sent, ${last['cost']:.4f}"
+            + (" (estimated)" if last['estimated'] else "")
+        )
+    else:
+        click.echo("No requests yet")
+    total = usage.summary()
+    cached_share = total['cached_tokens'] / total['prompt_tokens'] if total['prompt_tokens'] else 0.0
+    click.echo(
+        f"Session: {total['requests']} requests, {total['prompt_tokens']} prompt tokens "
+        f"({cached_share:.0%} cached), {total['completion_tokens']} completion, "
+        f"{total['bytes_sent'] / 1024:.1f} KB sent, ${total['cost']:.4f}"
+    )
+
+
+def attachment_budget_error(path: str, content: str, attachments: dict) -> Optional[str]:
+    """Why content can't be attached as path, if all attachments would pass half the context window."""
+    from config import config
+    from tokens import estimate_tokens
+
+    budget = config.context_window(config.model) // 2
+    used = sum(estimate_tokens(text) for name, text in attachments.items() if name != path)
+    if used + estimate_tokens(content) > budget:
+        return f"Attachments would exceed {budget} tokens, half the context window; !detach some files first"
+    return None
+
+
+def handle_attach_command(prompt: str, attachments: dict):
+    """!attach <file> pins a file to every following prompt; !detach [file] unpins (all)."""
+    from tokens import estimate_tokens
+    from ui import console, display_error
+    from utils import get_file_content
+
+    command, _, path = prompt.partition(" ")
+    path = path.strip()
+    if command == "!detach":
+        if not path:
+            attachments.clear()
+        elif attachments.pop(path, None) is None:
+            display_error(f"Not attached: {path}")
+            return
+    elif path:
+        content = get_file_content(path)
+        if content is None:
+            display_error(f"Not a readable text file: {path}")
+            return
+        error = attachment_budget_error(path, content, attachments)
+        if error:
+            display_error(error)
+            return
+        attachments[path] = content
+    if attachments:
+        console.print("[info]Attached: " + ", ".join(
+            f"{name} (~{estimate_tokens(text)} tokens)" for name, text in sorted(attachments.items())
+        ) + "[/info]")
+    else:
+        console.print("[info]No attachments[/info]")
+
+
+def handle_stats_command(prompt: str):
+    """Handle latency statistics commands."""
+    import metrics
+    from config import config
+    from ui import console, display_error, stats_table
+
+    args = prompt.split()[1:]
+    action = args[0] if args else "show"
+
+    if not metrics.is_enabled():
+        display_error("Metrics are disabled (set metrics_enabled: true in config.yaml)")
+        return
+
+    if action == "show":
+        rows = metrics.snapshot()
+        if not rows:
+            click.echo("No timings recorded yet")
+            return
+        console.print(stats_table(rows))
+    elif action == "reset":
+        metrics.reset()
+        click.echo("Cleared recorded timings")
+    elif action == "export":
+        path = args[1] if len(args) > 1 else config.metrics_export
+        if not path:
+            display_error("Usage: !stats export <path> (or set metrics_export in config.yaml)")
+            return
+        fmt = "prometheus" if path.endswith((".prom", ".txt")) else config.metrics_format
+        try:
+            count = metrics.export(os.path.expanduser(path), fmt)
+        except (OSError, ValueError) as e:
+            display_error(f"Could not export metrics: {str(e)}")
+            return
+        click.echo(f"Exported {count} spans to {path} ({fmt})")
+    else:
+        display_error("Usage: !stats [reset|export [path]]")
+
+
+def handle_cache_command(prompt: str, ai_client: "AIClient"):
+    """Handle response cache commands."""
+    from ui import display_error
+
+    args = prompt.split()[1:]
+    action = args[0] if args else "stats"
+
+    if ai_client.cache is None:
+        display_error("Response cache is disabled (set cache_enabled: true in config.yaml)")
+        return
+
+    if action == "stats":
+        stats = ai_client.cache.stats()
+        click.echo("\nResponse Cache:")
+        click.echo(f"Path: {stats['path']}")
+        click.echo(f"Entries: {stats['entries']}")
+        click.echo(f"Size: {stats['bytes'] / 1024:.1f} KiB of {stats['max_bytes'] / 1024 / 1024:.0f} MiB")
+        click.echo(f"TTL: {stats['ttl']}s")
+        click.echo(f"Session hits/misses: {stats['hits']}/{stats['misses']}")
+    elif action == "clear":
+        removed = ai_client.cache.clear()
+        click.echo(f"Cleared {removed} cached responses")
+    else:
+        display_error("Usage: !cache stats|clear")
+
+
+def format_page(page: dict, limit: int = PAGE_PREVIEW_CHARS) -> str:
+    """Markdown preview of a fetched page."""
+    if 'error' in page:
+        return f"**{page['url']}**\n\nError fetching URL: {page['error']}"
+    text = page['text']
+    if len(text) > limit:
+        text = text[:limit] + "\n\n..."
+    source = " (cached)" if page.get('cached') else ""
+    return f"## {page['title'] or page['url']}\n{page['url']}{source}\n\n{text}"
+
+
+def format_branch(status: dict) -> str:
+    """Branch name with upstream tracking counts, e.g. 'main (ahead 2, behind 1)'."""
+    branch = status.get('branch') or f"detached at {(status.get('commit') or '')[:8]}"
+    tracking = []
+    if status.get('ahead'):
+        tracking.append(f"ahead {status['ahead']}")
+    if status.get('behind'):
+        tracking.append(f"behind {status['behind']}")
+    return f"{branch} ({', '.join(tracking)})" if tracking else branch
+
+
 @cli.command()
 @click.argument('path', default='.')
-def git_status(path):
+@click.option('--all', 'all_repos', is_flag=True, help="Report every repository found under PATH")
+@click.option('--depth', default=4, show_default=True, help="How deep to look for repositories with --all")
+def git_status(path, all_repos, depth):
     """Show Git status for a repository"""
+    from os_ops.git_utils import GitManager
+    from ui import console, display_error
+
+    if all_repos:
+        import asyncio
+        from rich.table import Table
+
+        repos = GitManager.discover_repos(path, max_depth=depth)
+        if not repos:
+            display_error(f"No Git repositories found under {path}")
+            return
+        results = asyncio.run(GitManager.get_status_many(repos))
+        table = Table(title=f"Git repositories under {path}")
+        table.add_column("Repository")
+        table.add_column("Branch", style="green")
+        table.add_column("Changes", justify="right")
+        table.add_column("Untracked", justify="right")
+        for repo, status in results.items():
+            if 'error' in status:
+                table.add_row(repo, "[error]error[/error]", "-", "-")
+                continue
+            files = status['files']
+            untracked = sum(1 for f in files if f['kind'] == 'untracked')
+            table.add_row(repo, format_branch(status), str(len(files) - untracked), str(untracked))
+        console.print(table)
+        return
+
+    from config import config
+    from rich.syntax import Syntax
+
     status = GitManager.get_status(path)
     if 'error' in status:
         display_error(status['error'])
     else:
         console.print(f"\nGit Status for [bold]{path}[/bold]")
-        console.print(f"Branch: [green]{status['branch']}[/green]")
+        console.print(f"Branch: [green]{format_branch(status)}[/green]")
         console.print("Changes:")
         console.print(Syntax(status['status'], 'diff', theme=config.theme))
 
 
+@cli.command()
+@click.argument('paths', nargs=-1)
+@click.option('--staged', is_flag=True, help="Diff the index against HEAD instead of the working tree")
+@click.option('-U', '--unified', default=3, show_default=True, help="Context lines around each hunk")
+@click.option('--commit-message', 'task', flag_value='commit', help="Ask the AI for a commit message")
+@click.option('--review', 'task', flag_value='review', help="Ask the AI to review the diff")
+def git_diff(paths, staged, unified, task):
+    """Show changed hunks, or have the AI write a commit message or review them"""
+    from os_ops.git_utils import GitManager
+    from ui import console, display_error
+
+    # A commit message describes what `git commit` would record
+    diff = GitManager.get_diff('.', staged=staged or task == 'commit', paths=list(paths) or None,
+                               context=unified)
+    if 'error' in diff:
+        display_error(diff['error'])
+        sys.exit(1)
+    if not diff['files']:
+        return
+    if not task:
+        from config import config
+        from rich.syntax import Syntax
+
+        console.print(Syntax(diff['diff'], 'diff', theme=config.theme))
+        for entry in diff['skipped']:
+            console.print(f"[warning]{entry['path']}: {entry['skipped']}[/warning]")
+        return
+
+    from ai_client import AIClient, AIClientError
+    from ui import display_stream
+
+    prompt_text, system_prompt = diff_request(diff, task)
+    try:
+        display_stream(AIClient.shared().stream_prompt(prompt_text, system_prompt))
+    except (AIClientError, ValueError) as e:
+        display_error(str(e))
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('name', required=False)
+@click.option('--dry-run', is_flag=True, help="Validate the step graph without running anything")
+@click.option('--force', is_flag=True, help="Ignore cached step outputs")
+@click.option('-j', '--concurrency', type=int, help="Steps run at once (default: workflow_concurrency)")
+@click.option('--var', 'variables', multiple=True, help="Override a workflow variable (name=value)")
+def workflow(name, dry_run, force, concurrency, variables):
+    """Run a YAML workflow (omit NAME to list them)"""
+    overrides = dict(var.split("=", 1) for var in variables if "=" in var)
+    if not run_workflow_command(name, dry_run, force, concurrency, overrides):
+        sys.exit(1)
+
+
 @cli.command()
 @click.argument('app_name')
 def open_app(app_name):
     """Open an application"""
+    from os_ops.app_control import AppController
+    from ui import console
+
     result = AppController.open_app(app_name)
     console.print(result)
 
@@ -174,19 +881,302 @@ def open_app(app_name):
 @cli.command()
 @click.argument('pattern')
 @click.argument('directory', default='.')
-def find_files(pattern, directory):
+@click.option('--mode', type=click.Choice(['glob', 'substring', 'fuzzy']), default='glob', show_default=True)
+@click.option('--limit', type=int, help="Stop after this many matches")
+def find_files(pattern, directory, mode, limit):
     """Find files matching pattern"""
-    files = FileHandler.find_files(pattern, directory)
+    from os_ops.file_handling import FileHandler
+    from ui import console, display_error
+
     console.print("\nFound files:")
-    for file in files:
-        console.print(f"- [green]{file}[/green]")
+    try:
+        for file in FileHandler.iter_files(pattern, directory, mode=mode, limit=limit):
+            console.print(f"- [green]{file}[/green]")
+    except Exception as e:
+        display_error(f"Error finding files: {str(e)}")
+
+
+@cli.command()
+@click.argument('pattern')
+@click.argument('directory', default='.')
+@click.option('-g', '--glob', help="Only search files matching this glob")
+@click.option('-F', '--fixed-strings', is_flag=True, help="Treat pattern as a literal string")
+@click.option('-i', '--ignore-case', is_flag=True)
+@click.option('-C', '--context', default=0, show_default=True, help="Lines shown around each match")
+@click.option('--limit', type=int, help="Stop after this many matches")
+@click.option('--ask', 'question', help="Send the matching lines to the AI with this question")
+def grep(pattern, directory, glob, fixed_strings, ignore_case, context, limit, question):
+    """Search file contents, skipping binary and ignored files"""
+    import re
+    from os_ops.content_search import ContentSearcher
+    from ui import console, display_error, display_grep_match
+
+    matches = []
+    try:
+        for match in ContentSearcher.search(
+            pattern, directory, glob=glob, fixed=fixed_strings, ignore_case=ignore_case,
+            context=max(context, GREP_CONTEXT if question else 0), limit=limit
+        ):
+            if not question:
+                display_grep_match(match)
+            matches.append(match)
+    except re.error as e:
+        display_error(f"Invalid pattern: {e}")
+        sys.exit(2)
+    if not matches:
+        sys.exit(1)
+    if not question:
+        return
+
+    from ai_client import AIClient, AIClientError
+    from config import config
+    from ui import display_stream
+
+    context_text = ContentSearcher.format_snippets(matches, config.rag_tokens)
+    console.print(f"[info]Asking about {len(matches)} matches[/info]")
+    try:
+        display_stream(AIClient.shared().stream_prompt(
+            question, f"Matching lines from the project for `{pattern}`:\n\n{context_text}"
+        ))
+    except (AIClientError, ValueError) as e:
+        display_error(str(e))
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument('directory', default='.')
+@click.option('-q', '--query', help="Search the index after updating it")
+@click.option('-k', '--top-k', default=5, show_default=True, help="Results shown for --query")
+def index(directory, query, top_k):
+    """Build or update the code search index used by chat"""
+    import time
+    from code_index import CodeIndex
+    from ui import console
+
+    code_index = CodeIndex(directory)
+    started = time.perf_counter()
+    stats = code_index.build()
+    console.print(
+        f"Indexed {stats['files']} files into {stats['chunks']} chunks "
+        f"({stats['indexed']} re-read, {stats['reused']} unchanged) "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    if query:
+        started = time.perf_counter()
+        hits = code_index.search(query, top_k)
+        console.print(f"\nTop {len(hits)} for [bold]{query}[/bold] ({(time.perf_counter() - started) * 1000:.1f} ms):")
+        for hit in hits:
+            console.print(f"- [green]{hit['path']}:{hit['start']}-{hit['end']}[/green] ({hit['score']:.2f})")
+
+
+@cli.command()
+@click.argument('prompt', nargs=-1, required=True)
+@click.option('--model', help="Model to ask instead of the configured one")
+def ask(prompt, model):
+    """Ask a one-off question and print the answer"""
+    from ai_client import AIClient, AIClientError
+    from ui import display_error, display_stream
+    from utils import detect_language
+
+    language, clean_prompt = detect_language(" ".join(prompt))
+    try:
+        display_stream(AIClient.shared().stream_prompt(clean_prompt, model=model), language)
+    except (AIClientError, ValueError) as e:
+        display_error(str(e))
+        sys.exit(1)
+
+
+@cli.group('daemon')
+def daemon_group():
+    """Keep a warm background process for faster commands"""
+
+
+@daemon_group.command('run')
+def daemon_run():
+    """Run the daemon in the foreground"""
+    from daemon import Daemon
+
+    try:
+        Daemon(cli).serve()
+    except (RuntimeError, OSError) as e:
+        click.echo(str(e), err=True)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+@daemon_group.command('start')
+def daemon_start():
+    """Start the daemon in the background"""
+    from config import config
+    from daemon import request, start
+
+    status = request({"control": "status"})
+    if status:
+        click.echo(f"Daemon already running (pid {status['pid']})")
+        return
+    log_path = config.config_path / "daemon.log"
+    if start(log_path):
+        click.echo(f"Daemon started (log: {log_path})")
+    else:
+        click.echo(f"Daemon did not come up; see {log_path}", err=True)
+        sys.exit(1)
+
+
+@daemon_group.command('stop')
+def daemon_stop():
+    """Stop the background daemon"""
+    from daemon import request
+
+    if request({"control": "stop"}) is None:
+        click.echo("Daemon is not running")
+    else:
+        click.echo("Daemon stopped")
+
+
+@daemon_group.command('status')
+def daemon_status():
+    """Show whether the daemon is running"""
+    from daemon import request, socket_path
+
+    status = request({"control": "status"})
+    if status is None:
+        click.echo("Daemon is not running; commands run in-process")
+        return
+    click.echo(
+        f"Daemon {status['pid']} on {socket_path()}: up {status['uptime']:.0f}s, "
+        f"{status['served']} commands served"
+    )
+
+
+@cli.command()
+@click.argument('input_file', type=click.File('r'), default='-')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help="Results JSONL file (default: stdout)")
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help="Finished-id file used to resume (default: <output>.checkpoint)")
+@click.option('-c', '--concurrency', default=8, show_default=True, help="Prompts in flight at once")
+@click.option('--rpm', default=0, help="Max requests per minute (0 = unlimited)")
+@click.option('--tpm', default=0, help="Max tokens per minute (0 = unlimited)")
+@click.option('--system', 'system_prompt', help="System prompt for items that do not set one")
+def batch(input_file, output, checkpoint, concurrency, rpm, tpm, system_prompt):
+    """Run prompts from a JSONL file (or stdin) concurrently"""
+    import asyncio
+    from pathlib import Path
+    from ai_client import AsyncAIClient
+    from batch import read_prompts, run_batch
+    from ui import display_error
+
+    if output and not checkpoint:
+        checkpoint = f"{output}.checkpoint"
+
+    client = AsyncAIClient(max_workers=concurrency)
+    out = open(output, 'a') if output else sys.stdout
+    if output and out.tell():
+        # A crash may have cut the last line short; start ours on a fresh line
+        with open(output, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                out.write("\n")
+    try:
+        counts = asyncio.run(run_batch(
+            read_prompts(input_file),
+            client,
+            out,
+            checkpoint=Path(checkpoint) if checkpoint else None,
+            concurrency=concurrency,
+            requests_per_minute=rpm,
+            tokens_per_minute=tpm,
+            system_prompt=system_prompt,
+            resume_from=Path(output) if output else None,
+        ))
+    except KeyboardInterrupt:
+        display_error("Batch interrupted; re-run the same command to resume")
+        return
+    finally:
+        if output:
+            out.close()
+        client.close()
+
+    # Summary goes to stderr so it never mixes with JSONL on stdout
+    click.echo(
+        f"{counts['completed']} completed, {counts['failed']} failed, "
+        f"{counts['skipped']} skipped (already done)",
+        err=True
+    )
+
+
+@cli.command()
+@click.argument('pattern')
+@click.argument('directory', default='.')
+@click.option('-o', '--output', help="Write the JSON report here instead of stdout")
+@click.option('-c', '--concurrency', type=int, help="Files reviewed at once (default: review_concurrency)")
+@click.option('--mode', type=click.Choice(['glob', 'substring', 'fuzzy']), default='glob', show_default=True)
+@click.option('--force', is_flag=True, help="Review again even if the content was reviewed before")
+def review(pattern, directory, output, concurrency, mode, force):
+    """Review every file matching pattern and write a JSON report"""
+    import json
+    import time
+    from ai_client import AIClient
+    from config import config
+    from os_ops.file_handling import FileHandler
+    from review import load_state, plan_review, prune_state, run_review, save_state, state_path
+    from ui import display_error
+
+    paths = [path for path in FileHandler.iter_files(pattern, directory, mode=mode) if os.path.isfile(path)]
+    state_file = state_path(directory)
+    state = load_state(state_file)
+    entries = plan_review(paths, directory, state, force=force, max_bytes=config.review_max_bytes)
+    pending = sum(1 for entry in entries if entry["status"] == "pending")
+    click.echo(f"{len(entries)} files, {pending} to review", err=True)
+
+    done = iter(range(1, pending + 1))
+
+    def progress(entry):
+        click.echo(f"[{next(done)}/{pending}] {entry['status']:8} {entry['path']}", err=True)
+
+    client = AIClient()
+    try:
+        counts = run_review(entries, client, state, concurrency or config.review_concurrency, progress)
+    except KeyboardInterrupt:
+        display_error("Review interrupted; finished files are saved and skipped on the next run")
+        return
+    finally:
+        prune_state(state, directory)
+        save_state(state_file, state)
+        client.close()
+
+    report = json.dumps({
+        "root": os.path.abspath(directory),
+        "pattern": pattern,
+        "model": config.model,
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "summary": counts,
+        "files": entries,
+    }, indent=2)
+    if output:
+        FileHandler.atomic_write(output, report.encode() + b"\n")
+    else:
+        click.echo(report)
+    # Summary goes to stderr so it never mixes with the report on stdout
+    click.echo(", ".join(f"{count} {status}" for status, count in sorted(counts.items())), err=True)
+    if counts.get("failed"):
+        sys.exit(1)
 
 
 @cli.command()
 @click.argument('query')
-def web_search(query):
+@click.option('--fetch', is_flag=True, help="Download the results and show their main text")
+@click.option('-n', '--num-results', default=3, show_default=True)
+def web_search(query, fetch, num_results):
     """Search the web for resources"""
-    results = WebResourceFinder.search_web(query)
+    from os_ops.web_resources import WebResourceFinder
+    from ui import console, display_response
+
+    if fetch:
+        pages = WebResourceFinder.search_and_fetch(query, num_results)
+        display_response("\n\n".join(format_page(page) for page in pages) or "No results")
+        return
+
+    results = WebResourceFinder.search_web(query, num_results)
     console.print(f"\nTop resources for [bold]{query}[/bold]:")
     for i, url in enumerate(results, 1):
         console.print(f"{i}. [blue][link={url}]{url}[/link][/blue]")
@@ -0,0 +1,195 @@
+import bisect
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List
+
+# Bucket upper bounds grow by 20% from 10 us, reaching ~10 minutes at the last bucket
+MIN_LATENCY = 0.00001
+BUCKET_GROWTH = 1.2
+BUCKET_COUNT = 100
+# Span histograms weigh roughly the last few hundred samples
+SPAN_DECAY = 0.995
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram in fixed memory.
+
+    Quantiles are accurate to one bucket (20%). With decay < 1 older
+    samples count for geometrically less, so quantiles follow recent
+    behaviour rather than the whole history. count, total, mean, min and
+    max never decay: they are all-time values, and quantiles are only
+    clamped to the all-time min/max, which bound any window.
+    """
+
+    BOUNDS: List[float] = [MIN_LATENCY * BUCKET_GROWTH ** i for i in range(BUCKET_COUNT)]
+
+    def __init__(self, decay: float = 1.0):
+        self.decay = decay
+        # One extra bucket catches anything beyond the last bound
+        self.counts = [0.0] * (BUCKET_COUNT + 1)
+        # Each sample adds a weight growing by 1/decay instead of scaling every bucket down
+        self._weight = 1.0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        bucket = bisect.bisect_left(self.BOUNDS, seconds)
+        with self._lock:
+            self.counts[bucket] += self._weight
+            if self.decay < 1.0:
+                self._weight /= self.decay
+                if self._weight > 1e12:
+                    self.counts = [count / self._weight for count in self.counts]
+                    self._weight = 1.0
+            self.count += 1
+            self.total += seconds
+            self.min = min(self.min, seconds)
+            self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (0 when empty)."""
+        with self._lock:
+            weight = sum(self.counts)
+            if not weight:
+                return 0.0
+            target = q * weight
+            seen = 0.0
+            for bucket, count in enumerate(self.counts):
+                seen += count
+                if count and seen >= target:
+                    bound = self.BOUNDS[bucket] if bucket < BUCKET_COUNT else self.max
+                    return min(max(bound, self.min), self.max)
+            return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+# Span name -> histogram. Disabled by default so library use and one-shot
+# subcommands pay only a flag check; chat turns it on from config.
+_spans: Dict[str, LatencyHistogram] = {}
+_spans_lock = threading.Lock()
+_enabled = False
+_NULL_SPAN = nullcontext()
+
+
+def set_enabled(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def record(name: str, seconds: float):
+    """Add one timing to a span's histogram."""
+    if not _enabled:
+        return
+    histogram = _spans.get(name)
+    if histogram is None:
+        with _spans_lock:
+            histogram = _spans.setdefault(name, LatencyHistogram(decay=SPAN_DECAY))
+    histogram.record(seconds)
+
+
+@contextmanager
+def _timed_span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def span(name: str):
+    """Context manager timing its body under name."""
+    return _timed_span(name) if _enabled else _NULL_SPAN
+
+
+def timed(name: str) -> Callable:
+    """Decorator timing every call of a function under name."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> List[Dict[str, Any]]:
+    """Per-span count, mean, max and p50/p95/p99 in seconds, sorted by name.
+
+    Percentiles favour recent samples; count, mean and max cover all time.
+    """
+    with _spans_lock:
+        spans = sorted(_spans.items())
+    rows = []
+    for name, histogram in spans:
+        row = {"span": name, "count": histogram.count, "mean": histogram.mean, "max": histogram.max}
+        for q in QUANTILES:
+            row[f"p{int(q * 100)}"] = histogram.quantile(q)
+        rows.append(row)
+    return rows
+
+
+def reset():
+    with _spans_lock:
+        _spans.clear()
+
+
+def export_jsonl(path: str) -> int:
+    """Append the current snapshot, one timestamped line per span; returns lines written."""
+    rows = snapshot()
+    now = time.time()
+    with open(path, "a") as f:
+        for row in rows:
+            f.write(json.dumps(dict(row, time=now)) + "\n")
+    return len(rows)
+
+
+def export_prometheus(path: str) -> int:
+    """Write the snapshot as a Prometheus text-format summary, replacing the file atomically."""
+    rows = snapshot()
+    lines = [
+        # Quantiles decay towards recent samples; _sum and _count stay cumulative,
+        # as Prometheus expects of a summary's counters
+        "# HELP devos_span_seconds Time spent in instrumented DevOS AI operations "
+        "(quantiles over recent samples, sum and count since start).",
+        "# TYPE devos_span_seconds summary",
+    ]
+    for row in rows:
+        label = row["span"].replace("\\", "\\\\").replace('"', '\\"')
+        for q in QUANTILES:
+            lines.append(f'devos_span_seconds{{span="{label}",quantile="{q}"}} {row[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f'devos_span_seconds_sum{{span="{label}"}} {row["mean"] * row["count"]:.6f}')
+        lines.append(f'devos_span_seconds_count{{span="{label}"}} {row["count"]}')
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def export(path: str, fmt: str = "jsonl") -> int:
+    if fmt == "prometheus":
+        return export_prometheus(path)
+    if fmt == "jsonl":
+        return export_jsonl(path)
+    raise ValueError(f"Unknown metrics format: {fmt} (use jsonl or prometheus)")
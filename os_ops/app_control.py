@@ -1,10 +1,102 @@
 import subprocess
 import platform
+import threading
+import time
 import psutil
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+
+SNAPSHOT_FIELDS = ['pid', 'name', 'username', 'create_time', 'cpu_times', 'memory_info']
+SORT_KEYS = ('cpu', 'rss', 'pid', 'name', 'user')
+
+
+class ProcessSnapshot:
+    """Columnar view of all processes, gathered in a single psutil pass.
+
+    CPU% is computed from the cpu_times delta against the previous
+    snapshot, so refreshing never needs a blocking sampling interval.
+    """
+
+    def __init__(self, previous: Optional["ProcessSnapshot"] = None):
+        self.taken = time.monotonic()
+        self.pid: List[int] = []
+        self.name: List[str] = []
+        self.user: List[str] = []
+        self.cpu: List[float] = []
+        self.rss: List[int] = []
+        # (pid, create_time) -> cumulative cpu seconds, for the next delta
+        self.cpu_seconds: Dict[Tuple[int, float], float] = {}
+
+        elapsed = (self.taken - previous.taken) if previous else 0.0
+        previous_seconds = previous.cpu_seconds if previous else {}
+        for proc in psutil.process_iter(SNAPSHOT_FIELDS):
+            info = proc.info
+            times = info['cpu_times']
+            seconds = (times.user + times.system) if times else 0.0
+            # create_time guards against a recycled pid inheriting another process's counters
+            key = (info['pid'], info['create_time'] or 0.0)
+            self.cpu_seconds[key] = seconds
+            before = previous_seconds.get(key)
+            cpu = 0.0
+            if before is not None and elapsed > 0:
+                cpu = max(0.0, (seconds - before) / elapsed * 100)
+
+            self.pid.append(info['pid'])
+            self.name.append(info['name'] or '')
+            self.user.append(info['username'] or '')
+            self.cpu.append(cpu)
+            self.rss.append(info['memory_info'].rss if info['memory_info'] else 0)
+
+    def __len__(self) -> int:
+        return len(self.pid)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.taken
+
+    def query(
+        self,
+        name: Optional[str] = None,
+        user: Optional[str] = None,
+        sort: str = 'rss',
+        limit: Optional[int] = None,
+        exact: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Filter, sort and cut the snapshot before any rows are built."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort} (use one of {', '.join(SORT_KEYS)})")
+        rows = range(len(self.pid))
+        if name:
+            needle = name.lower()
+            if exact:
+                rows = [i for i in rows if self.name[i] == name]
+            else:
+                rows = [i for i in rows if needle in self.name[i].lower()]
+        if user:
+            rows = [i for i in rows if self.user[i] == user]
+
+        column = {'cpu': self.cpu, 'rss': self.rss, 'pid': self.pid,
+                  'name': self.name, 'user': self.user}[sort]
+        descending = sort in ('cpu', 'rss')
+        rows = sorted(rows, key=column.__getitem__, reverse=descending)
+        if limit:
+            rows = rows[:limit]
+        return [
+            {'pid': self.pid[i], 'name': self.name[i], 'user': self.user[i],
+             'cpu': self.cpu[i], 'rss': self.rss[i]}
+            for i in rows
+        ]
+
 
 class AppController:
+    # Repeated !apps / !kill within this many seconds reuse one snapshot
+    SNAPSHOT_TTL = 2.0
+    _snapshot: Optional[ProcessSnapshot] = None
+    _snapshot_lock = threading.Lock()
+
     @staticmethod
+    @metrics.timed("os.open_app")
     def open_app(app_name: str) -> str:
         system = platform.system()
         try:
@@ -19,23 +111,50 @@ class AppController:
             return f"Error opening app: {str(e)}"
 
     @staticmethod
-    def list_running_apps() -> List[str]:
+    @metrics.timed("os.process_snapshot")
+    def snapshot(max_age: Optional[float] = None) -> ProcessSnapshot:
+        """Cached process snapshot, refreshed once older than max_age seconds."""
+        max_age = AppController.SNAPSHOT_TTL if max_age is None else max_age
+        with AppController._snapshot_lock:
+            current = AppController._snapshot
+            if current is None or current.age > max_age:
+                current = AppController._snapshot = ProcessSnapshot(previous=current)
+            return current
+
+    @staticmethod
+    def list_running_apps(
+        name: Optional[str] = None,
+        user: Optional[str] = None,
+        sort: str = 'rss',
+        limit: Optional[int] = None
+    ) -> List[str]:
         """Get list of running applications with details"""
         try:
-            apps = []
-            for proc in psutil.process_iter(['pid', 'name', 'username']):
-                try:
-                    apps.append(f"{proc.info['name']} (PID: {proc.info['pid']}, User: {proc.info['username']})")
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-            return apps
+            rows = AppController.snapshot().query(name=name, user=user, sort=sort, limit=limit)
+            return [
+                f"{row['name']} (PID: {row['pid']}, User: {row['user']}, "
+                f"CPU: {row['cpu']:.1f}%, RSS: {row['rss'] / 1048576:.1f} MB)"
+                for row in rows
+            ]
         except Exception as e:
             return [f"Error listing apps: {str(e)}"]
 
     @staticmethod
+    @metrics.timed("os.kill_app")
     def kill_app(app_name: str) -> str:
-        for proc in psutil.process_iter(['name']):
-            if proc.info['name'] == app_name:
-                proc.kill()
+        for attempt in range(2):
+            # A cached snapshot may be stale, so check each candidate before killing it
+            max_age = None if attempt == 0 else 0.0
+            for row in AppController.snapshot(max_age).query(name=app_name, exact=True, sort='pid'):
+                try:
+                    proc = psutil.Process(row['pid'])
+                    if proc.name() != app_name:
+                        continue
+                    proc.kill()
+                except psutil.NoSuchProcess:
+                    continue
+                except psutil.AccessDenied:
+                    return f"Permission denied terminating {app_name} (PID: {row['pid']})"
+                AppController._snapshot = None
                 return f"Terminated {app_name}"
-        return f"App {app_name} not found"
\ No newline at end of file
+        return f"App {app_name} not found"
@@ -0,0 +1,268 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from os_ops.file_handling import FileHandler
+
+# Undo journals kept under ~/.config/devos-ai/apply
+KEEP_BATCHES = 10
+
+# "# file: src/app.py" style marker on a block's first line; it is dropped from the written file
+_FILE_MARKER = re.compile(
+    r'^\s*(?:#|//|--|;|/\*|<!--)\s*(?:file(?:name)?|path)\s*:\s*([^\s*]+?)\s*(?:\*/|-->)?\s*$', re.I
+)
+# A path mentioned at the end of the text just before a block: "**src/app.py**", "`app.py`:"
+_TRAILING_PATH = re.compile(r'(?:^|[\s`*_("\'])((?:[\w.-]+/)*[\w.-]+\.[A-Za-z0-9]+)[`*_)"\':]*\s*$')
+_INFO_PREFIX = re.compile(r'^(?:path|file|filename|title)=', re.I)
+
+
+class FileChange(NamedTuple):
+    rel: str
+    path: str
+    action: str  # "create", "modify" or "unchanged"
+    new: bytes
+    old: Optional[bytes]
+
+
+def _looks_like_path(token: str) -> bool:
+    return "/" in token or re.fullmatch(r'[\w.-]+\.[A-Za-z0-9]+', token) is not None
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class CodeApplier:
+    @staticmethod
+    def _target(info: str, language: Optional[str], body: str, before: str) -> Tuple[Optional[str], str]:
+        """Find a block's target path; returns (path or None, body to write)."""
+        for token in re.split(r'[\s:]+', info):
+            token = _INFO_PREFIX.sub("", token).strip("\"'")
+            if token and token != language and _looks_like_path(token):
+                return token, body
+
+        first, _, rest = body.partition("\n")
+        marker = _FILE_MARKER.match(first)
+        if marker:
+            return marker.group(1), rest
+
+        lines = [line for line in before.splitlines() if line.strip()]
+        if lines and len(lines[-1]) < 200:
+            match = _TRAILING_PATH.search(lines[-1])
+            if match:
+                return match.group(1), body
+        return None, body
+
+    @staticmethod
+    def plan(text: str, root: str = ".") -> Tuple[List[FileChange], List[str]]:
+        """Map the fenced blocks in text to files under root; returns (changes, warnings)."""
+        from utils import parse_fences
+
+        root_real = os.path.realpath(root)
+        targets: Dict[str, Tuple[str, bytes]] = {}
+        warnings = []
+        before = ""
+        for kind, language, body, info in parse_fences(text):
+            if kind == "text":
+                before = body
+                continue
+            if kind == "partial":
+                warnings.append("Skipped an unterminated code block")
+                continue
+            rel, content = CodeApplier._target(info, language, body, before)
+            before = ""
+            if rel is None:
+                warnings.append(f"Skipped a {language or 'code'} block with no file path")
+                continue
+            path = os.path.realpath(os.path.join(root_real, rel))
+            if os.path.isabs(rel) or not path.startswith(root_real + os.sep):
+                warnings.append(f"Skipped {rel}: outside {root}")
+                continue
+            if ".git" in os.path.relpath(path, root_real).split(os.sep):
+                warnings.append(f"Skipped {rel}: inside .git")
+                continue
+            if not content.endswith("\n"):
+                content += "\n"
+            if path in targets:
+                warnings.append(f"{rel} appears more than once; using the last block")
+            targets[path] = (os.path.relpath(path, root_real), content.encode())
+
+        changes = []
+        for path, (rel, new) in targets.items():
+            try:
+                with open(path, "rb") as f:
+                    old = f.read()
+            except FileNotFoundError:
+                changes.append(FileChange(rel, path, "create", new, None))
+                continue
+            # Sizes differ far more often than contents match, so only hash when they agree
+            same = len(old) == len(new) and _digest(old) == _digest(new)
+            changes.append(FileChange(rel, path, "unchanged" if same else "modify", new, old))
+        return changes, warnings
+
+    @staticmethod
+    def diff(changes: List[FileChange]) -> str:
+        """Unified diff of every file that would change."""
+        parts = []
+        for change in changes:
+            if change.action == "unchanged":
+                continue
+            old = (change.old or b"").decode("utf-8", "replace").splitlines(keepends=True)
+            new = change.new.decode("utf-8", "replace").splitlines(keepends=True)
+            fromfile = f"a/{change.rel}" if change.old is not None else "/dev/null"
+            parts.extend(difflib.unified_diff(old, new, fromfile, f"b/{change.rel}"))
+        return "".join(parts)
+
+    @staticmethod
+    def _journal_dir():
+        from config import config
+
+        return config.config_path / "apply"
+
+    @staticmethod
+    def apply(changes: List[FileChange]) -> Dict[str, Any]:
+        """Write all changed files as one batch: every file is replaced or none is.
+
+        New content is staged in synced temp files first; only then are they
+        renamed into place. Previous contents are journaled so the batch can
+        be undone later.
+        """
+        writes = [change for change in changes if change.action != "unchanged"]
+        skipped = len(changes) - len(writes)
+        if not writes:
+            return {"batch": None, "written": 0, "skipped": skipped}
+
+        created_dirs = []
+        for change in writes:
+            directory = os.path.dirname(change.path)
+            while directory and not os.path.exists(directory) and directory not in created_dirs:
+                created_dirs.append(directory)
+                directory = os.path.dirname(directory)
+
+        staged: List[Tuple[str, FileChange]] = []
+        try:
+            for change in writes:
+                staged.append((FileHandler.stage_write(change.path, change.new), change))
+        except OSError as e:
+            CodeApplier._discard(staged, created_dirs)
+            return {"error": f"Could not stage {change.rel}: {e}"}
+
+        batch = time.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(2)
+        try:
+            CodeApplier._write_journal(batch, writes, created_dirs)
+        except OSError as e:
+            CodeApplier._discard(staged, created_dirs)
+            return {"error": f"Could not save undo journal: {e}"}
+
+        committed: List[FileChange] = []
+        try:
+            for tmp, change in staged:
+                FileHandler.commit_temp(tmp, change.path)
+                committed.append(change)
+        except OSError as e:
+            CodeApplier._discard(staged[len(committed):], [])
+            CodeApplier._restore(committed, created_dirs)
+            shutil.rmtree(CodeApplier._journal_dir() / batch, ignore_errors=True)
+            return {"error": f"Could not write {change.rel}: {e}; rolled back {len(committed)} files"}
+
+        CodeApplier._prune()
+        return {"batch": batch, "written": len(committed), "skipped": skipped}
+
+    @staticmethod
+    def _discard(staged: List[Tuple[str, FileChange]], created_dirs: List[str]):
+        for tmp, _ in staged:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+        CodeApplier._remove_dirs(created_dirs)
+
+    @staticmethod
+    def _remove_dirs(directories: List[str]):
+        # Deepest first; rmdir refuses anything that is not empty
+        for directory in sorted(directories, key=len, reverse=True):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _restore(changes: List[FileChange], created_dirs: List[str]):
+        for change in reversed(changes):
+            try:
+                if change.old is None:
+                    os.unlink(change.path)
+                else:
+                    FileHandler.atomic_write(change.path, change.old)
+            except OSError:
+                pass
+        CodeApplier._remove_dirs(created_dirs)
+
+    @staticmethod
+    def _write_journal(batch: str, writes: List[FileChange], created_dirs: List[str]):
+        directory = CodeApplier._journal_dir() / batch
+        directory.mkdir(parents=True)
+        files = []
+        for index, change in enumerate(writes):
+            backup = None
+            if change.old is not None:
+                backup = f"{index}.orig"
+                (directory / backup).write_bytes(change.old)
+            files.append({"path": change.path, "backup": backup, "written": _digest(change.new)})
+        manifest = {"batch": batch, "files": files, "created_dirs": created_dirs}
+        (directory / "manifest.json").write_text(json.dumps(manifest))
+
+    @staticmethod
+    def _prune():
+        batches = CodeApplier.batches()
+        for batch in batches[:-KEEP_BATCHES]:
+            shutil.rmtree(CodeApplier._journal_dir() / batch, ignore_errors=True)
+
+    @staticmethod
+    def batches() -> List[str]:
+        """Batches that can still be undone, oldest first."""
+        directory = CodeApplier._journal_dir()
+        if not directory.exists():
+            return []
+        return sorted(p.name for p in directory.iterdir() if (p / "manifest.json").exists())
+
+    @staticmethod
+    def undo(batch: Optional[str] = None) -> Dict[str, Any]:
+        """Put back the files of a batch (default: the latest).
+
+        Files edited since the batch was applied are left alone and reported.
+        """
+        batches = CodeApplier.batches()
+        if not batches:
+            return {"error": "Nothing to undo"}
+        batch = batch or batches[-1]
+        directory = CodeApplier._journal_dir() / batch
+        try:
+            manifest = json.loads((directory / "manifest.json").read_text())
+        except (OSError, ValueError):
+            return {"error": f"No such batch: {batch}"}
+
+        restored, conflicts = 0, []
+        for entry in manifest["files"]:
+            try:
+                with open(entry["path"], "rb") as f:
+                    current = _digest(f.read())
+            except FileNotFoundError:
+                current = None
+            if current is not None and current != entry["written"]:
+                conflicts.append(entry["path"])
+                continue
+            if entry["backup"]:
+                FileHandler.atomic_write(entry["path"], (directory / entry["backup"]).read_bytes())
+            elif current is not None:
+                os.unlink(entry["path"])
+            restored += 1
+        CodeApplier._remove_dirs(manifest.get("created_dirs", []))
+        shutil.rmtree(directory, ignore_errors=True)
+        return {"batch": batch, "restored": restored, "conflicts": conflicts}
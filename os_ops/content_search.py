@@ -0,0 +1,206 @@
+import mmap
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+# Files at least this big are searched through mmap instead of read into memory
+MMAP_THRESHOLD = 256 * 1024
+# Bytes checked for NULs before a file is treated as binary
+SNIFF_BYTES = 8192
+# Files per task sent to a worker process; small files dominate most trees
+BATCH_FILES = 64
+# Below this many files the pool's start-up costs more than it saves
+POOL_MIN_FILES = 500
+MAX_LINE_CHARS = 300
+
+
+class GrepMatch(NamedTuple):
+    path: str
+    line_no: int
+    line: str
+    before: Tuple[str, ...]
+    after: Tuple[str, ...]
+
+
+def _compile(pattern: str, fixed: bool, ignore_case: bool) -> "re.Pattern":
+    source = re.escape(pattern) if fixed else pattern
+    return re.compile(source.encode("utf-8"), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+
+
+def _decode(line: bytes) -> str:
+    text = line.rstrip(b"\r").decode("utf-8", "replace")
+    return text if len(text) <= MAX_LINE_CHARS else text[:MAX_LINE_CHARS] + "..."
+
+
+def _context(data, start: int, end: int, lines: int) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    before = []
+    pos = start
+    for _ in range(lines):
+        if pos == 0:
+            break
+        prev = data.rfind(b"\n", 0, pos - 1) + 1
+        before.append(_decode(data[prev:pos - 1]))
+        pos = prev
+    after = []
+    pos = end
+    for _ in range(lines):
+        if pos >= len(data):
+            break
+        nxt = data.find(b"\n", pos + 1)
+        nxt = len(data) if nxt < 0 else nxt
+        if nxt == pos + 1 and nxt == len(data):
+            break
+        after.append(_decode(data[pos + 1:nxt]))
+        pos = nxt
+    return tuple(reversed(before)), tuple(after)
+
+
+def _search_buffer(data, regex, path: str, context: int, limit: int) -> List[GrepMatch]:
+    matches = []
+    line_no, counted_to = 1, 0
+    pos = 0
+    while True:
+        found = regex.search(data, pos)
+        if not found:
+            break
+        start = data.rfind(b"\n", 0, found.start()) + 1
+        end = data.find(b"\n", found.start())
+        end = len(data) if end < 0 else end
+        # Count newlines only over the gap since the previous match (mmap has no count())
+        line_no += data[counted_to:start].count(b"\n")
+        counted_to = start
+        before, after = _context(data, start, end, context) if context else ((), ())
+        matches.append(GrepMatch(path, line_no, _decode(data[start:end]), before, after))
+        if limit and len(matches) >= limit:
+            break
+        # One match per line; the next search starts on the following line
+        pos = end + 1
+        if pos > len(data):
+            break
+    return matches
+
+
+def _search_file(path: str, rel: str, regex, context: int, limit: int) -> List[GrepMatch]:
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return []
+            if b"\0" in f.read(SNIFF_BYTES):
+                return []
+            if size < MMAP_THRESHOLD:
+                f.seek(0)
+                return _search_buffer(f.read(), regex, rel, context, limit)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _search_buffer(data, regex, rel, context, limit)
+    except (OSError, ValueError):
+        return []
+
+
+def _search_batch(root: str, rels: List[str], pattern: str, fixed: bool, ignore_case: bool,
+                  context: int, limit: int) -> List[GrepMatch]:
+    """Worker-process entry point: search a batch of files, stopping at limit."""
+    regex = _compile(pattern, fixed, ignore_case)
+    matches: List[GrepMatch] = []
+    for rel in rels:
+        remaining = limit - len(matches) if limit else 0
+        matches.extend(_search_file(os.path.join(root, rel), rel, regex, context, remaining))
+        if limit and len(matches) >= limit:
+            break
+    return matches
+
+
+class ContentSearcher:
+    @staticmethod
+    def search(pattern: str, directory: str = ".", glob: Optional[str] = None, fixed: bool = False,
+               ignore_case: bool = False, context: int = 0, limit: Optional[int] = None,
+               workers: Optional[int] = None) -> Iterator[GrepMatch]:
+        """Yield lines matching pattern in the indexed (non-ignored) files under directory.
+
+        Large trees are split into batches searched on a process pool; results
+        stream back as batches finish, and no new batches start once limit
+        matches have been yielded.
+        """
+        from os_ops.file_index import FileIndex
+
+        # Fail on a bad pattern here rather than in every worker
+        _compile(pattern, fixed, ignore_case)
+        root = os.path.abspath(directory)
+        rels = list(FileIndex.for_root(root).search(glob or "*", include_dirs=False))
+        workers = workers or os.cpu_count() or 1
+        limit = limit or 0
+        args = (pattern, fixed, ignore_case, context)
+
+        if workers == 1 or len(rels) < POOL_MIN_FILES:
+            found = 0
+            for start in range(0, len(rels), BATCH_FILES):
+                for match in _search_batch(root, rels[start:start + BATCH_FILES], *args,
+                                           limit - found if limit else 0):
+                    yield match
+                    found += 1
+                if limit and found >= limit:
+                    return
+            return
+
+        batches = iter(range(0, len(rels), BATCH_FILES))
+        found = 0
+        pool = ProcessPoolExecutor(max_workers=workers)
+        in_flight = set()
+
+        def submit_next():
+            start = next(batches, None)
+            if start is not None:
+                in_flight.add(pool.submit(_search_batch, root, rels[start:start + BATCH_FILES],
+                                          *args, limit))
+
+        try:
+            # Two batches per worker keeps every process busy without queueing the whole tree
+            for _ in range(workers * 2):
+                submit_next()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    for match in future.result():
+                        yield match
+                        found += 1
+                        if limit and found >= limit:
+                            return
+                    submit_next()
+        finally:
+            # Stopping early must not wait for batches nobody will read
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def format_snippets(matches: List[GrepMatch], max_tokens: int) -> str:
+        """Matches grouped by file as fenced snippets, cut off at max_tokens."""
+        from tokens import estimate_tokens
+
+        parts, used = [], 0
+        by_file = {}
+        for match in matches:
+            by_file.setdefault(match.path, []).append(match)
+        for path, file_matches in by_file.items():
+            lines = []
+            last = 0
+            for match in file_matches:
+                first = match.line_no - len(match.before)
+                if last and first > last + 1:
+                    lines.append("...")
+                for offset, text in enumerate(match.before):
+                    if first + offset > last:
+                        lines.append(f"{first + offset}: {text}")
+                if match.line_no > last:
+                    lines.append(f"{match.line_no}: {match.line}")
+                for offset, text in enumerate(match.after, 1):
+                    if match.line_no + offset > last:
+                        lines.append(f"{match.line_no + offset}: {text}")
+                last = max(last, match.line_no + len(match.after))
+            part = f"{path}\n```\n" + "\n".join(lines) + "\n```"
+            cost = estimate_tokens(part)
+            if used + cost > max_tokens:
+                break
+            parts.append(part)
+            used += cost
+        return "\n\n".join(parts)
@@ -1,8 +1,10 @@
 import os
 import subprocess
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional
 import tempfile
+import metrics
+from os_ops.file_index import FileIndex
 
 class FileHandler:
     @staticmethod
@@ -16,19 +18,69 @@ class FileHandler:
     @staticmethod
     def write_file(file_path: str, content: str) -> str:
         try:
-            with open(file_path, 'w') as f:
-                f.write(content)
+            FileHandler.atomic_write(file_path, content.encode())
             return f"File {file_path} written successfully"
         except Exception as e:
             return f"Error writing file: {str(e)}"
 
     @staticmethod
-    def find_files(pattern: str, directory: str = ".") -> List[str]:
+    def atomic_write(file_path: str, data: bytes, mode: Optional[int] = None):
+        """Replace a file so readers see either the old or the new content, never a mix."""
+        FileHandler.commit_temp(FileHandler.stage_write(file_path, data, mode), file_path)
+
+    @staticmethod
+    def stage_write(file_path: str, data: bytes, mode: Optional[int] = None) -> str:
+        """Write data to a synced temp file beside file_path; returns the temp path."""
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix=".tmp", dir=directory)
         try:
-            return list(map(str, Path(directory).rglob(pattern)))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if mode is None:
+                try:
+                    mode = os.stat(file_path).st_mode & 0o7777
+                except FileNotFoundError:
+                    # mkstemp creates 0600 files; use what a plain open() would have
+                    umask = os.umask(0)
+                    os.umask(umask)
+                    mode = 0o666 & ~umask
+            os.chmod(tmp, mode)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp
+
+    @staticmethod
+    def commit_temp(tmp: str, file_path: str):
+        """Rename a staged temp file over file_path and sync the directory entry."""
+        os.replace(tmp, file_path)
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    @metrics.timed("files.find")
+    def find_files(pattern: str, directory: str = ".", mode: str = "glob",
+                   limit: Optional[int] = None) -> List[str]:
+        try:
+            return list(FileHandler.iter_files(pattern, directory, mode, limit))
         except Exception as e:
             return [f"Error finding files: {str(e)}"]
 
+    @staticmethod
+    def iter_files(pattern: str, directory: str = ".", mode: str = "glob",
+                   limit: Optional[int] = None) -> Iterator[str]:
+        """Stream matches from the persistent, gitignore-aware file index."""
+        index = FileIndex.for_root(directory)
+        for rel in index.search(pattern, mode=mode, limit=limit):
+            yield str(Path(directory) / rel)
+
     @staticmethod
     def create_temp_file(content: str, suffix: str = ".txt") -> str:
         with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
@@ -0,0 +1,298 @@
+import fnmatch
+import hashlib
+import heapq
+import os
+import pickle
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import metrics
+
+# Never worth indexing, whatever .gitignore says
+ALWAYS_IGNORE = {".git", ".hg", ".svn", "node_modules", "__pycache__"}
+
+# (base directory, pattern, negated, directory-only)
+Rule = Tuple[str, "re.Pattern", bool, bool]
+
+
+class DirEntry(NamedTuple):
+    mtime: int
+    ignore_mtime: int
+    ignore_lines: Tuple[str, ...]
+    files: Tuple[str, ...]
+    subdirs: Tuple[str, ...]
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob into a regex over '/'-separated paths."""
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            body = pattern[i + 1:end]
+            # A leading ! or ^ negates the class; a ^ anywhere else is literal
+            negate = body[:1] in ("!", "^")
+            if negate:
+                body = body[1:]
+            out.append("[" + ("^" if negate else "") + body.replace("^", "\\^") + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+@lru_cache(maxsize=1024)
+def _compile_rules(base: str, lines: Tuple[str, ...]) -> Tuple[Rule, ...]:
+    rules = []
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+        anchored = "/" in line
+        regex = _translate(line.lstrip("/"))
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append((base, re.compile(regex + "$"), negate, dir_only))
+    return tuple(rules)
+
+
+def _is_ignored(rules: Tuple[Rule, ...], path: str, is_dir: bool) -> bool:
+    ignored = False
+    for base, regex, negate, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        relative = path[len(base) + 1:] if base else path
+        if regex.match(relative):
+            ignored = not negate
+    return ignored
+
+
+class FileIndex:
+    """Persistent, gitignore-aware index of a directory tree.
+
+    The tree is walked level by level with os.scandir on a thread pool.
+    Later refreshes only stat directories and re-list the ones whose mtime
+    (or .gitignore) changed, so warm lookups skip almost all of the walk.
+    """
+
+    _instances: Dict[str, "FileIndex"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, root: str, cache_dir: Optional[Path] = None, workers: int = 16):
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.dirs: Dict[str, DirEntry] = {}
+        self.cache_file = None
+        if cache_dir is not None:
+            digest = hashlib.sha1(self.root.encode("utf-8")).hexdigest()[:16]
+            self.cache_file = Path(cache_dir) / f"{digest}.idx"
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def for_root(cls, root: str) -> "FileIndex":
+        """Shared, refreshed index for a directory."""
+        from config import config
+
+        key = os.path.abspath(root)
+        with cls._instances_lock:
+            index = cls._instances.get(key)
+            if index is None:
+                index = cls._instances[key] = cls(key, cache_dir=config.config_path / "index")
+        index.refresh()
+        return index
+
+    def _load(self):
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, "rb") as f:
+                root, dirs = pickle.load(f)
+            if root == self.root:
+                self.dirs = {rel: DirEntry(*entry) for rel, entry in dirs.items()}
+        except Exception:
+            # A corrupt or outdated cache just means a cold walk
+            self.dirs = {}
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_file.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "wb") as f:
+            pickle.dump((self.root, {rel: tuple(entry) for rel, entry in self.dirs.items()}), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.cache_file)
+
+    def _scan_dir(self, rel: str, parent_rules: Tuple[Rule, ...], force: bool):
+        """Return (rel, entry, rules, force) for one directory, reusing the cached listing if unchanged."""
+        path = os.path.join(self.root, rel) if rel else self.root
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return rel, None, parent_rules, force
+        try:
+            ignore_mtime = os.stat(os.path.join(path, ".gitignore")).st_mtime_ns
+        except OSError:
+            ignore_mtime = 0
+
+        old = self.dirs.get(rel)
+        if old and not force and old.mtime == mtime and old.ignore_mtime == ignore_mtime:
+            return rel, old, parent_rules + _compile_rules(rel, old.ignore_lines), False
+
+        lines: Tuple[str, ...] = ()
+        if ignore_mtime:
+            try:
+                with open(os.path.join(path, ".gitignore"), "r", errors="replace") as f:
+                    lines = tuple(f.read().splitlines())
+            except OSError:
+                pass
+        rules = parent_rules + _compile_rules(rel, lines)
+
+        files: List[str] = []
+        subdirs: List[str] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.name in ALWAYS_IGNORE:
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    child = f"{rel}/{entry.name}" if rel else entry.name
+                    if rules and _is_ignored(rules, child, is_dir):
+                        continue
+                    (subdirs if is_dir else files).append(entry.name)
+        except OSError:
+            return rel, None, rules, force
+
+        new = DirEntry(mtime, ignore_mtime, lines, tuple(sorted(files)), tuple(sorted(subdirs)))
+        # Changed ignore rules can flip any descendant, so re-list the whole subtree
+        return rel, new, rules, force or (old is not None and old.ignore_lines != lines)
+
+    @metrics.timed("files.index_refresh")
+    def refresh(self) -> bool:
+        """Bring the index up to date; returns True if anything changed."""
+        with self._lock:
+            new_dirs: Dict[str, DirEntry] = {}
+            changed = False
+            level = [("", (), False)]
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                while level:
+                    next_level = []
+                    for rel, entry, rules, force in pool.map(lambda args: self._scan_dir(*args), level):
+                        if entry is None:
+                            continue
+                        if self.dirs.get(rel) is not entry:
+                            changed = True
+                        new_dirs[rel] = entry
+                        for name in entry.subdirs:
+                            next_level.append((f"{rel}/{name}" if rel else name, rules, force))
+                    level = next_level
+            changed = changed or len(new_dirs) != len(self.dirs)
+            self.dirs = new_dirs
+            if changed:
+                self._save()
+            return changed
+
+    def paths(self) -> Iterator[Tuple[str, bool]]:
+        """Yield (relative path, is_dir) for every indexed entry, depth first."""
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            entry = self.dirs.get(rel)
+            if entry is None:
+                continue
+            prefix = f"{rel}/" if rel else ""
+            for name in entry.subdirs:
+                yield prefix + name, True
+            for name in entry.files:
+                yield prefix + name, False
+            stack.extend(prefix + name for name in reversed(entry.subdirs))
+
+    def search(self, query: str, mode: str = "glob", limit: Optional[int] = None,
+               include_dirs: bool = True) -> Iterator[str]:
+        """Yield relative paths matching query as glob, substring or fuzzy."""
+        if mode == "fuzzy":
+            yield from self._fuzzy(query, limit, include_dirs)
+            return
+
+        if mode == "glob":
+            # Like rglob: bare names match at any depth, paths match the tail
+            regex = re.compile(fnmatch.translate(query))
+            on_path = "/" in query
+            if on_path:
+                regex = re.compile(fnmatch.translate("*/" + query.lstrip("/")))
+        elif mode == "substring":
+            needle = query.lower()
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        found = 0
+        for rel, is_dir in self.paths():
+            if is_dir and not include_dirs:
+                continue
+            if mode == "glob":
+                name = rel.rsplit("/", 1)[-1]
+                if not (regex.match("/" + rel) if on_path else regex.match(name)):
+                    continue
+            elif needle not in rel.lower():
+                continue
+            yield rel
+            found += 1
+            if limit and found >= limit:
+                return
+
+    def _fuzzy(self, query: str, limit: Optional[int], include_dirs: bool) -> Iterator[str]:
+        """Rank paths containing query as a subsequence; tighter, later matches score better."""
+        needle = query.lower().replace(" ", "")
+        scored = []
+        for rel, is_dir in self.paths():
+            if is_dir and not include_dirs:
+                continue
+            haystack = rel.lower()
+            pos, first, gaps = -1, -1, 0
+            for ch in needle:
+                nxt = haystack.find(ch, pos + 1)
+                if nxt < 0:
+                    break
+                if first < 0:
+                    first = nxt
+                elif nxt != pos + 1:
+                    gaps += 1
+                pos = nxt
+            else:
+                # Prefer few gaps, matches inside the file name, then short paths
+                in_name = first >= haystack.rfind("/")
+                scored.append((gaps, not in_name, len(rel), rel))
+        best = heapq.nsmallest(limit, scored) if limit else sorted(scored)
+        for *_, rel in best:
+            yield rel
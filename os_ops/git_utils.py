@@ -1,33 +1,440 @@
+import os
+import re
 import subprocess
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+STATUS_COMMAND = ["status", "--porcelain=v2", "--branch", "-z"]
+# Unquoted paths in diff headers, no pager, no user diff drivers or colors
+DIFF_OPTIONS = ["-c", "core.quotepath=false", "diff", "--no-color", "--no-ext-diff", "-M"]
+NULL_SHA = "0" * 40
+# Per-file hunks kept across calls, keyed by the blob SHAs on both sides
+DIFF_CACHE_SIZE = 1024
+# Worktree files are hashed in blocks of this size
+HASH_BLOCK = 1 << 20
+
+# Directories never searched when discovering repositories
+SKIP_DIRS = {"node_modules", "__pycache__", ".venv", "venv", ".tox", "build", "dist"}
+
+
+# asyncio is imported inside the async methods; it would double the import
+# cost of the plain `git-status` path.
+
 
 class GitManager:
+    # repo path -> (git dir stamps, time cached, status)
+    _status_cache: Dict[str, Tuple[tuple, float, Dict[str, Any]]] = {}
+    _cache_lock = threading.Lock()
+    # (old path, new path, old blob, new blob, context lines) -> hunks for that file
+    _diff_cache: "OrderedDict[tuple, str]" = OrderedDict()
+    # Worktree edits don't touch .git, so cached status also expires after this many seconds
+    STATUS_TTL = 2.0
+
     @staticmethod
-    def get_status(repo_path: str = ".") -> Dict[str, str]:
+    @metrics.timed("git.status")
+    def get_status(repo_path: str = ".", use_cache: bool = True) -> Dict[str, Any]:
+        """Branch, ahead/behind and per-file state from one porcelain v2 call."""
+        key = os.path.abspath(repo_path)
+        stamps = GitManager._stamps(key)
+        if use_cache:
+            cached = GitManager._cached(key, stamps)
+            if cached is not None:
+                return cached
         try:
             result = subprocess.run(
-                ["git", "-C", repo_path, "status", "--porcelain"],
+                ["git", "-C", repo_path] + STATUS_COMMAND,
                 capture_output=True,
-                text=True,
                 check=True
             )
-            return {
-                "status": result.stdout.strip(),
-                "branch": GitManager._get_current_branch(repo_path)
-            }
+            status = GitManager.parse_status(result.stdout.decode("utf-8", "replace"))
+        except subprocess.CalledProcessError as e:
+            return {"error": e.stderr.decode("utf-8", "replace").strip() or str(e)}
         except Exception as e:
             return {"error": str(e)}
+        # Re-stamp afterwards: git status may itself refresh the index
+        GitManager._store(key, GitManager._stamps(key), status)
+        return status
+
+    @staticmethod
+    async def get_status_async(repo_path: str = ".", use_cache: bool = True) -> Dict[str, Any]:
+        """Like get_status, but runs git without blocking the event loop."""
+        import asyncio
+
+        key = os.path.abspath(repo_path)
+        stamps = GitManager._stamps(key)
+        if use_cache:
+            cached = GitManager._cached(key, stamps)
+            if cached is not None:
+                return cached
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "git", "-C", repo_path, *STATUS_COMMAND,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await proc.communicate()
+        except Exception as e:
+            return {"error": str(e)}
+        if proc.returncode != 0:
+            return {"error": stderr.decode("utf-8", "replace").strip() or f"git exited with {proc.returncode}"}
+        status = GitManager.parse_status(stdout.decode("utf-8", "replace"))
+        GitManager._store(key, GitManager._stamps(key), status)
+        return status
+
+    @staticmethod
+    async def get_status_many(repo_paths: Iterable[str], concurrency: int = 16) -> Dict[str, Dict[str, Any]]:
+        """Query many repositories in parallel, at most `concurrency` git processes at once."""
+        import asyncio
+
+        semaphore = asyncio.Semaphore(concurrency)
+        paths = list(repo_paths)
+
+        async def one(path: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await GitManager.get_status_async(path)
+
+        results = await asyncio.gather(*(one(path) for path in paths))
+        return dict(zip(paths, results))
 
     @staticmethod
-    def _get_current_branch(repo_path: str) -> Optional[str]:
+    @metrics.timed("git.diff")
+    def get_diff(repo_path: str = ".", staged: bool = False, paths: Optional[List[str]] = None,
+                 context: int = 3, max_file_bytes: int = 262144) -> Dict[str, Any]:
+        """Changed hunks of the working tree (or the index, if staged) with renames detected.
+
+        Files are identified by the blob SHAs on both sides, so a file whose
+        content has not changed since the last call is served from cache and
+        git only diffs the rest. Files larger than max_file_bytes on either
+        side are listed but not diffed.
+        """
+        def git(*argv: str) -> str:
+            result = subprocess.run(["git", "-C", repo_path] + list(argv), capture_output=True, check=True)
+            return result.stdout.decode("utf-8", "replace")
+
+        scope = ["--cached"] if staged else []
         try:
+            raw = git(*DIFF_OPTIONS, "--raw", "-z", "--no-abbrev", *scope, "--", *(paths or []))
+            toplevel = git("rev-parse", "--show-toplevel").strip()
+            files = GitManager.parse_raw_diff(raw)
+            GitManager._fill_sizes(repo_path, toplevel, files, staged, max_file_bytes)
+
+            todo = []
+            for entry in files:
+                entry["key"] = (entry["old_path"], entry["path"], entry["old_sha"], entry["new_sha"], context)
+                if max(entry["old_size"], entry["new_size"]) > max_file_bytes:
+                    entry["skipped"] = f"larger than {max_file_bytes} bytes"
+                    continue
+                with GitManager._cache_lock:
+                    cached = GitManager._diff_cache.get(entry["key"])
+                    if cached is not None:
+                        GitManager._diff_cache.move_to_end(entry["key"])
+                if cached is None or entry["new_sha"] == NULL_SHA:
+                    todo.append(entry)
+                else:
+                    entry["hunks"] = cached
+
+            if todo:
+                # One git call for every file not already cached; rename sources keep -M working
+                pathspec = sorted({f":(top){p}" for entry in todo for p in (entry["old_path"], entry["path"]) if p})
+                patch = git(*DIFF_OPTIONS, f"-U{context}", *scope, "--", *pathspec)
+                by_header = GitManager._split_patch(patch)
+                for entry in todo:
+                    hunks = by_header.get((entry["old_path"] or entry["path"], entry["path"]), "")
+                    entry["hunks"] = hunks
+                    if entry["new_sha"] != NULL_SHA:
+                        GitManager._cache_diff(entry["key"], hunks)
+        except subprocess.CalledProcessError as e:
+            return {"error": e.stderr.decode("utf-8", "replace").strip() or str(e)}
+        except Exception as e:
+            return {"error": str(e)}
+
+        diff_parts, skipped = [], []
+        for entry in files:
+            del entry["key"]
+            if "skipped" in entry:
+                skipped.append(entry)
+                diff_parts.append(f"diff --git a/{entry['old_path'] or entry['path']} b/{entry['path']}\n"
+                                  f"({entry['skipped']}; not shown)\n")
+            else:
+                diff_parts.append(entry["hunks"])
+        return {
+            "staged": staged,
+            "files": files,
+            "skipped": skipped,
+            "diff": "".join(diff_parts),
+            "stat": GitManager.format_diff_files(files),
+        }
+
+    @staticmethod
+    def parse_raw_diff(output: str) -> List[Dict[str, Any]]:
+        """Parse `git diff --raw -z --no-abbrev` records."""
+        fields = output.split("\0")
+        files = []
+        i = 0
+        while i < len(fields) - 1:
+            meta = fields[i]
+            i += 1
+            if not meta.startswith(":"):
+                continue
+            _, _, old_sha, new_sha, status = meta[1:].split(" ", 4)
+            old_path = None
+            path = fields[i]
+            i += 1
+            if status[0] in "RC":
+                old_path, path = path, fields[i]
+                i += 1
+            files.append({
+                "path": path,
+                "old_path": old_path,
+                "status": status[0],
+                "similarity": int(status[1:]) if status[1:] else None,
+                "old_sha": old_sha,
+                "new_sha": new_sha,
+            })
+        return files
+
+    @staticmethod
+    def _fill_sizes(repo_path: str, toplevel: str, files: List[Dict[str, Any]], staged: bool,
+                    max_file_bytes: int = 0):
+        """Blob sizes from one `git cat-file` call; unstaged files are hashed from disk like git does.
+
+        Worktree files over max_file_bytes are only stat'ed: they are skipped anyway.
+        """
+        import hashlib
+
+        for entry in files:
+            entry["new_size"] = 0
+            if entry["new_sha"] == NULL_SHA and not staged:
+                # git leaves worktree blobs unhashed in --raw output; hash them for the cache key
+                full = os.path.join(toplevel, entry["path"])
+                try:
+                    size = os.stat(full).st_size
+                    entry["new_size"] = size
+                    entry["worktree"] = True
+                    if max_file_bytes and size > max_file_bytes:
+                        continue
+                    digest = hashlib.sha1(b"blob %d\0" % size)
+                    read = 0
+                    with open(full, "rb") as f:
+                        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                            digest.update(block)
+                            read += len(block)
+                except OSError:
+                    continue
+                # A file changing under us keeps the null SHA, so it is diffed but not cached
+                if read == size:
+                    entry["new_sha"] = digest.hexdigest()
+
+        wanted = {sha for entry in files for sha in (entry["old_sha"], entry["new_sha"])
+                  if sha != NULL_SHA and not (sha == entry["new_sha"] and entry.get("worktree"))}
+        sizes: Dict[str, int] = {}
+        if wanted:
             result = subprocess.run(
-                ["git", "-C", repo_path, "branch", "--show-current"],
-                capture_output=True,
-                text=True,
-                check=True
+                ["git", "-C", repo_path, "cat-file", "--batch-check=%(objectname) %(objectsize)"],
+                input="\n".join(sorted(wanted)).encode(), capture_output=True, check=True
             )
-            return result.stdout.strip()
-        except:
-            return None
\ No newline at end of file
+            for line in result.stdout.decode().splitlines():
+                sha, _, size = line.partition(" ")
+                if size.isdigit():
+                    sizes[sha] = int(size)
+        for entry in files:
+            entry["old_size"] = sizes.get(entry["old_sha"], 0)
+            if not entry.pop("worktree", False):
+                entry["new_size"] = sizes.get(entry["new_sha"], entry["new_size"])
+
+    @staticmethod
+    def _split_patch(patch: str) -> Dict[Tuple[str, str], str]:
+        """Split a multi-file patch into per-file sections keyed by (old path, new path)."""
+        sections: Dict[Tuple[str, str], str] = {}
+        starts = [m.start() for m in re.finditer(r"^diff --git a/", patch, re.MULTILINE)]
+        for n, start in enumerate(starts):
+            end = starts[n + 1] if n + 1 < len(starts) else len(patch)
+            section = patch[start:end]
+            header = section.split("\n", 1)[0][len("diff --git a/"):]
+            old, new = GitManager._header_paths(section, header)
+            sections[(old, new)] = section
+        return sections
+
+    @staticmethod
+    def _header_paths(section: str, header: str) -> Tuple[str, str]:
+        # Renames and copies name both sides explicitly; otherwise the header is "X b/X"
+        old = new = None
+        for line in section.split("\n", 8)[1:8]:
+            if line.startswith(("rename from ", "copy from ")):
+                old = line.split(" ", 2)[2]
+            elif line.startswith(("rename to ", "copy to ")):
+                new = line.split(" ", 2)[2]
+        if old and new:
+            return old, new
+        half = (len(header) - 3) // 2
+        if header[half:half + 3] == " b/" and header[:half] == header[half + 3:]:
+            return header[:half], header[:half]
+        old, _, new = header.partition(" b/")
+        return old, new
+
+    @staticmethod
+    def _cache_diff(key: tuple, hunks: str):
+        with GitManager._cache_lock:
+            GitManager._diff_cache[key] = hunks
+            GitManager._diff_cache.move_to_end(key)
+            while len(GitManager._diff_cache) > DIFF_CACHE_SIZE:
+                GitManager._diff_cache.popitem(last=False)
+
+    @staticmethod
+    def format_diff_files(files: List[Dict[str, Any]]) -> str:
+        """One `S path` line per changed file, with renames as `old -> new`."""
+        lines = []
+        for entry in files:
+            path = entry["path"]
+            if entry["old_path"]:
+                path = f"{entry['old_path']} -> {path}"
+            note = f" ({entry['skipped']})" if "skipped" in entry else ""
+            lines.append(f"{entry['status']} {path}{note}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def discover_repos(root: str = ".", max_depth: int = 4) -> List[str]:
+        """Find repositories under root without descending into them."""
+        repos = []
+        level = [(root, 0)]
+        while level:
+            path, depth = level.pop()
+            try:
+                entries = list(os.scandir(path))
+            except OSError:
+                continue
+            if any(entry.name == ".git" for entry in entries):
+                repos.append(path)
+                continue
+            if depth >= max_depth:
+                continue
+            for entry in entries:
+                if (entry.name.startswith(".") or entry.name in SKIP_DIRS
+                        or not entry.is_dir(follow_symlinks=False)):
+                    continue
+                level.append((entry.path, depth + 1))
+        return sorted(repos)
+
+    @staticmethod
+    def parse_status(output: str) -> Dict[str, Any]:
+        """Parse `git status --porcelain=v2 --branch -z` output."""
+        status: Dict[str, Any] = {
+            "branch": None,
+            "commit": None,
+            "upstream": None,
+            "ahead": 0,
+            "behind": 0,
+            "files": [],
+        }
+        fields = output.split("\0")
+        i = 0
+        while i < len(fields):
+            field = fields[i]
+            i += 1
+            if not field:
+                continue
+            if field.startswith("# "):
+                name, _, value = field[2:].partition(" ")
+                if name == "branch.oid":
+                    status["commit"] = None if value == "(initial)" else value
+                elif name == "branch.head":
+                    status["branch"] = None if value == "(detached)" else value
+                elif name == "branch.upstream":
+                    status["upstream"] = value
+                elif name == "branch.ab":
+                    ahead, behind = value.split()
+                    status["ahead"], status["behind"] = int(ahead), -int(behind)
+                continue
+
+            kind = field[0]
+            if kind == "1":
+                parts = field.split(" ", 8)
+                entry = {"path": parts[8], "index": parts[1][0], "worktree": parts[1][1], "kind": "changed"}
+            elif kind == "2":
+                parts = field.split(" ", 9)
+                # With -z the rename source is the next NUL-separated field
+                entry = {"path": parts[9], "index": parts[1][0], "worktree": parts[1][1],
+                         "kind": "renamed", "orig_path": fields[i]}
+                i += 1
+            elif kind == "u":
+                parts = field.split(" ", 10)
+                entry = {"path": parts[10], "index": parts[1][0], "worktree": parts[1][1], "kind": "unmerged"}
+            elif kind == "?":
+                entry = {"path": field[2:], "index": "?", "worktree": "?", "kind": "untracked"}
+            elif kind == "!":
+                entry = {"path": field[2:], "index": "!", "worktree": "!", "kind": "ignored"}
+            else:
+                continue
+            status["files"].append(entry)
+
+        status["status"] = GitManager.format_files(status["files"])
+        return status
+
+    @staticmethod
+    def format_files(files: List[Dict[str, str]]) -> str:
+        """Render file records in the familiar short `XY path` form."""
+        lines = []
+        for entry in files:
+            xy = (entry["index"] + entry["worktree"]).replace(".", " ")
+            path = entry["path"]
+            if entry.get("orig_path"):
+                path = f"{entry['orig_path']} -> {path}"
+            lines.append(f"{xy} {path}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _find_git_dir(path: str) -> Optional[Path]:
+        """Locate the .git directory for path, following `gitdir:` files used by worktrees."""
+        current = Path(path)
+        for candidate in [current, *current.parents]:
+            dot_git = candidate / ".git"
+            if dot_git.is_dir():
+                return dot_git
+            if dot_git.is_file():
+                content = dot_git.read_text().strip()
+                if content.startswith("gitdir:"):
+                    return (candidate / content[7:].strip()).resolve()
+        return None
+
+    @staticmethod
+    def _stamps(path: str) -> Optional[tuple]:
+        """mtimes of the git files a status depends on, or None if there is no repo."""
+        git_dir = GitManager._find_git_dir(path)
+        if git_dir is None:
+            return None
+        names = ["HEAD", "index", "FETCH_HEAD", "packed-refs"]
+        try:
+            head = (git_dir / "HEAD").read_text().strip()
+            if head.startswith("ref:"):
+                names.append(head[4:].strip())
+        except OSError:
+            pass
+        stamps = []
+        for name in names:
+            try:
+                stamps.append(os.stat(git_dir / name).st_mtime_ns)
+            except OSError:
+                stamps.append(0)
+        return tuple(stamps)
+
+    @staticmethod
+    def _cached(key: str, stamps: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if stamps is None:
+            return None
+        with GitManager._cache_lock:
+            entry = GitManager._status_cache.get(key)
+        if entry and entry[0] == stamps and time.monotonic() - entry[1] < GitManager.STATUS_TTL:
+            return entry[2]
+        return None
+
+    @staticmethod
+    def _store(key: str, stamps: Optional[tuple], status: Dict[str, Any]):
+        if stamps is None:
+            return
+        with GitManager._cache_lock:
+            GitManager._status_cache[key] = (stamps, time.monotonic(), status)
@@ -1,20 +1,190 @@
-import requests
-from googlesearch import search
-from typing import List, Optional
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+
+# Bodies are cut off after this many bytes; main text is rarely further in
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+# Cached pages younger than this are used without revalidating
+FRESH_SECONDS = 300
+FETCH_TIMEOUT = (5, 15)
+USER_AGENT = "Mozilla/5.0 (compatible; DevOS-AI/0.1; +https://github.com/devos-ai)"
+
+# Page furniture that never holds the main text
+_NOISE_TAGS = ["script", "style", "noscript", "template", "svg", "nav", "header",
+               "footer", "aside", "form", "iframe", "button"]
+
+
+def _is_text(mime: str) -> bool:
+    return mime.startswith("text/") or mime.endswith(("/json", "+json", "/xml", "+xml"))
+
 
 class WebResourceFinder:
+    _session = None
+    _session_lock = threading.Lock()
+
     @staticmethod
+    @metrics.timed("web.search")
     def search_web(query: str, num_results: int = 3) -> List[str]:
         try:
+            from googlesearch import search
+
             return list(search(query, num_results=num_results))
         except Exception as e:
             return [f"Search error: {str(e)}"]
 
     @staticmethod
     def get_page_content(url: str) -> Optional[str]:
+        page = WebResourceFinder.fetch_page(url)
+        if "error" in page:
+            return f"Error fetching URL: {page['error']}"
+        return page["text"][:2000]  # Return first 2000 chars
+
+    @staticmethod
+    def session(pool_size: int = 16):
+        """Shared keep-alive session, so repeated fetches to a host reuse connections."""
+        with WebResourceFinder._session_lock:
+            if WebResourceFinder._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.headers["User-Agent"] = USER_AGENT
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                WebResourceFinder._session = session
+            return WebResourceFinder._session
+
+    @staticmethod
+    def extract_text(html: bytes, encoding: Optional[str] = None) -> Tuple[str, str]:
+        """Return (title, main text) of an HTML page, without scripts and navigation."""
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser", from_encoding=encoding)
+        title = soup.title.get_text(strip=True) if soup.title else ""
+        for tag in soup(_NOISE_TAGS):
+            tag.decompose()
+        root = soup.find("main") or soup.find("article") or soup.body or soup
+        text = root.get_text("\n", strip=True)
+        return title, re.sub(r"\n{3,}", "\n\n", text)
+
+    @staticmethod
+    def _cache_path(url: str) -> Path:
+        from config import config
+
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return config.config_path / "web_cache" / f"{digest}.json"
+
+    @staticmethod
+    def _read_cache(url: str) -> Optional[Dict[str, Any]]:
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.text[:2000]  # Return first 2000 chars
+            with open(WebResourceFinder._cache_path(url), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_cache(page: Dict[str, Any]):
+        path = WebResourceFinder._cache_path(page["url"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".tmp{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, "w") as f:
+            json.dump(page, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    @metrics.timed("web.fetch_page")
+    def fetch_page(url: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Fetch a page's main text, revalidating cached copies with ETag/Last-Modified."""
+        cached = WebResourceFinder._read_cache(url) if use_cache else None
+        if cached and time.time() - cached["fetched"] < FRESH_SECONDS:
+            return dict(cached, cached=True)
+
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            with WebResourceFinder.session().get(
+                url, headers=headers, timeout=FETCH_TIMEOUT, stream=True
+            ) as response:
+                if response.status_code == 304 and cached:
+                    cached["fetched"] = time.time()
+                    WebResourceFinder._write_cache(cached)
+                    return dict(cached, cached=True)
+                response.raise_for_status()
+
+                content_type = response.headers.get("Content-Type", "")
+                mime = content_type.split(";")[0].strip().lower()
+                if mime and not _is_text(mime):
+                    # PDFs, images and archives would only decode to noise
+                    return {"url": url, "error": f"Unsupported content type: {mime}"}
+                # requests assumes ISO-8859-1 for text/* without a charset; let bs4 sniff instead
+                encoding = response.encoding if "charset" in content_type.lower() else None
+                body = bytearray()
+                truncated = False
+                for chunk in response.iter_content(chunk_size=65536):
+                    body.extend(chunk)
+                    if len(body) >= MAX_PAGE_BYTES:
+                        truncated = True
+                        break
+                del body[MAX_PAGE_BYTES:]
+
+                if "html" in mime or not mime:
+                    title, text = WebResourceFinder.extract_text(bytes(body), encoding)
+                else:
+                    title = ""
+                    text = body.decode(encoding or "utf-8", "replace")
+
+                page = {
+                    "url": url,
+                    "final_url": response.url,
+                    "title": title,
+                    "text": text,
+                    "truncated": truncated,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched": time.time(),
+                }
         except Exception as e:
-            return f"Error fetching URL: {str(e)}"
\ No newline at end of file
+            return {"url": url, "error": str(e)}
+
+        if use_cache and (page["etag"] or page["last_modified"] or page["text"]):
+            WebResourceFinder._write_cache(page)
+        return dict(page, cached=False)
+
+    @staticmethod
+    async def fetch_pages(urls: List[str], concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Fetch several pages at once over the shared connection pool, in input order."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(url: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await loop.run_in_executor(None, WebResourceFinder.fetch_page, url)
+
+        return await asyncio.gather(*(one(url) for url in urls))
+
+    @staticmethod
+    def search_and_fetch(query: str, num_results: int = 3) -> List[Dict[str, Any]]:
+        """Search, then download every result concurrently."""
+        import asyncio
+
+        results = WebResourceFinder.search_web(query, num_results)
+        urls = [url for url in results if url.startswith(("http://", "https://"))]
+        if not urls:
+            # search_web reports failures as a single message
+            return [{"url": query, "error": results[0]}] if results else []
+        return asyncio.run(WebResourceFinder.fetch_pages(urls))
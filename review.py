@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, Iterable, List
+
+import metrics
+from config import config
+from ingest import CHARS_PER_TOKEN, analyze_large_file, sniff_file
+from utils import get_file_content
+
+REVIEW_SYSTEM_PROMPT = (
+    "You are a senior engineer reviewing code. Point out bugs, security problems, "
+    "and maintainability issues with line references where possible, most serious first. "
+    "Be concise and say so plainly if the file looks fine."
+)
+REVIEW_QUESTION = "Review this file for bugs, security problems and maintainability issues."
+HASH_BUFFER = 1 << 20
+
+
+def state_path(root: str) -> Path:
+    """Per-project record of reviewed content, under ~/.config/devos-ai/reviews."""
+    key = hashlib.sha1(os.path.realpath(root).encode()).hexdigest()[:16]
+    return config.config_path / "reviews" / f"{key}.json"
+
+
+def load_state(path: Path) -> Dict[str, Any]:
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    state.setdefault("files", {})
+    state.setdefault("reviews", {})
+    return state
+
+
+def save_state(path: Path, state: Dict[str, Any]):
+    from os_ops.file_handling import FileHandler
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    FileHandler.atomic_write(str(path), json.dumps(state).encode())
+
+
+def prune_state(state: Dict[str, Any], root: str):
+    """Forget deleted files and reviews of content no file has any more."""
+    state["files"] = {rel: known for rel, known in state["files"].items()
+                      if os.path.exists(os.path.join(root, rel))}
+    live = {known["sha256"] for known in state["files"].values()}
+    state["reviews"] = {sha: review for sha, review in state["reviews"].items() if sha in live}
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BUFFER), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def plan_review(paths: Iterable[str], root: str, state: Dict[str, Any], force: bool = False,
+                max_bytes: int = 0) -> List[Dict[str, Any]]:
+    """One report entry per file; entries with status "pending" still need a review.
+
+    Files whose size and mtime match the last run reuse the stored hash
+    instead of being read again. Identical files are reviewed once.
+    """
+    entries = []
+    first_by_hash: Dict[str, str] = {}
+    for path in paths:
+        rel = os.path.relpath(path, root)
+        entry = {"path": rel}
+        entries.append(entry)
+        try:
+            stat = os.stat(path)
+            known = state["files"].get(rel)
+            if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+                sha = known["sha256"]
+            else:
+                if max_bytes and stat.st_size > max_bytes:
+                    entry.update(status="skipped", reason=f"larger than {max_bytes} bytes")
+                    continue
+                if sniff_file(path)[0]:
+                    entry.update(status="skipped", reason="binary file")
+                    continue
+                sha = file_digest(path)
+                state["files"][rel] = {"sha256": sha, "size": stat.st_size, "mtime": stat.st_mtime}
+        except OSError as e:
+            entry.update(status="failed", error=str(e))
+            continue
+
+        entry["sha256"] = sha
+        if sha in first_by_hash:
+            entry.update(status="duplicate", duplicate_of=first_by_hash[sha])
+            continue
+        first_by_hash[sha] = rel
+        previous = state["reviews"].get(sha)
+        if previous and not force:
+            entry.update(previous, status="unchanged")
+        else:
+            entry.update(status="pending", file=path)
+    return entries
+
+
+@metrics.timed("review.file")
+def review_file(client, path: str, rel: str) -> Dict[str, Any]:
+    """Review one file; files too big for one prompt go through map-reduce."""
+    started = time.perf_counter()
+    text = get_file_content(path)
+    if text is None:
+        return {"error": f"{rel} is not a readable text file"}
+    if not text.strip():
+        return {"review": "Empty file.", "model": None}
+
+    chunk_tokens = min(config.chunk_tokens, config.context_window(config.model) // 2)
+    if len(text) > chunk_tokens * CHARS_PER_TOKEN:
+        result = analyze_large_file(client, path, chunk_tokens, 1, question=REVIEW_QUESTION)
+        if "error" in result:
+            return result
+        return {"review": result["content"], "model": config.model,
+                "latency": round(time.perf_counter() - started, 3)}
+
+    response = client.send_prompt(f"{REVIEW_QUESTION}\n\n{rel}:\n```\n{text}\n```", REVIEW_SYSTEM_PROMPT)
+    if "error" in response:
+        return {"error": response["error"]}
+    return {
+        "review": response.get("choices", [{}])[0].get("message", {}).get("content", ""),
+        "model": response.get("model"),
+        "usage": response.get("usage"),
+        "latency": round(time.perf_counter() - started, 3),
+    }
+
+
+def run_review(entries: List[Dict[str, Any]], client, state: Dict[str, Any], concurrency: int = 4,
+               on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, int]:
+    """Review pending entries with at most `concurrency` in flight, filling them in place.
+
+    Successful reviews are stored in state by content hash, so an
+    interrupted run keeps what it finished.
+    """
+    pending = [entry for entry in entries if entry["status"] == "pending"]
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    futures = {pool.submit(review_file, client, entry.pop("file"), entry["path"]): entry
+               for entry in pending}
+    try:
+        for future in as_completed(futures):
+            entry = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"error": str(e)}
+            if "error" in result:
+                entry.update(status="failed", error=result["error"])
+            else:
+                result["reviewed_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                state["reviews"][entry["sha256"]] = {
+                    k: v for k, v in result.items() if k not in ("usage", "latency")
+                }
+                entry.update(result, status="reviewed")
+            if on_done:
+                on_done(entry)
+    finally:
+        # On Ctrl-C don't wait for queued files; in-flight requests finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Duplicates share the review of the first file with the same content
+    by_hash = {entry["sha256"]: entry for entry in entries
+               if entry["status"] in ("reviewed", "unchanged")}
+    for entry in entries:
+        if entry["status"] == "duplicate" and entry["sha256"] in by_hash:
+            entry["review"] = by_hash[entry["sha256"]].get("review")
+
+    counts: Dict[str, int] = {}
+    for entry in entries:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    return counts
@@ -9,7 +9,8 @@ setup(
         "python-dotenv>=1.0.0",
         "rich>=13.0.0",
         "click>=8.1.0",
-        "pyyaml>=6.0.0"
+        "pyyaml>=6.0.0",
+        "numpy>=1.24.0"
     ],
     entry_points={
         "console_scripts": [
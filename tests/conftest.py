@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+# Settings come from a throwaway home and the environment layer, never the
+# developer's own config.yaml, cache or daemon. Set before config is first read.
+os.environ["HOME"] = tempfile.mkdtemp(prefix="devos-ai-tests-")
+os.environ["OPENROUTER_API_KEY"] = "test-key"
+os.environ["DEVOS_AI_NO_DAEMON"] = "1"
+os.environ["DEVOS_AI_CACHE_ENABLED"] = "false"
+os.environ["DEVOS_AI_BACKOFF_FACTOR"] = "0.01"
+os.environ["DEVOS_AI_MAX_RETRIES"] = "2"
+
+
+@pytest.fixture
+def stub():
+    """A fresh local OpenRouter stand-in; yields (server, base URL)."""
+    import stub_server
+
+    server, url = stub_server.start(tokens=5)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub):
+    from ai_client import AIClient
+
+    client = AIClient(base_url=stub[1])
+    yield client
+    client.close()
@@ -0,0 +1,39 @@
+import asyncio
+import io
+import json
+
+from ai_client import AsyncAIClient
+from batch import run_batch
+
+
+def test_bad_rows_fail_alone(client, tmp_path):
+    items = [
+        {"id": "1", "prompt": 5},
+        {"id": "2"},
+        {"id": "3", "prompt": "hi", "max_tokens": "lots"},
+        {"id": "4", "prompt": "hi"},
+    ]
+    output = io.StringIO()
+    checkpoint = tmp_path / "out.checkpoint"
+    counts = asyncio.run(run_batch(items, AsyncAIClient(client), output, checkpoint=checkpoint))
+
+    results = {r["id"]: r for r in map(json.loads, output.getvalue().splitlines())}
+    assert counts == {"completed": 1, "failed": 3, "skipped": 0}
+    assert results["1"]["error"] == "prompt must be a string"
+    assert results["2"]["error"] == "Missing prompt"
+    assert "error" in results["3"]
+    assert results["4"]["response"]
+    assert checkpoint.read_text() == "4\n"
+
+
+def test_resume_skips_results_already_in_the_output(client, tmp_path):
+    output_path = tmp_path / "out.jsonl"
+    # Written before a crash, which kept id 1 out of the checkpoint; the last line was cut short
+    output_path.write_text('{"id": "1", "response": "earlier"}\n{"id": "2", "resp')
+    output = io.StringIO()
+    counts = asyncio.run(run_batch(
+        [{"id": "1", "prompt": "a"}, {"id": "2", "prompt": "b"}], AsyncAIClient(client), output,
+        checkpoint=tmp_path / "out.checkpoint", resume_from=output_path,
+    ))
+    assert counts == {"completed": 1, "failed": 0, "skipped": 1}
+    assert json.loads(output.getvalue())["id"] == "2"
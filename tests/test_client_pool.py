@@ -0,0 +1,56 @@
+import time
+
+from config import config
+
+
+def test_last_timing_breaks_down_a_request(client):
+    response = client.send_prompt("hi")
+    assert "error" not in response
+    timing = client.last_timing
+    assert timing["attempts"] == 1
+    assert not timing["cached"]
+    assert timing["connect"] > 0
+    assert 0 < timing["ttfb"] <= timing["total"]
+
+
+def test_connections_are_reused_between_requests(stub, client):
+    server, _ = stub
+    for _ in range(3):
+        assert "error" not in client.send_prompt("hi")
+    assert server.requests == 3
+    assert len(server.peers) == 1
+    # Only the first request paid for the TCP handshake
+    assert client.last_timing["connect"] == 0
+
+
+def test_429_is_retried_after_retry_after(stub, client):
+    server, _ = stub
+    server.failures = [(429, "0.3")]
+    start = time.perf_counter()
+    response = client.send_prompt("hi")
+    assert "error" not in response
+    assert time.perf_counter() - start >= 0.3
+    assert client.last_timing["attempts"] == 2
+    assert server.requests == 2
+
+
+def test_5xx_is_retried_with_backoff(stub, client):
+    server, _ = stub
+    server.failures = [(502, None), (503, None)]
+    assert "error" not in client.send_prompt("hi")
+    assert client.last_timing["attempts"] == 3
+
+
+def test_gives_up_after_max_retries(stub, client):
+    server, _ = stub
+    server.failures = [(503, None)] * (config.max_retries + 1)
+    response = client.send_prompt("hi")
+    assert "503" in response["error"]
+    assert server.requests == config.max_retries + 1
+
+
+def test_client_errors_are_not_retried(stub, client):
+    server, _ = stub
+    server.failures = [(400, None)]
+    assert "error" in client.send_prompt("hi")
+    assert server.requests == 1
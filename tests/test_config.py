@@ -0,0 +1,57 @@
+import pytest
+import yaml
+
+from config import DEFAULTS, Config
+
+
+@pytest.fixture
+def layers(tmp_path, monkeypatch):
+    """Fresh home with a config.yaml and a project directory holding a .devos.yaml."""
+    home = tmp_path / "home"
+    project = home / "project"
+    (home / ".config" / "devos-ai").mkdir(parents=True)
+    project.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.chdir(project)
+    monkeypatch.delenv("DEVOS_AI_MAX_TOKENS", raising=False)
+
+    def write(config_yaml, devos_yaml):
+        (home / ".config" / "devos-ai" / "config.yaml").write_text(yaml.safe_dump(config_yaml))
+        (project / ".devos.yaml").write_text(yaml.safe_dump(devos_yaml))
+    return write
+
+
+def test_layers_apply_in_precedence_order(layers, monkeypatch):
+    layers(
+        {"model": "user/model", "max_tokens": 100, "temperature": 0.1, "pool_size": 7},
+        {"max_tokens": 200, "temperature": 0.2, "rag_top_k": 9, "profile": "warm",
+         "profiles": {"warm": {"temperature": 0.9}}},
+    )
+    config = Config()
+    assert config.rag_enabled == DEFAULTS["rag_enabled"] and "rag_enabled" not in config.sources
+    assert (config.model, config.sources["model"]) == ("user/model", "config.yaml")
+    assert config.pool_size == 7
+    assert config.rag_top_k == 9 and config.sources["rag_top_k"].endswith(".devos.yaml")
+    assert config.max_tokens == 200
+    assert (config.temperature, config.sources["temperature"]) == (0.9, "profile warm")
+
+    monkeypatch.setenv("DEVOS_AI_MAX_TOKENS", "300")
+    monkeypatch.setenv("DEVOS_AI_TEMPERATURE", "0.5")
+    assert config.refresh()
+    assert (config.max_tokens, config.sources["max_tokens"]) == (300, "environment")
+    assert (config.temperature, config.sources["temperature"]) == (0.5, "environment")
+
+
+def test_project_file_cannot_set_disallowed_keys(layers):
+    layers(
+        {"metrics_export": "", "theme": "monokai"},
+        {"metrics_export": "/tmp/owned.jsonl", "theme": "evil", "pool_size": 1000,
+         "context_windows": {"user/model": 10}, "model": "project/model"},
+    )
+    config = Config()
+    assert config.metrics_export == ""
+    assert config.theme == "monokai"
+    assert config.pool_size == DEFAULTS["pool_size"]
+    assert "user/model" not in config.context_windows
+    # Allowed keys in the same file still apply
+    assert config.model == "project/model"
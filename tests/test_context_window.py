@@ -0,0 +1,45 @@
+import pytest
+
+from ai_client import AIClientError
+from config import config
+from tokens import message_tokens
+
+WINDOW = 2000
+
+
+@pytest.fixture
+def small_window(monkeypatch):
+    monkeypatch.setitem(config.context_windows, config.model, WINDOW)
+
+
+def history(turns):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * 100}
+            for i in range(turns)]
+
+
+def test_context_is_trimmed_before_history(client, small_window):
+    payload = client._build_payload("question", history=history(4), context="ctx " * 1500)
+    messages = payload["messages"]
+    assert [m["content"] for m in messages[:4]] == [m["content"] for m in history(4)]
+    assert messages[4]["role"] == "system" and len(messages[4]["content"]) < len("ctx " * 1500)
+    assert messages[-1]["content"] == "question"
+    assert message_tokens(messages) + payload["max_tokens"] <= WINDOW
+
+
+def test_oldest_history_is_dropped_and_prompt_kept(client, small_window):
+    turns = history(30)
+    payload = client._build_payload("question", system_prompt="be brief", history=turns, context="ctx " * 2000)
+    messages = payload["messages"]
+    assert messages[0]["content"] == "be brief"
+    assert messages[-1]["content"] == "question"
+    # No context left; what remains of the history is its newest turns
+    kept = messages[1:-1]
+    assert kept and [m["content"] for m in kept] == [m["content"] for m in turns[-len(kept):]]
+    assert message_tokens(messages) + payload["max_tokens"] <= WINDOW
+
+
+def test_attachments_that_cannot_fit_fail_clearly(client, small_window):
+    attachments = {"big.py": "x = 1\n" * 2000}
+    with pytest.raises(AIClientError, match="context window"):
+        client._build_payload("question", attachments=attachments, history=history(2))
+    assert "context window" in client.send_prompt("question", attachments=attachments)["error"]
@@ -0,0 +1,25 @@
+import time
+
+
+def test_race_returns_fastest_model(stub, client):
+    server, _ = stub
+    server.model_token_delay = {"slow/model": 0.2}
+    result = client.race_prompt("hi", models=["slow/model", "fast/model"])
+    assert result["model"] == "fast/model"
+    assert result["choices"][0]["message"]["content"] == "".join(f"word{i} " for i in range(5))
+
+
+def test_stalled_loser_is_aborted_not_left_until_read_timeout(stub, client):
+    server, _ = stub
+    # The loser sends its headers, then nothing for far longer than the test runs
+    server.model_token_delay = {"stalled/model": 30.0}
+    start = time.perf_counter()
+    result = client.race_prompt("hi", models=["stalled/model", "fast/model"])
+    assert result["model"] == "fast/model"
+
+    # A cancelled stream without tokens records its elapsed time once its thread lets go
+    deadline = time.perf_counter() + 2.0
+    while not client.latency("stalled/model").count and time.perf_counter() < deadline:
+        time.sleep(0.02)
+    assert client.latency("stalled/model").count == 1
+    assert time.perf_counter() - start < 2.0
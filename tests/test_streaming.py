@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from ai_client import AIClientError
+
+
+def test_stream_yields_deltas_in_order(client):
+    assert list(client.stream_prompt("hi")) == [f"word{i} " for i in range(5)]
+
+
+def test_stream_ends_at_done_without_waiting_for_eof(stub, client):
+    server, _ = stub
+    server.hold_after_done = 2.0
+    start = time.perf_counter()
+    assert len(list(client.stream_prompt("hi"))) == 5
+    assert time.perf_counter() - start < 1.0
+
+
+def test_error_event_mid_stream_raises_after_earlier_deltas(stub, client):
+    server, _ = stub
+    server.error_after = 2
+    received = []
+    with pytest.raises(AIClientError, match="upstream overloaded"):
+        for delta in client.stream_prompt("hi"):
+            received.append(delta)
+    assert received == ["word0 ", "word1 "]
+
+
+def test_final_usage_chunk_is_recorded(client):
+    list(client.stream_prompt("hi"))
+    usage = client.usage.summary()
+    assert usage["requests"] == 1
+    assert usage["prompt_tokens"] == 10
+    assert usage["completion_tokens"] == 5
+    # Reported by the server, not estimated
+    assert usage["estimated"] == 0
+
+
+def test_http_error_before_stream_raises(stub, client):
+    server, _ = stub
+    server.failures = [(400, None)]
+    with pytest.raises(AIClientError):
+        list(client.stream_prompt("hi"))
@@ -0,0 +1,104 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from os_ops import web_resources
+from os_ops.web_resources import WebResourceFinder
+
+PAGE = b"""<html><head><title>Retry guide</title><script>var x = 1;</script></head>
+<body><nav>Home | Docs</nav><main><h1>Backoff</h1><p>Wait longer after each failure.</p></main>
+<footer>Copyright</footer></body></html>"""
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.hits.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/page":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, b"", etag='"v1"')
+            else:
+                self._send(200, PAGE, "text/html; charset=utf-8", etag='"v1"')
+        elif self.path == "/big":
+            self._send(200, b"x" * 5000, "text/plain")
+        elif self.path == "/data.json":
+            self._send(200, b'{"ok": true}', "application/json")
+        elif self.path == "/doc.pdf":
+            self._send(200, b"%PDF-1.7\x00\xff\xfe binary", "application/pdf")
+        else:
+            self._send(404, b"missing", "text/plain")
+
+    def _send(self, status, body, content_type=None, etag=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    server.hits = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_main_text_is_extracted_without_page_furniture(site):
+    _, url = site
+    page = WebResourceFinder.fetch_page(url + "/page", use_cache=False)
+    assert page["title"] == "Retry guide"
+    assert "Wait longer after each failure." in page["text"]
+    for noise in ("var x", "Home | Docs", "Copyright"):
+        assert noise not in page["text"]
+
+
+def test_stale_cache_is_revalidated_with_etag(site, monkeypatch):
+    server, url = site
+    first = WebResourceFinder.fetch_page(url + "/page")
+    assert first["cached"] is False
+
+    # Fresh copies are served without a request at all
+    assert WebResourceFinder.fetch_page(url + "/page")["cached"] is True
+    assert len(server.hits) == 1
+
+    monkeypatch.setattr(web_resources, "FRESH_SECONDS", 0)
+    again = WebResourceFinder.fetch_page(url + "/page")
+    assert server.hits[-1] == ("/page", '"v1"')
+    assert again["cached"] is True
+    assert again["text"] == first["text"]
+
+
+def test_body_is_capped(site, monkeypatch):
+    _, url = site
+    monkeypatch.setattr(web_resources, "MAX_PAGE_BYTES", 1000)
+    page = WebResourceFinder.fetch_page(url + "/big", use_cache=False)
+    assert page["truncated"] is True
+    assert len(page["text"]) == 1000
+
+
+def test_json_is_returned_as_text(site):
+    _, url = site
+    assert WebResourceFinder.fetch_page(url + "/data.json", use_cache=False)["text"] == '{"ok": true}'
+
+
+def test_binary_content_types_are_refused(site):
+    _, url = site
+    page = WebResourceFinder.fetch_page(url + "/doc.pdf", use_cache=False)
+    assert page["error"] == "Unsupported content type: application/pdf"
+
+
+def test_http_errors_are_reported(site):
+    _, url = site
+    assert "404" in WebResourceFinder.fetch_page(url + "/nope", use_cache=False)["error"]
@@ -0,0 +1,146 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+from config import config
+
+# Approximation of BPE tokenizers: short words are one token, long words
+# split every ~8 letters, digits group by three, symbols stand alone.
+_WORD_RE = re.compile(r"[A-Za-z]+")
+_LONG_WORD_RE = re.compile(r"[A-Za-z]{8,}")
+_NUMBER_RE = re.compile(r"[0-9]{1,3}")
+_SYMBOL_RE = re.compile(r"[^\sA-Za-z0-9]")
+_SPACE_RE = re.compile(r"\n|\t+| {2,}")
+
+# Chat formatting overhead per message and per request
+MESSAGE_OVERHEAD = 4
+REQUEST_OVERHEAD = 3
+# Headroom kept free of the context window for estimator error
+SAFETY_MARGIN = 256
+# Smallest completion budget worth sending a request for
+MIN_COMPLETION_TOKENS = 256
+
+_CACHE_SIZE = 4096
+_cache: "OrderedDict[bytes, int]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _count(text: str) -> int:
+    tokens = len(_WORD_RE.findall(text))
+    tokens += sum(len(word) // 8 for word in _LONG_WORD_RE.findall(text))
+    tokens += len(_NUMBER_RE.findall(text))
+    tokens += len(_SYMBOL_RE.findall(text))
+    tokens += len(_SPACE_RE.findall(text))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Offline token estimate, cached by content hash for repeated prompts and files."""
+    if not text:
+        return 0
+    if len(text) < 256:
+        return _count(text)
+    key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    tokens = _count(text)
+    with _cache_lock:
+        _cache[key] = tokens
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return tokens
+
+
+def message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Estimated prompt tokens for a chat messages list."""
+    return REQUEST_OVERHEAD + sum(
+        MESSAGE_OVERHEAD + estimate_tokens(message.get("content") or "") for message in messages
+    )
+
+
+# Formats without multi-line string literals, where trailing blanks and runs of
+# empty lines can't be part of a value. Everything else only has CRLF normalised:
+# Python docstrings, YAML block scalars, heredocs, raw strings and template
+# literals would all change meaning.
+_MINIFY_SUFFIXES = {".json", ".css", ".scss", ".less"}
+_TRAILING_SPACE_RE = re.compile(r"[ \t]+$", re.M)
+_BLANK_RUN_RE = re.compile(r"\n{3,}")
+
+
+def minify_code(text: str, path: str = "") -> str:
+    """Normalise CRLF to LF; for JSON and CSS also drop trailing blanks and extra empty lines."""
+    text = text.replace("\r\n", "\n")
+    suffix = path[path.rfind("."):].lower() if "." in path else ""
+    if suffix not in _MINIFY_SUFFIXES:
+        return text
+    text = _TRAILING_SPACE_RE.sub("", text)
+    return _BLANK_RUN_RE.sub("\n\n", text)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, keeping the head and tail around a marker."""
+    total = estimate_tokens(text)
+    if total <= max_tokens:
+        return text
+    marker = "\n\n[... {} tokens truncated to fit the context window ...]\n\n"
+    keep = max(0, max_tokens - estimate_tokens(marker) - 8)
+    chars = int(len(text) * keep / total)
+    # Beginnings carry most context (imports, headers); tails carry the latest output
+    head, tail = chars * 2 // 3, chars // 3
+    return text[:head] + marker.format(total - keep) + (text[-tail:] if tail else "")
+
+
+class UsageTracker:
+    """Per-session token and cost totals."""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.estimated = 0
+        self.cached_tokens = 0
+        self.bytes_sent = 0
+        # The most recent request, for per-request reporting
+        self.last: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int,
+               cost: Optional[float] = None, estimated: bool = False,
+               cached_tokens: int = 0, bytes_sent: int = 0):
+        if cost is None:
+            prompt_price, completion_price = config.model_prices.get(model, (0.0, 0.0))
+            cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost += cost
+            self.cached_tokens += cached_tokens
+            self.bytes_sent += bytes_sent
+            if estimated:
+                self.estimated += 1
+            self.last = {
+                "model": model,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cached_tokens": cached_tokens,
+                "bytes_sent": bytes_sent,
+                "cost": cost,
+                "estimated": estimated,
+            }
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost": self.cost,
+                "estimated": self.estimated,
+                "cached_tokens": self.cached_tokens,
+                "bytes_sent": self.bytes_sent,
+            }
@@ -1,12 +1,20 @@
 from rich.console import Console, Group
 from rich.panel import Panel
-from rich.columns import Columns
-from rich.markdown import Markdown
-from rich.syntax import Syntax
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.table import Table
+from rich.text import Text
 from rich.theme import Theme
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import os
+import shlex
+import sys
+import subprocess
+import time
 from config import config
+import metrics
+
+# Markdown (markdown-it), Syntax (pygments), Live and Progress are imported
+# inside the functions that use them; together they dominate startup time.
 
 # Custom theme for terminal
 terminal_theme = Theme({
@@ -21,6 +29,9 @@ terminal_theme = Theme({
 
 console = Console(theme=terminal_theme)
 
+# Repaints per second while a response is streaming in
+STREAM_REFRESH_RATE = 8
+
 def create_command_panel(title: str, commands: list, color: str = "cyan"):
     """Helper function to create consistent command panels."""
     content = "\n".join(f"[prompt]{cmd}[/prompt]" for cmd in commands)
@@ -28,6 +39,8 @@ def create_command_panel(title: str, commands: list, color: str = "cyan"):
 
 def display_welcome():
     """Display welcome message with system info and extended command help in horizontal layout."""
+    from rich.columns import Columns
+
     # System info panel
     system_info = f"""
     [bold green]DevOS AI[/bold green] - Your AI Development Assistant
@@ -42,6 +55,11 @@ def display_welcome():
         create_command_panel("Core Commands", [
             "Type prompt + Enter for assistance",
             "!config - Change settings",
+            "!cache stats|clear - Response cache",
+            "!race / !compare <prompt> - Ask several models",
+            "!stats [reset|export] - Latency percentiles",
+            "!usage - Tokens, cache hits, bytes sent",
+            "!apply [--diff|--dry-run] / undo - Write code from the last reply",
             "!exit - Quit the application"
         ], "green"),
         
@@ -53,25 +71,31 @@ def display_welcome():
         
         create_command_panel("File Operations", [
             "!find <pattern> - Find files",
+            "!workflow <name> [--dry-run] - Run a workflow",
+            "!grep <regex> [dir] [-- question] - Search contents",
             "!read <file> - Display contents",
             "!edit <file> - Edit file",
-            "@file.txt - Analyze file"
+            "@file.txt - Analyze file",
+            "!attach / !detach <file> - Pin files to prompts"
         ], "blue"),
         
         create_command_panel("System Control", [
             "!open <app> - Launch apps",
-            "!apps - List running apps",
+            "!apps [name] - List running apps",
+            "!top [name] - Live process view",
             "!kill <app> - Terminate apps"
         ], "magenta"),
         
         create_command_panel("Git Integration", [
             "!git status - Repository status",
             "!git branch - Current branch",
-            "!git diff - Show changes"
+            "!git diff [--staged] - Show changes",
+            "!git commit-msg / review - Ask AI about the diff"
         ], "cyan"),
         
         create_command_panel("Web Resources", [
             "!search <query> - Web search",
+            "!search --fetch <query> - Search + read pages",
             "!fetch <url> - Get webpage"
         ], "red")
     ]
@@ -92,30 +116,91 @@ def display_welcome():
     console.print(Columns(command_panels, equal=True, expand=True))
     console.print(Panel.fit(examples, border_style="yellow", padding=(1, 2)))
 
+@lru_cache(maxsize=256)
+def _highlight(code: str, language: str, theme: str) -> Text:
+    """Lex a code block once; the highlighted Text is reused on every redraw."""
+    from rich.syntax import Syntax
+
+    return Syntax(code, language, theme=theme).highlight(code)
+
+@lru_cache(maxsize=256)
+def _markdown(text: str):
+    from rich.markdown import Markdown
+
+    return Markdown(text)
+
+@metrics.timed("ui.build_view")
+def _render_response(response: str, language: Optional[str] = None,
+                     max_lines: Optional[int] = None) -> Group:
+    """Build the renderables for an AI response, showing at most max_lines lines."""
+    from utils import parse_fences
+
+    renderables = []
+    budget = max_lines
+    for kind, fence_language, body, _ in parse_fences(response):
+        if budget is not None:
+            if budget <= 0:
+                break
+            lines = body.count('\n') + 1
+            if lines > budget:
+                body = '\n'.join(body.split('\n')[:budget])
+            budget -= lines
+        if kind == "text":
+            if body.strip():
+                renderables.append(_markdown(body))
+        else:
+            renderables.append(_highlight(body, fence_language or language or "text", config.theme))
+    return Group(*renderables)
+
+def _show_overflow(response: str, hidden: int):
+    """Save a response too long for the screen and open it in the pager."""
+    from os_ops.file_handling import FileHandler
+
+    path = FileHandler.create_temp_file(response, suffix=".md")
+    console.print(f"[info]... {hidden} more lines. Full response saved to {path}[/info]")
+    # Inside the daemon the console writes to a socket, never the real terminal
+    if config.render_pager and console.is_terminal and console.file is sys.stdout:
+        pager = shlex.split(os.environ.get("PAGER") or "less -R")
+        try:
+            subprocess.run(pager + [path])
+        except OSError as e:
+            console.print(f"[warning]Could not start pager {pager[0]}: {e}[/warning]")
+
+@metrics.timed("ui.render")
 def display_response(response: str, language: Optional[str] = None):
     """Display AI response with appropriate formatting."""
     if not response:
         return
-        
-    if language:
-        parts = response.split("```")
-        for i, part in enumerate(parts):
-            if i % 2 == 1:  # Code block
-                code_lines = part.split('\n')
-                if len(code_lines) > 1 and code_lines[0].strip() == language:
-                    code = '\n'.join(code_lines[1:])
-                else:
-                    code = part
-                
-                console.print(Syntax(
-                    code, language, theme=config.theme,
-                    line_numbers=True,
-                    word_wrap=True
-                ))
-            else:
-                console.print(Markdown(part))
-    else:
-        console.print(Markdown(response))
+
+    max_lines = config.render_max_lines or None
+    console.print(_render_response(response, language, max_lines))
+    total = response.count('\n') + 1
+    if max_lines and total > max_lines:
+        _show_overflow(response, total - max_lines)
+
+def display_stream(chunks: Iterable[str], language: Optional[str] = None) -> str:
+    """Render a streamed AI response incrementally and return the full text."""
+    from rich.live import Live
+
+    parts = []
+    last_render = 0.0
+    max_lines = config.render_max_lines or None
+    with Live(console=console, refresh_per_second=STREAM_REFRESH_RATE, vertical_overflow="visible") as live:
+        for chunk in chunks:
+            parts.append(chunk)
+            # Re-parsing Markdown on every token is quadratic, so only rebuild
+            # the view as often as Live actually repaints it.
+            now = time.monotonic()
+            if now - last_render >= 1 / STREAM_REFRESH_RATE:
+                live.update(_render_response("".join(parts), language, max_lines))
+                last_render = now
+        response = "".join(parts)
+        if response:
+            live.update(_render_response(response, language, max_lines), refresh=True)
+    total = response.count('\n') + 1
+    if response and max_lines and total > max_lines:
+        _show_overflow(response, total - max_lines)
+    return response
 
 def display_error(message: str):
     """Display error message in a styled panel."""
@@ -137,6 +222,8 @@ def display_success(message: str):
 
 def show_progress(message: str):
     """Display a progress spinner for operations."""
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+
     progress = Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -151,8 +238,23 @@ def hide_progress(progress):
     """Stop the progress spinner."""
     progress.stop()
 
+def display_grep_match(match):
+    """Print one content-search hit as path:line: text, with any context lines dimmed."""
+    from rich.markup import escape
+
+    for offset, line in enumerate(match.before, match.line_no - len(match.before)):
+        console.print(f"[info]{escape(match.path)}-{offset}-[/info] [code]{escape(line)}[/code]")
+    console.print(f"[green]{escape(match.path)}[/green]:[cyan]{match.line_no}[/cyan]: {escape(match.line)}")
+    for offset, line in enumerate(match.after, match.line_no + 1):
+        console.print(f"[info]{escape(match.path)}-{offset}-[/info] [code]{escape(line)}[/code]")
+    if match.before or match.after:
+        console.print("[info]--[/info]")
+
+
 def display_file_content(content: str, file_path: str):
     """Display file content with syntax highlighting."""
+    from rich.syntax import Syntax
+
     console.print(f"\n[bold]Contents of [green]{file_path}[/green]:[/bold]")
     extension = file_path.split('.')[-1].lower()
     language = {
@@ -181,4 +283,58 @@ def display_running_apps(apps: list):
     
     console.print("\n[bold]Running Applications:[/bold]")
     for i, app in enumerate(apps, 1):
-        console.print(f"[cyan]{i}.[/cyan] {app}")
\ No newline at end of file
+        console.print(f"[cyan]{i}.[/cyan] {app}")
+
+def process_table(rows: List[Dict[str, Any]], title: str = "Processes") -> Table:
+    """Table of process snapshot rows."""
+    table = Table(title=title, expand=False)
+    table.add_column("PID", justify="right", style="cyan")
+    table.add_column("Name", style="bold")
+    table.add_column("User")
+    table.add_column("CPU %", justify="right")
+    table.add_column("RSS MB", justify="right")
+    for row in rows:
+        table.add_row(
+            str(row['pid']), row['name'], row['user'],
+            f"{row['cpu']:.1f}", f"{row['rss'] / 1048576:.1f}"
+        )
+    return table
+
+def stats_table(rows: List[Dict[str, Any]], title: str = "Latency (ms)") -> Table:
+    """Table of span timings as returned by metrics.snapshot()."""
+    table = Table(title=title, caption="p50-p99 favour recent samples; count and max are since start")
+    table.add_column("Span")
+    for column in ("Count", "p50", "p95", "p99", "Max"):
+        table.add_column(column, justify="right")
+    for row in rows:
+        table.add_row(
+            row['span'], str(row['count']),
+            *(f"{row[key] * 1000:.1f}" for key in ('p50', 'p95', 'p99', 'max'))
+        )
+    return table
+
+def workflow_table(results: List[Dict[str, Any]], title: str = "Workflow") -> Table:
+    """Per-step status and timing as returned by workflow.run_workflow()."""
+    styles = {"ok": "green", "cached": "cyan", "failed": "red", "skipped": "dim"}
+    table = Table(title=title)
+    table.add_column("Step")
+    table.add_column("Action")
+    table.add_column("Status")
+    table.add_column("Seconds", justify="right")
+    for result in results:
+        style = styles.get(result['status'], "white")
+        table.add_row(result['id'], result['run'], f"[{style}]{result['status']}[/{style}]",
+                      f"{result['seconds']:.2f}")
+    return table
+
+def live_process_view(fetch: Callable[[], List[Dict[str, Any]]], title: str, interval: float = 1.0):
+    """Redraw a process table every interval seconds until Ctrl+C."""
+    from rich.live import Live
+
+    with Live(console=console, refresh_per_second=4) as live:
+        try:
+            while True:
+                live.update(process_table(fetch(), f"{title} (Ctrl+C to stop)"))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -1,6 +1,8 @@
 import re
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from pathlib import Path
+from ingest import sniff_file
 
 def detect_language(prompt: str) -> Tuple[str, str]:
     """Detect language from prompt command and return (language, cleaned_prompt)."""
@@ -20,14 +22,63 @@ def detect_language(prompt: str) -> Tuple[str, str]:
     
     return None, prompt
 
+# A fence opens with ``` plus an optional info string and closes with a bare ``` line
+_FENCE_OPEN = re.compile(r'^```[ \t]*([^\n`]*)$', re.M)
+_FENCE_CLOSE = re.compile(r'^```[ \t]*$', re.M)
+# The info string's first word names the language unless it looks like a path
+_LANGUAGE = re.compile(r'[\w+#-]+')
+
+Segment = Tuple[str, Optional[str], str, str]
+
+
+def _fence_language(info: str) -> Optional[str]:
+    match = _LANGUAGE.match(info)
+    if match is None or info[match.end():match.end() + 1] in ('.', '/'):
+        return None
+    return match.group(0)
+
+
+@lru_cache(maxsize=32)
+def parse_fences(text: str) -> Tuple[Segment, ...]:
+    """Split markdown into ("text" | "code" | "partial", language, body, info) segments.
+
+    "partial" is a code block whose closing fence has not arrived yet, as
+    happens mid-stream. Results are cached, so rendering a response and
+    extracting its code blocks scan the text only once.
+    """
+    segments: List[Segment] = []
+    pos = 0
+    while True:
+        opening = _FENCE_OPEN.search(text, pos)
+        if opening is None:
+            break
+        if opening.start() > pos:
+            segments.append(("text", None, text[pos:opening.start()], ""))
+        info = opening.group(1).strip()
+        language = _fence_language(info)
+        start = opening.end() + 1
+        closing = _FENCE_CLOSE.search(text, start)
+        if closing is None:
+            segments.append(("partial", language, text[start:], info))
+            return tuple(segments)
+        body = text[start:closing.start()]
+        segments.append(("code", language, body[:-1] if body.endswith('\n') else body, info))
+        pos = closing.end() + 1
+    if pos < len(text):
+        segments.append(("text", None, text[pos:], ""))
+    return tuple(segments)
+
+
 def extract_code_blocks(text: str) -> list:
     """Extract all code blocks from markdown text."""
-    pattern = r'```(?:[a-zA-Z0-9]+)?\n([\s\S]*?)\n```'
-    return re.findall(pattern, text)
+    return [body for kind, _, body, _ in parse_fences(text) if kind == "code"]
 
 def get_file_content(file_path: str) -> Optional[str]:
-    """Read file content if it exists."""
+    """Read text file content if it exists; binary files return None."""
     path = Path(file_path)
     if path.exists() and path.is_file():
-        return path.read_text()
+        is_binary, encoding = sniff_file(file_path)
+        if is_binary:
+            return None
+        return path.read_text(encoding=encoding, errors='replace')
     return None
\ No newline at end of file
@@ -0,0 +1,449 @@
+"""YAML workflows: steps wrapping DevOS operations, run as a dependency graph.
+
+    name: release_notes
+    vars:
+      repo: .
+    steps:
+      - id: status
+        run: git.status
+        with: {repo: "{{ vars.repo }}"}
+      - id: diff
+        run: git.diff
+        with: {repo: "{{ vars.repo }}", staged: true}
+      - id: notes
+        run: ai.prompt
+        needs: [status, diff]
+        with:
+          prompt: "Write release notes for:\\n{{ steps.diff.output }}"
+
+Steps without a path between them in `needs` run concurrently. A step's
+output is cached under a hash of its action, its resolved parameters,
+the outputs of the steps it needs and the contents of any `inputs` files,
+so re-runs skip steps whose inputs have not changed.
+"""
+import glob as globlib
+import hashlib
+import json
+import os
+import re
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+import metrics
+from config import config
+
+_TEMPLATE = re.compile(r'\{\{\s*(steps|vars|env)\.([\w-]+)(?:\.output)?\s*\}\}')
+# Bump when executor behaviour changes so old cached outputs are not reused
+CACHE_VERSION = 1
+
+
+class WorkflowError(Exception):
+    """Raised by a step whose operation failed."""
+
+
+def _require(params: Dict[str, Any], *names: str):
+    missing = [name for name in names if params.get(name) in (None, "")]
+    if missing:
+        raise WorkflowError(f"missing parameter(s): {', '.join(missing)}")
+
+
+def _checked(result: str) -> str:
+    # os_ops helpers report failure as "Error ..." strings
+    if result.startswith("Error"):
+        raise WorkflowError(result)
+    return result
+
+
+def _file_read(params):
+    # Not FileHandler.read_file: it reports failure as text that would flow into the next step
+    try:
+        with open(params["path"], 'r') as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        raise WorkflowError(f"cannot read {params['path']}: {e}")
+
+
+def _file_write(params):
+    from os_ops.file_handling import FileHandler
+
+    return _checked(FileHandler.write_file(params["path"], str(params.get("content", ""))))
+
+
+def _file_delete(params):
+    try:
+        os.remove(params["path"])
+    except FileNotFoundError:
+        return f"{params['path']} already absent"
+    except OSError as e:
+        raise WorkflowError(str(e))
+    return f"Deleted {params['path']}"
+
+
+def _file_find(params):
+    from os_ops.file_handling import FileHandler
+
+    files = FileHandler.find_files(params["pattern"], params.get("directory", "."),
+                                   limit=params.get("limit"))
+    if files and files[0].startswith("Error"):
+        raise WorkflowError(files[0])
+    return "\n".join(files)
+
+
+def _git(repo: str, *argv: str) -> str:
+    result = subprocess.run(["git", "-C", repo] + list(argv), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise WorkflowError(result.stderr.strip() or f"git {argv[0]} exited with {result.returncode}")
+    return (result.stdout + result.stderr).strip()
+
+
+def _git_status(params):
+    from os_ops.git_utils import GitManager
+
+    status = GitManager.get_status(params.get("repo", "."), use_cache=False)
+    if "error" in status:
+        raise WorkflowError(status["error"])
+    return f"Branch: {status['branch']}\n{status['status']}"
+
+
+def _git_diff(params):
+    from os_ops.git_utils import GitManager
+
+    diff = GitManager.get_diff(params.get("repo", "."), staged=bool(params.get("staged")))
+    if "error" in diff:
+        raise WorkflowError(diff["error"])
+    return diff["diff"]
+
+
+def _git_clone(params):
+    return _git(".", "clone", params["url"], *([params["path"]] if params.get("path") else []))
+
+
+def _git_commit(params):
+    repo = params.get("repo", ".")
+    if params.get("all"):
+        _git(repo, "add", "-A")
+    return _git(repo, "commit", "-m", params["message"])
+
+
+def _git_push(params):
+    return _git(params.get("repo", "."), "push", *params.get("args", []))
+
+
+def _shell_run(params):
+    try:
+        result = subprocess.run(
+            params["command"], shell=True, capture_output=True, text=True,
+            cwd=params.get("cwd"), timeout=params.get("timeout"),
+        )
+    except subprocess.TimeoutExpired:
+        raise WorkflowError(f"timed out after {params['timeout']}s")
+    if result.returncode != 0:
+        raise WorkflowError(f"exit {result.returncode}: {(result.stderr or result.stdout).strip()[-2000:]}")
+    return result.stdout
+
+
+def _api(method: str):
+    def call(params):
+        import requests
+
+        try:
+            response = requests.request(
+                method, params["url"], headers=params.get("headers"),
+                json=params.get("json"), data=params.get("data"),
+                timeout=(config.connect_timeout, config.read_timeout),
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise WorkflowError(str(e))
+        return response.text
+    return call
+
+
+def _app_open(params):
+    from os_ops.app_control import AppController
+
+    return _checked(AppController.open_app(params["app"]))
+
+
+def _app_kill(params):
+    from os_ops.app_control import AppController
+
+    result = AppController.kill_app(params["app"])
+    if not result.startswith("Terminated"):
+        raise WorkflowError(result)
+    return result
+
+
+def _ai_prompt(params):
+    from ai_client import AIClient
+
+    kwargs = {k: params[k] for k in ("max_tokens", "temperature") if k in params}
+    response = AIClient.shared().send_prompt(params["prompt"], params.get("system"),
+                                             model=params.get("model"), **kwargs)
+    if "error" in response:
+        raise WorkflowError(response["error"])
+    return response.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+
+# action -> (function, required params, cached unless the step says otherwise)
+ACTIONS: Dict[str, Tuple[Callable[[Dict[str, Any]], str], Tuple[str, ...], bool]] = {
+    "file.read": (_file_read, ("path",), False),
+    "file.create": (_file_write, ("path",), False),
+    "file.write": (_file_write, ("path",), False),
+    "file.delete": (_file_delete, ("path",), False),
+    "file.find": (_file_find, ("pattern",), False),
+    "git.status": (_git_status, (), False),
+    "git.diff": (_git_diff, (), False),
+    "git.clone": (_git_clone, ("url",), False),
+    "git.commit": (_git_commit, ("message",), False),
+    "git.push": (_git_push, (), False),
+    "shell.run": (_shell_run, ("command",), False),
+    "shell.run_command": (_shell_run, ("command",), False),
+    "api.get": (_api("GET"), ("url",), False),
+    "api.post": (_api("POST"), ("url",), False),
+    "app.open": (_app_open, ("app",), False),
+    "app.kill": (_app_kill, ("app",), False),
+    "ai.prompt": (_ai_prompt, ("prompt",), True),
+}
+
+
+def workflow_dirs() -> List[Path]:
+    """The user's workflows first, then the project's.
+
+    A cloned repository must not be able to replace a trusted workflow name
+    with its own shell steps, so a project workflow only runs under a name
+    the user has not defined.
+    """
+    return [config.config_path / "workflows", Path(".devos") / "workflows"]
+
+
+def list_workflows() -> List[str]:
+    names = set()
+    for directory in workflow_dirs():
+        if directory.is_dir():
+            names.update(p.stem for p in directory.iterdir() if p.suffix in (".yaml", ".yml"))
+    return sorted(names)
+
+
+def find_workflow(name: str) -> Optional[Path]:
+    if os.path.isfile(name):
+        return Path(name)
+    for directory in workflow_dirs():
+        for suffix in (".yaml", ".yml"):
+            path = directory / f"{name}{suffix}"
+            if path.is_file():
+                return path
+    return None
+
+
+def load_workflow(path: Path) -> Dict[str, Any]:
+    import yaml
+
+    with open(path, 'r') as f:
+        workflow = yaml.safe_load(f) or {}
+    if not isinstance(workflow, dict) or not isinstance(workflow.get("steps"), list):
+        raise WorkflowError(f"{path}: expected a mapping with a list of steps")
+    workflow.setdefault("name", path.stem)
+    workflow.setdefault("vars", {})
+    return workflow
+
+
+def _references(value: Any) -> List[Tuple[str, str]]:
+    if isinstance(value, str):
+        return _TEMPLATE.findall(value)
+    if isinstance(value, dict):
+        return [ref for item in value.values() for ref in _references(item)]
+    if isinstance(value, list):
+        return [ref for item in value for ref in _references(item)]
+    return []
+
+
+def validate(workflow: Dict[str, Any]) -> Tuple[List[List[str]], List[str]]:
+    """Check the step graph without running anything; returns (levels, errors).
+
+    Each level lists steps whose dependencies are all in earlier levels,
+    i.e. the steps that can run concurrently.
+    """
+    errors = []
+    steps: Dict[str, Dict[str, Any]] = {}
+    for index, step in enumerate(workflow["steps"], 1):
+        if not isinstance(step, dict) or not step.get("id"):
+            errors.append(f"step {index}: missing id")
+            continue
+        step_id = str(step["id"])
+        if step_id in steps:
+            errors.append(f"{step_id}: duplicate id")
+        steps[step_id] = step
+        if not isinstance(step.get("needs") or [], list):
+            errors.append(f"{step_id}: needs must be a list of step ids")
+            step = steps[step_id] = {**step, "needs": []}
+        if not isinstance(step.get("with") or {}, dict):
+            errors.append(f"{step_id}: with must be a mapping of parameters")
+            continue
+        action = ACTIONS.get(step.get("run"))
+        if action is None:
+            errors.append(f"{step_id}: unknown action {step.get('run')!r} (known: {', '.join(sorted(ACTIONS))})")
+            continue
+        params = step.get("with") or {}
+        missing = [name for name in action[1] if name not in params]
+        if missing:
+            errors.append(f"{step_id}: missing parameter(s) {', '.join(missing)}")
+
+    for step_id, step in steps.items():
+        for need in step.get("needs") or []:
+            if str(need) not in steps:
+                errors.append(f"{step_id}: needs unknown step {need}")
+
+    # Kahn's algorithm, one level at a time
+    needs = {step_id: {str(n) for n in step.get("needs") or [] if str(n) in steps}
+             for step_id, step in steps.items()}
+    levels, placed = [], set()
+    while len(placed) < len(steps):
+        level = sorted(step_id for step_id in steps
+                       if step_id not in placed and needs[step_id] <= placed)
+        if not level:
+            cycle = sorted(set(steps) - placed)
+            errors.append(f"dependency cycle among: {', '.join(cycle)}")
+            break
+        levels.append(level)
+        placed.update(level)
+
+    # Templates may only read outputs of steps guaranteed to have finished
+    ancestors: Dict[str, set] = {}
+    for level in levels:
+        for step_id in level:
+            ancestors[step_id] = set().union(*([needs[step_id]] + [ancestors[n] for n in needs[step_id]]))
+            for kind, name in _references(steps[step_id].get("with") or {}):
+                if kind == "steps" and name not in ancestors[step_id]:
+                    errors.append(f"{step_id}: uses output of {name}, which it does not (transitively) need")
+                elif kind == "vars" and name not in workflow["vars"]:
+                    errors.append(f"{step_id}: uses undefined variable {name}")
+    return levels, errors
+
+
+def _render(value: Any, outputs: Dict[str, str], variables: Dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        def substitute(match):
+            kind, name = match.groups()
+            if kind == "steps":
+                return outputs.get(name, "")
+            if kind == "vars":
+                return str(variables.get(name, ""))
+            return os.environ.get(name, "")
+        return _TEMPLATE.sub(substitute, value)
+    if isinstance(value, dict):
+        return {key: _render(item, outputs, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_render(item, outputs, variables) for item in value]
+    return value
+
+
+def _cache_key(step: Dict[str, Any], params: Dict[str, Any], upstream: List[str]) -> str:
+    digest = hashlib.sha256()
+    # Upstream outputs count even when not templated in, so a changed dependency re-runs its dependents
+    digest.update(json.dumps([CACHE_VERSION, step["run"], params, upstream], sort_keys=True, default=str).encode())
+    # Declared input files make shell/file steps cacheable like make targets
+    for pattern in step.get("inputs") or []:
+        for path in sorted(globlib.glob(pattern, recursive=True)):
+            if os.path.isfile(path):
+                digest.update(path.encode() + b"\0")
+                with open(path, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_dir() -> Path:
+    return config.config_path / "workflows" / "cache"
+
+
+def run_workflow(workflow: Dict[str, Any], concurrency: int = 4, force: bool = False,
+                 variables: Optional[Dict[str, Any]] = None,
+                 on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """Run every step once its needs have succeeded, up to `concurrency` at a time.
+
+    Returns one result per step (id, status, seconds, output or error).
+    A failed step marks everything depending on it as skipped; independent
+    branches keep running.
+    """
+    from os_ops.file_handling import FileHandler
+
+    _, errors = validate(workflow)
+    if errors:
+        raise WorkflowError("; ".join(errors))
+    steps = {str(step["id"]): step for step in workflow["steps"]}
+    variables = {**workflow["vars"], **(variables or {})}
+    needs = {step_id: {str(n) for n in step.get("needs") or []} for step_id, step in steps.items()}
+    dependents: Dict[str, List[str]] = {step_id: [] for step_id in steps}
+    for step_id, required in needs.items():
+        for need in required:
+            dependents[need].append(step_id)
+
+    outputs: Dict[str, str] = {}
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def execute(step_id: str) -> Dict[str, Any]:
+        step = steps[step_id]
+        function, required, cached_by_default = ACTIONS[step["run"]]
+        result = {"id": step_id, "run": step["run"]}
+        started = time.perf_counter()
+        try:
+            params = _render(step.get("with") or {}, outputs, variables)
+            _require(params, *required)
+            cacheable = step.get("cache", cached_by_default)
+            cache_file = _cache_dir() / f"{_cache_key(step, params, [outputs[n] for n in sorted(needs[step_id])])}.json" if cacheable else None
+            if cache_file and not force and cache_file.exists():
+                result.update(status="cached", output=json.loads(cache_file.read_text())["output"])
+            else:
+                with metrics.span("workflow.step"):
+                    output = function(params)
+                result.update(status="ok", output=output if isinstance(output, str) else str(output))
+                if cache_file:
+                    cache_file.parent.mkdir(parents=True, exist_ok=True)
+                    FileHandler.atomic_write(str(cache_file), json.dumps({"output": result["output"]}).encode())
+        except Exception as e:
+            # Whatever a step raises fails only that step (and its dependents)
+            result.update(status="failed", error=str(e) or type(e).__name__)
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def finish(result: Dict[str, Any]):
+        results[result["id"]] = result
+        if result["status"] in ("ok", "cached"):
+            outputs[result["id"]] = result["output"]
+        if on_done:
+            on_done(result)
+
+    def skip_dependents(step_id: str):
+        for child in dependents[step_id]:
+            if child not in results:
+                finish({"id": child, "run": steps[child]["run"], "status": "skipped",
+                        "error": f"needs {step_id}, which did not succeed", "seconds": 0.0})
+                skip_dependents(child)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    running = {}
+    try:
+        def submit_ready():
+            for step_id in steps:
+                if step_id in results or step_id in running.values():
+                    continue
+                if all(results.get(need, {}).get("status") in ("ok", "cached") for need in needs[step_id]):
+                    running[pool.submit(execute, step_id)] = step_id
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step_id = running.pop(future)
+                result = future.result()
+                finish(result)
+                if result["status"] == "failed":
+                    skip_dependents(step_id)
+            submit_ready()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return [results[step_id] for step_id in steps if step_id in results]